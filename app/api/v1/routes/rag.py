@@ -1,22 +1,108 @@
-from fastapi import APIRouter, UploadFile, File, HTTPException, Depends
+from fastapi import APIRouter, UploadFile, File, HTTPException, Depends, status
+from fastapi.responses import StreamingResponse
+import asyncio
+import json
+import logging
 import os
-from typing import Optional
-from threading import Lock
+import tempfile
+import time
+from typing import AsyncIterator, Optional
+from threading import RLock, Timer
+
+import numpy as np
 
 from app.rag_basics.document_loader import PDFLoader
 from app.rag_basics.chunking_service import ChunkingService
 from app.rag_basics.embeddings import EmbeddingService
-from app.rag_basics.vector_store import FAISSVectorStore
-from app.rag_basics.llm_service import LLMService
-
-from app.auth import get_current_user
+from app.rag_basics.embedding_cache import EmbeddingCache
+from app.rag_basics.embedding_batcher import QueryEmbeddingBatcher
+from app.rag_basics.answer_cache import AnswerCache
+from app.rag_basics.vector_store import FAISSVectorStore, normalize_doc_id
+from app.rag_basics.segment_storage import SegmentStorage
+from app.rag_basics.index_backends import IndexConfig, recall_latency_report
+from app.rag_basics.store_cache import VectorStoreCache
+from app.rag_basics.tenant_shards import TenantView, shard_name
+from app.rag_basics.llm_service import LLMService, LLMUnavailableError
+from app.rag_basics.lexical_index import analyze
+
+from app.auth import get_current_user, password_verifier, token_cache
+from app.models.schemas import AskBatchRequest
+from app.jobs import JobQueue
 from app.policy import check_upload_quota, check_query_rate
-from app.evaluation import log_retrieval_metrics, log_answer_outcome
+from app.evaluation import log_retrieval_metrics, log_answer_outcome, log_faithfulness, request_log
+from app.metrics import PURGES_DEFERRED, REFUSALS, STAGE_SECONDS, THRESHOLD_MISSES, registry
+from app.rag_eval.faithfulness_evaluator import FaithfulnessSampler
 
 
 DEBUG_MODE = os.getenv("DEBUG_MODE", "false").lower() == "true"
 MIN_SIMILARITY_SCORE = float(os.getenv("MIN_SIMILARITY_SCORE", 0.4))
 TOP_K = int(os.getenv("TOP_K", 5))
+# /ask retrieval: "dense", "lexical" (BM25 only) or "hybrid" (both, fused)
+RETRIEVAL_MODES = ("dense", "lexical", "hybrid")
+RETRIEVAL_MODE = os.getenv("RETRIEVAL_MODE", "dense")
+# Weight of the dense score in hybrid fusion; the rest goes to BM25
+HYBRID_ALPHA = float(os.getenv("HYBRID_ALPHA", 0.5))
+# Hybrid queries up to this many words with no "?" try BM25 alone first
+LEXICAL_FAST_PATH_MAX_WORDS = int(os.getenv("LEXICAL_FAST_PATH_MAX_WORDS", 3))
+UPLOAD_BLOCK_SIZE = int(os.getenv("UPLOAD_BLOCK_SIZE", 1024 * 1024))
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", 64))
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", 2))
+PDF_LOADER_WORKERS = int(os.getenv("PDF_LOADER_WORKERS", 1))
+# "torch" (SentenceTransformer) or "onnx" (ONNX Runtime, int8 when EMBEDDING_QUANTIZE)
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "torch")
+EMBEDDING_QUANTIZE = os.getenv("EMBEDDING_QUANTIZE", "true").lower() == "true"
+EMBEDDING_ONNX_DIR = os.getenv("EMBEDDING_ONNX_DIR", "data/models")
+EMBEDDING_THREADS = int(os.getenv("EMBEDDING_THREADS", 0))
+EMBEDDING_CACHE_ENABLED = os.getenv("EMBEDDING_CACHE_ENABLED", "true").lower() == "true"
+EMBEDDING_CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH", "data/cache/embeddings.sqlite3")
+EMBEDDING_CACHE_MAX_ENTRIES = int(os.getenv("EMBEDDING_CACHE_MAX_ENTRIES", 200_000))
+# "tokens" packs sentences up to the embedding model's window; "chars" is the old 500/100 slicing
+CHUNKING_MODE = os.getenv("CHUNKING_MODE", "tokens")
+CHUNK_TOKEN_OVERLAP = int(os.getenv("CHUNK_TOKEN_OVERLAP", 0))
+SEGMENT_COMPACT_THRESHOLD = int(os.getenv("SEGMENT_COMPACT_THRESHOLD", 8))
+# Deleted rows are physically dropped once they make up this share of a store
+TOMBSTONE_PURGE_RATIO = float(os.getenv("TOMBSTONE_PURGE_RATIO", 0.2))
+# A purge blocked by an index upgrade or segment merge is retried after this
+PURGE_RETRY_SECONDS = float(os.getenv("PURGE_RETRY_SECONDS", 30))
+
+# ANN backend a store upgrades to once it passes INDEX_UPGRADE_THRESHOLD chunks
+INDEX_BACKEND = os.getenv("INDEX_BACKEND", "hnsw")
+INDEX_UPGRADE_THRESHOLD = int(os.getenv("INDEX_UPGRADE_THRESHOLD", 50_000))
+IVF_NLIST = int(os.getenv("IVF_NLIST", 1024))
+IVF_NPROBE = int(os.getenv("IVF_NPROBE", 16))
+HNSW_M = int(os.getenv("HNSW_M", 32))
+HNSW_EF_SEARCH = int(os.getenv("HNSW_EF_SEARCH", 64))
+PQ_M = int(os.getenv("PQ_M", 48))
+# In-memory vector codes: float32, float16 or int8 (exact vectors stay in the segment files)
+VECTOR_STORAGE = os.getenv("VECTOR_STORAGE", "float32")
+RESCORE_FACTOR = int(os.getenv("RESCORE_FACTOR", 4))
+QUERY_BATCH_MAX_SIZE = int(os.getenv("QUERY_BATCH_MAX_SIZE", 32))
+QUERY_BATCH_WAIT_MS = float(os.getenv("QUERY_BATCH_WAIT_MS", 5))
+ANSWER_CACHE_ENABLED = os.getenv("ANSWER_CACHE_ENABLED", "true").lower() == "true"
+ANSWER_CACHE_MAX_ENTRIES = int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", 2048))
+ANSWER_CACHE_TTL_SECONDS = float(os.getenv("ANSWER_CACHE_TTL_SECONDS", 3600))
+ANSWER_CACHE_SIMILARITY = float(os.getenv("ANSWER_CACHE_SIMILARITY", 0.95))
+LLM_BACKEND = os.getenv("LLM_BACKEND", "http")
+OLLAMA_BASE_URL = os.getenv("OLLAMA_BASE_URL", "http://localhost:11434")
+OLLAMA_KEEP_ALIVE = os.getenv("OLLAMA_KEEP_ALIVE", "30m")
+LLM_TIMEOUT_SECONDS = float(os.getenv("LLM_TIMEOUT_SECONDS", 120))
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", 4))
+ASK_BATCH_MAX_QUESTIONS = int(os.getenv("ASK_BATCH_MAX_QUESTIONS", 50))
+# LLM calls one /ask-batch request may have in flight at once
+ASK_BATCH_LLM_CONCURRENCY = int(os.getenv("ASK_BATCH_LLM_CONCURRENCY", LLM_MAX_CONCURRENCY))
+
+# Share of answered /ask requests scored for sentence-level faithfulness
+FAITHFULNESS_SAMPLE_RATE = float(os.getenv("FAITHFULNESS_SAMPLE_RATE", 0.05))
+FAITHFULNESS_SIMILARITY = float(os.getenv("FAITHFULNESS_SIMILARITY", 0.5))
+FAITHFULNESS_BATCH_SIZE = int(os.getenv("FAITHFULNESS_BATCH_SIZE", 16))
+
+# Memory budget for loaded per-user stores (least recently used are evicted)
+VECTOR_STORE_CACHE_BYTES = int(os.getenv("VECTOR_STORE_CACHE_MB", 1024)) * 1024 * 1024
+# "per_user": one store per user under data/users/<id>
+# "sharded": users packed into TENANT_SHARDS shared stores under SHARD_ROOT
+STORAGE_MODE = os.getenv("STORAGE_MODE", "per_user")
+TENANT_SHARDS = int(os.getenv("TENANT_SHARDS", 16))
+SHARD_ROOT = os.getenv("SHARD_ROOT", "data/shards")
 
 
 # =========================
@@ -38,6 +124,11 @@ def get_user_upload_dir(user_id: str) -> str:
     return path
 
 
+def get_document_id(filename: str) -> str:
+    # Same derivation as PDFLoader's source / ChunkingService's doc_id
+    return normalize_doc_id(os.path.basename(filename))
+
+
 def get_user_vector_paths(user_id: str):
     user_dir = get_user_dir(user_id)
     return (
@@ -51,51 +142,226 @@ def get_user_vector_paths(user_id: str):
 # =========================
 
 router = APIRouter()
+logger = logging.getLogger(__name__)
 
 
 # =========================
 # Services (stateless)
 # =========================
 
-embedding_service = EmbeddingService()
-chunker = ChunkingService()
-llm_service = LLMService()
+embedding_cache = (
+    EmbeddingCache(EMBEDDING_CACHE_PATH, max_entries=EMBEDDING_CACHE_MAX_ENTRIES)
+    if EMBEDDING_CACHE_ENABLED
+    else None
+)
+embedding_service = EmbeddingService(
+    cache=embedding_cache,
+    backend=EMBEDDING_BACKEND,
+    onnx_dir=EMBEDDING_ONNX_DIR,
+    quantize=EMBEDDING_QUANTIZE,
+    num_threads=EMBEDDING_THREADS,
+)
+query_batcher = QueryEmbeddingBatcher(
+    embedding_service,
+    max_batch_size=QUERY_BATCH_MAX_SIZE,
+    max_wait_ms=QUERY_BATCH_WAIT_MS,
+)
+chunker = (
+    ChunkingService(
+        tokenizer=embedding_service.tokenizer,
+        max_tokens=embedding_service.max_tokens,
+        token_overlap=CHUNK_TOKEN_OVERLAP,
+    )
+    if CHUNKING_MODE == "tokens"
+    else ChunkingService()
+)
+llm_service = LLMService(
+    backend=LLM_BACKEND,
+    base_url=OLLAMA_BASE_URL,
+    timeout=LLM_TIMEOUT_SECONDS,
+    keep_alive=OLLAMA_KEEP_ALIVE,
+    max_concurrency=LLM_MAX_CONCURRENCY,
+)
+ingest_jobs = JobQueue(workers=INGEST_WORKERS)
+loader = PDFLoader(workers=PDF_LOADER_WORKERS)
+answer_cache = (
+    AnswerCache(
+        max_entries=ANSWER_CACHE_MAX_ENTRIES,
+        ttl_seconds=ANSWER_CACHE_TTL_SECONDS,
+        similarity_threshold=ANSWER_CACHE_SIMILARITY,
+    )
+    if ANSWER_CACHE_ENABLED
+    else None
+)
+faithfulness_sampler = FaithfulnessSampler(
+    embedding_service.embed_queries,
+    report=log_faithfulness,
+    sample_rate=FAITHFULNESS_SAMPLE_RATE,
+    threshold=FAITHFULNESS_SIMILARITY,
+    batch_size=FAITHFULNESS_BATCH_SIZE,
+)
+index_config = IndexConfig(
+    backend=INDEX_BACKEND,
+    upgrade_threshold=INDEX_UPGRADE_THRESHOLD,
+    nlist=IVF_NLIST,
+    nprobe=IVF_NPROBE,
+    hnsw_m=HNSW_M,
+    ef_search=HNSW_EF_SEARCH,
+    pq_m=PQ_M,
+    storage=VECTOR_STORAGE,
+    rescore_factor=RESCORE_FACTOR,
+)
+# Tenant views exact-scan their own ranges and never query a shard's ANN
+# index, so shard stores stay flat instead of training one
+shard_index_config = IndexConfig(
+    backend="flat",
+    storage=VECTOR_STORAGE,
+    rescore_factor=RESCORE_FACTOR,
+)
 
 
 # =========================
 # Per-user state
 # =========================
 
-vector_stores: dict[str, FAISSVectorStore] = {}
-user_locks: dict[str, Lock] = {}
+# Locks, storages and cached stores are keyed by store key: the user id,
+# or the user's shard in sharded mode
+vector_stores = VectorStoreCache(max_bytes=VECTOR_STORE_CACHE_BYTES)
+user_locks: dict[str, RLock] = {}
+user_storages: dict[str, SegmentStorage] = {}
+# Bumped whenever a user's index changes; part of every answer cache key
+index_versions: dict[str, int] = {}
+
+
+registry.gauge(
+    "rag_vector_stores_loaded",
+    "Vector stores currently held in the store cache.",
+    callback=lambda: vector_stores.stats()["stores"],
+)
+registry.gauge(
+    "rag_vector_store_memory_bytes",
+    "Estimated memory of the cached vector stores.",
+    callback=lambda: vector_stores.stats()["bytes"],
+)
+
+
+def get_store_key(user_id: str) -> str:
+    if STORAGE_MODE == "sharded":
+        return shard_name(user_id, TENANT_SHARDS)
+    return user_id
+
+
+def get_index_config() -> IndexConfig:
+    return shard_index_config if STORAGE_MODE == "sharded" else index_config
+
 
+def get_user_lock(user_id: str) -> RLock:
+    key = get_store_key(user_id)
+    if key not in user_locks:
+        user_locks.setdefault(key, RLock())
+    return user_locks[key]
 
-def get_user_lock(user_id: str) -> Lock:
-    if user_id not in user_locks:
-        user_locks[user_id] = Lock()
-    return user_locks[user_id]
 
+def get_index_version(user_id: str) -> int:
+    return index_versions.get(user_id, 0)
 
-def get_user_vector_store(user_id: str) -> Optional[FAISSVectorStore]:
-    if user_id in vector_stores:
-        return vector_stores[user_id]
 
-    index_path, metadata_path = get_user_vector_paths(user_id)
-    if os.path.exists(index_path) and os.path.exists(metadata_path):
-        store = FAISSVectorStore.load(index_path, metadata_path)
-        vector_stores[user_id] = store
+def bump_index_version(user_id: str):
+    index_versions[user_id] = get_index_version(user_id) + 1
+    if answer_cache is not None:
+        answer_cache.invalidate_user(user_id)
+
+
+def get_user_storage(user_id: str) -> SegmentStorage:
+    key = get_store_key(user_id)
+    if key not in user_storages:
+        if STORAGE_MODE == "sharded":
+            directory = os.path.join(SHARD_ROOT, key)
+            os.makedirs(directory, exist_ok=True)
+        else:
+            directory = get_user_dir(user_id)
+        user_storages.setdefault(key, SegmentStorage(directory))
+    return user_storages[key]
+
+
+def load_store(user_id: str) -> Optional[FAISSVectorStore]:
+    """The store holding the user's rows: their own, or their shard's."""
+    key = get_store_key(user_id)
+    store = vector_stores.get(key)
+    if store is not None:
         return store
 
+    with get_user_lock(user_id):
+        if key in vector_stores:
+            return vector_stores.get(key)
+
+        storage = get_user_storage(user_id)
+        if storage.exists():
+            store = FAISSVectorStore.open(storage, get_index_config())
+            store.maybe_upgrade(storage)
+            vector_stores.put(key, store)
+            return store
+
+        if STORAGE_MODE == "sharded":
+            return None
+
+        # Legacy single-file layout: migrate it into the first segment
+        index_path, metadata_path = get_user_vector_paths(user_id)
+        if os.path.exists(index_path) and os.path.exists(metadata_path):
+            store = FAISSVectorStore.load(index_path, metadata_path, index_config)
+            store.persist(storage)
+            store.maybe_upgrade(storage)
+            vector_stores.put(key, store)
+            return store
+
     return None
 
 
+def get_user_vector_store(user_id: str):
+    """
+    The user's vector store, or None before their first upload. In
+    sharded mode this is a TenantView over the shard's store.
+    """
+    store = load_store(user_id)
+    if store is None or STORAGE_MODE != "sharded":
+        return store
+
+    view = TenantView(store, user_id)
+    return view if view.has_documents() else None
+
+
+def new_user_vector_store(user_id: str, embedding_dim: int):
+    store = load_store(user_id)
+    if store is None:
+        store = FAISSVectorStore(embedding_dim=embedding_dim, index_config=get_index_config())
+    return TenantView(store, user_id) if STORAGE_MODE == "sharded" else store
+
+
+def cache_user_vector_store(user_id: str, vector_store):
+    store = vector_store.store if isinstance(vector_store, TenantView) else vector_store
+    vector_stores.put(get_store_key(user_id), store)
+
+
 # =========================
 # Helpers
 # =========================
 
+REFUSAL_ANSWER = "I don't know based on the provided context."
+_REFUSAL_PHRASE = "i don't know based on the provided context"
+
+
 def is_refusal(answer: str) -> bool:
     normalized = answer.strip().lower()
-    return "i don't know based on the provided context" in normalized
+    return _REFUSAL_PHRASE in normalized
+
+
+def may_become_refusal(prefix: str) -> bool:
+    """
+    True while a streamed answer prefix could still turn into the refusal
+    phrase, so its tokens should be held back from the client.
+    """
+    normalized = prefix.lstrip(" \n\"'").lower()
+    return _REFUSAL_PHRASE.startswith(normalized[:len(_REFUSAL_PHRASE)])
 
 
 def normalize_question(question: str) -> str:
@@ -129,74 +395,296 @@ def deduplicate_chunks(retrieved: list) -> list:
     return list(best_per_page.values())
 
 
+# =========================
+# Deletes and purging
+# =========================
+
+def delete_document_rows(vector_store: FAISSVectorStore, doc_id: str) -> int:
+    """
+    Tombstones a document in memory; the next persist() commits the
+    tombstones to the manifest. Callers hold the user lock. Returns the
+    number of chunks removed.
+    """
+    ranges = vector_store.delete_document(doc_id)
+    return sum(end - start for start, end in ranges)
+
+
+def purge_deleted(job_id: str, user_id: str) -> dict:
+    """
+    Rewrites the user's storage without tombstoned rows and reopens the
+    store. Runs on the ingestion worker pool; retried later while an index
+    upgrade or segment merge is running.
+    """
+    with get_user_lock(user_id):
+        vector_store = load_store(user_id)
+        if vector_store is None or not vector_store.dead_count:
+            return {"purged": 0}
+
+        purged = vector_store.dead_count
+        storage = get_user_storage(user_id)
+        vector_store.persist(storage)
+        # An upgrade in flight would save an ANN snapshot with stale
+        # positions; purge() refuses while a segment merge is running
+        if vector_store.upgrading or not storage.purge():
+            PURGES_DEFERRED.inc()
+            logger.info("purge for %s deferred %.0fs: index upgrade or segment merge running",
+                        user_id, PURGE_RETRY_SECONDS)
+            schedule_purge(user_id, delay=PURGE_RETRY_SECONDS)
+            return {"purged": 0, "deferred": True}
+
+        vector_store = FAISSVectorStore.open(storage, get_index_config())
+        vector_store.maybe_upgrade(storage)
+        cache_user_vector_store(user_id, vector_store)
+        bump_index_version(user_id)
+
+    return {"purged": purged}
+
+
+def schedule_purge(user_id: str, delay: float = 0.0):
+    if delay <= 0:
+        ingest_jobs.submit(user_id, "purge", purge_deleted, user_id)
+        return
+    timer = Timer(delay, ingest_jobs.submit, args=(user_id, "purge", purge_deleted, user_id))
+    timer.daemon = True
+    timer.start()
+
+
+def maybe_purge(user_id: str, vector_store: FAISSVectorStore):
+    if vector_store.dead_ratio() >= TOMBSTONE_PURGE_RATIO:
+        schedule_purge(user_id)
+
+
+# =========================
+# Ingestion (background)
+# =========================
+
+def ingest_pdf(job_id: str, user_id: str, file_path: str) -> dict:
+    """
+    Parses, chunks and embeds an uploaded PDF, then appends it to the
+    user's vector store. Runs on the ingestion worker pool.
+    """
+    # Pages stream out of the loader in order, so chunking and embedding
+    # start before the last page has been parsed.
+    chunks = []
+    batches = []
+    pending = []
+    pages_parsed = 0
+    embed_seconds = 0.0
+    started = time.perf_counter()
+
+    def embed(batch: list) -> np.ndarray:
+        nonlocal embed_seconds
+        batch_started = time.perf_counter()
+        vectors = embedding_service.embed_texts([c["text"] for c in batch])
+        elapsed = time.perf_counter() - batch_started
+        embed_seconds += elapsed
+        STAGE_SECONDS.observe(elapsed, route="upload", stage="embed")
+        return vectors
+
+    for page in loader.iter_pages(file_path):
+        pages_parsed += 1
+        pending.extend(chunker.chunk_documents([page]))
+
+        while len(pending) >= EMBED_BATCH_SIZE:
+            batch, pending = pending[:EMBED_BATCH_SIZE], pending[EMBED_BATCH_SIZE:]
+            batches.append(embed(batch))
+            chunks.extend(batch)
+
+        ingest_jobs.update(
+            job_id,
+            pages_parsed=pages_parsed,
+            chunks_embedded=len(chunks),
+        )
+
+    if pending:
+        batches.append(embed(pending))
+        chunks.extend(pending)
+
+    # Parsing and chunking overlap with embedding; count what is left over
+    STAGE_SECONDS.observe(time.perf_counter() - started - embed_seconds, route="upload", stage="parse")
+
+    if not chunks:
+        raise ValueError("No text found in PDF")
+
+    ingest_jobs.update(job_id, chunks_embedded=len(chunks))
+    embeddings = np.vstack(batches)
+
+    persist_started = time.perf_counter()
+    with get_user_lock(user_id):
+        vector_store = get_user_vector_store(user_id)
+        if vector_store is None:
+            vector_store = new_user_vector_store(user_id, embeddings.shape[1])
+
+        # Re-uploading a file replaces the previous copy of the document;
+        # persist() commits the old copy's tombstones with the new segment
+        replaced = delete_document_rows(vector_store, chunks[0]["metadata"]["doc_id"])
+
+        vector_store.add_embeddings(embeddings, chunks)
+        storage = get_user_storage(user_id)
+        vector_store.persist(storage)
+        vector_store.maybe_upgrade(storage)
+        cache_user_vector_store(user_id, vector_store)
+        bump_index_version(user_id)
+    STAGE_SECONDS.observe(time.perf_counter() - persist_started, route="upload", stage="persist")
+
+    storage.compact_in_background(min_segments=SEGMENT_COMPACT_THRESHOLD)
+    maybe_purge(user_id, vector_store)
+
+    return {"pages": pages_parsed, "chunks": len(chunks), "replaced_chunks": replaced}
+
+
 # =========================
 # Upload endpoint
 # =========================
 
-@router.post("/upload-pdf")
+@router.post("/upload-pdf", status_code=status.HTTP_202_ACCEPTED)
 async def upload_pdf(
     file: UploadFile = File(...),
     current_user: dict = Depends(get_current_user),
 ):
     user_id = current_user["username"]
-    check_upload_quota(user_id)
+    await asyncio.to_thread(check_upload_quota, user_id)
 
-    if not file.filename.lower().endswith(".pdf"):
+    filename = os.path.basename(file.filename or "")
+    if not filename.lower().endswith(".pdf"):
         raise HTTPException(status_code=400, detail="Only PDF files are supported")
 
     upload_dir = get_user_upload_dir(user_id)
-    file_path = os.path.join(upload_dir, file.filename)
+    file_path = os.path.join(upload_dir, filename)
+
+    # Stream to disk in fixed-size blocks instead of buffering the whole file.
+    # Each upload gets its own temp file, so concurrent uploads of the same
+    # name never interleave; the last one to finish replaces the PDF whole.
+    fd, partial_path = tempfile.mkstemp(dir=upload_dir, prefix=f".{filename}.", suffix=".part")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            while True:
+                block = await file.read(UPLOAD_BLOCK_SIZE)
+                if not block:
+                    break
+                f.write(block)
+        os.replace(partial_path, file_path)
+    except BaseException:
+        if os.path.exists(partial_path):
+            os.remove(partial_path)
+        raise
+
+    job_id = ingest_jobs.submit(user_id, "ingest", ingest_pdf, user_id, file_path)
+
+    return {
+        "message": "PDF accepted for indexing.",
+        "job_id": job_id,
+        "status_url": f"/api/v1/ingest-jobs/{job_id}",
+    }
+
+
+@router.get("/ingest-jobs/{job_id}")
+async def get_ingest_job(
+    job_id: str,
+    current_user: dict = Depends(get_current_user),
+):
+    job = ingest_jobs.get(job_id, owner=current_user["username"])
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
 
-    with open(file_path, "wb") as f:
-        f.write(await file.read())
+    return job
 
-    loader = PDFLoader()
-    documents = loader.load(file_path)
 
-    chunks = chunker.chunk_documents(documents)
-    if not chunks:
-        raise HTTPException(status_code=400, detail="No text found in PDF")
+# =========================
+# Delete endpoint
+# =========================
 
-    texts = [c["text"] for c in chunks]
-    embeddings = embedding_service.embed_texts(texts)
+@router.delete("/documents/{doc_id}")
+def delete_document(
+    doc_id: str,
+    current_user: dict = Depends(get_current_user),
+):
+    user_id = current_user["username"]
+    doc_id = get_document_id(doc_id)
 
     with get_user_lock(user_id):
         vector_store = get_user_vector_store(user_id)
-        if vector_store is None:
-            vector_store = FAISSVectorStore(embedding_dim=embeddings.shape[1])
-            vector_stores[user_id] = vector_store
+        if vector_store is None or doc_id not in vector_store.doc_ranges:
+            raise HTTPException(status_code=404, detail="Document not found")
 
-        vector_store.add_embeddings(embeddings, chunks)
-        index_path, metadata_path = get_user_vector_paths(user_id)
-        vector_store.save(index_path, metadata_path)
+        deleted = delete_document_rows(vector_store, doc_id)
+        vector_store.persist(get_user_storage(user_id))
+        bump_index_version(user_id)
+
+        upload_dir = get_user_upload_dir(user_id)
+        for filename in os.listdir(upload_dir):
+            if filename.lower().endswith(".pdf") and get_document_id(filename) == doc_id:
+                os.remove(os.path.join(upload_dir, filename))
 
-    return {"message": "PDF uploaded and indexed successfully."}
+    maybe_purge(user_id, vector_store)
+
+    return {
+        "doc_id": doc_id,
+        "deleted_chunks": deleted,
+        "live_chunks": vector_store.live_count(),
+        "dead_ratio": round(vector_store.dead_ratio(), 4),
+    }
 
 
 # =========================
-# Ask endpoint
+# Stats endpoint
 # =========================
 
-@router.post("/ask")
-async def ask_question(
-    question: str,
-    doc_id: Optional[str] = None,
+@router.get("/stats")
+async def get_stats(current_user: dict = Depends(get_current_user)):
+    return {
+        "embedding_cache": embedding_cache.stats() if embedding_cache else None,
+        "vector_stores": vector_stores.stats(),
+        "query_batcher": query_batcher.stats(),
+        "answer_cache": answer_cache.stats() if answer_cache else None,
+        "faithfulness_sampler": faithfulness_sampler.stats(),
+        "password_verifier": password_verifier.stats(),
+        "token_cache": token_cache.stats(),
+        "request_log": request_log.stats() if request_log else None,
+    }
+
+
+@router.get("/index-report")
+def get_index_report(
+    k: int = 5,
+    queries: int = 100,
     current_user: dict = Depends(get_current_user),
 ):
+    """
+    Recall@k vs. latency of every index backend on the user's own vectors.
+    """
     user_id = current_user["username"]
-    check_query_rate(user_id)
-
     vector_store = get_user_vector_store(user_id)
     if vector_store is None:
         raise HTTPException(status_code=400, detail="No documents indexed yet")
 
-    normalized_question = normalize_question(question)
-    query_embedding = embedding_service.embed_query(normalized_question)
+    if isinstance(vector_store, TenantView):
+        vectors = vector_store.vectors()
+    else:
+        vectors = get_user_storage(user_id).load_vectors()
+    return {
+        "active_backend": vector_store.backend,
+        "report": recall_latency_report(
+            vectors,
+            index_config,
+            k=k,
+            num_queries=min(queries, 1000),
+        ),
+    }
 
-    with get_user_lock(user_id):
-        retrieved = vector_store.search(query_embedding, top_k=TOP_K)
 
-    retrieved = deduplicate_chunks(retrieved)
+# =========================
+# Ask endpoint
+# =========================
+
+def gate_retrieved(user_id: str, question: str, retrieved: list) -> list:
+    """
+    Deduplication, thresholding and confidence gating shared by every
+    retrieval mode. An empty result means the question must be refused
+    without calling the LLM.
+    """
+    with STAGE_SECONDS.time(route="ask", stage="dedup"):
+        retrieved = deduplicate_chunks(retrieved)
 
     log_retrieval_metrics(
         user_id=user_id,
@@ -207,48 +695,469 @@ async def ask_question(
 
     # Threshold filter
     filtered = [r for r in retrieved if r["score"] >= MIN_SIMILARITY_SCORE]
-
-    # Optional document filter
-    if doc_id:
-        filtered = [
-            r for r in filtered
-            if r["chunk"]["metadata"].get("doc_id") == doc_id
-        ]
+    THRESHOLD_MISSES.inc(len(retrieved) - len(filtered))
 
     if not filtered:
-        answer = "I don't know based on the provided context."
-        log_answer_outcome(user_id, question, answer)
-        return {"question": question, "answer": answer, "sources": []}
+        REFUSALS.inc(reason="below_threshold")
+        return []
 
     # NOTE:
     # We allow broad but semantically related questions if retrieval confidence is high.
     avg_score = sum(r["score"] for r in filtered) / len(filtered)
     if avg_score < 0.5:
-        answer = "I don't know based on the provided context."
-        log_answer_outcome(user_id, question, answer)
-        return {"question": question, "answer": answer, "sources": []}
+        REFUSALS.inc(reason="low_confidence")
+        return []
+
+    # Positions travel with the chunks so stored vectors can be looked up later
+    return [{**r["chunk"], "position": r["position"]} for r in filtered]
+
+
+def fuse_hybrid(
+    vector_store: FAISSVectorStore,
+    query_embedding: np.ndarray,
+    dense: list,
+    lexical: list,
+) -> list:
+    """
+    Weighted sum of cosine similarity and max-normalized BM25. Candidates
+    found only lexically get their exact cosine from the index, so every
+    candidate is scored on both signals.
+    """
+    candidates = {r["position"]: r for r in dense}
+    bm25 = {r["position"]: r["bm25"] for r in lexical}
+
+    missing = [r for r in lexical if r["position"] not in candidates]
+    if missing:
+        cosines = vector_store.similarity(query_embedding, [r["position"] for r in missing])
+        for r, cosine in zip(missing, cosines):
+            candidates[r["position"]] = {
+                "chunk": r["chunk"],
+                "score": float(cosine),
+                "position": r["position"],
+            }
+
+    top_bm25 = max(bm25.values(), default=0.0)
+    fused = []
+    for position, r in candidates.items():
+        lexical_score = bm25.get(position, 0.0) / top_bm25 if top_bm25 else 0.0
+        fused.append({**r, "score": HYBRID_ALPHA * r["score"] + (1 - HYBRID_ALPHA) * lexical_score})
+
+    fused.sort(key=lambda r: r["score"], reverse=True)
+    return fused[:TOP_K]
+
+
+def retrieve_final_chunks(
+    user_id: str,
+    question: str,
+    doc_id: Optional[str],
+    vector_store: FAISSVectorStore,
+    query_embedding: np.ndarray,
+    lexical_hits: Optional[list] = None,
+) -> list:
+    """
+    Dense retrieval for /ask, fused with `lexical_hits` in hybrid mode.
+    """
+    # Optional document filter, applied inside the search itself. The store
+    # locks itself, so searches never wait on ingestion or purging.
+    with STAGE_SECONDS.time(route="ask", stage="search"):
+        retrieved = vector_store.search(query_embedding, top_k=TOP_K, doc_id=doc_id or None)
 
-    final_chunks = [r["chunk"] for r in filtered]
+        if lexical_hits is not None:
+            retrieved = fuse_hybrid(vector_store, query_embedding, retrieved, lexical_hits)
 
-    answer = llm_service.generate_answer(
-        question,
-        [c["text"] for c in final_chunks],
+    return gate_retrieved(user_id, question, retrieved)
+
+
+def search_lexical(vector_store: FAISSVectorStore, question: str, doc_id: Optional[str]) -> list:
+    with STAGE_SECONDS.time(route="ask", stage="lexical_search"):
+        return vector_store.lexical_search(question, top_k=TOP_K, doc_id=doc_id or None)
+
+
+def retrieve_lexical_chunks(
+    user_id: str,
+    question: str,
+    hits: list,
+    require_all_terms: bool = False,
+) -> list:
+    """
+    BM25-only retrieval from `hits` of search_lexical. A chunk's score is
+    the share of query terms it contains, so the usual threshold and
+    confidence gate still apply.
+    """
+    retrieved = [
+        {"chunk": h["chunk"], "score": h["coverage"], "position": h["position"]}
+        for h in hits
+        if h["coverage"] == 1.0 or not require_all_terms
+    ]
+    return gate_retrieved(user_id, question, retrieved)
+
+
+def is_keyword_query(question: str) -> bool:
+    words = question.split()
+    return (
+        0 < len(words) <= LEXICAL_FAST_PATH_MAX_WORDS
+        and "?" not in question
+        and bool(analyze(question))
     )
 
-    if is_refusal(answer):
-        clean = "I don't know based on the provided context."
-        log_answer_outcome(user_id, question, clean)
-        return {"question": question, "answer": clean, "sources": []}
 
-    unique_sources = {
+def unique_sources(chunks: list) -> list:
+    sources = {
         (c["metadata"]["source"], c["metadata"]["page"]): c["metadata"]
-        for c in final_chunks
+        for c in chunks
     }
+    return list(sources.values())
+
+
+async def answer_from_embedding(
+    user_id: str,
+    question: str,
+    doc_id: Optional[str],
+    vector_store: FAISSVectorStore,
+    query_embedding: np.ndarray,
+    lexical_hits: Optional[list] = None,
+) -> dict:
+    final_chunks = retrieve_final_chunks(
+        user_id,
+        question,
+        doc_id,
+        vector_store,
+        query_embedding,
+        lexical_hits,
+    )
+    return await answer_from_chunks(user_id, question, final_chunks, vector_store)
+
+
+async def answer_from_chunks(
+    user_id: str,
+    question: str,
+    final_chunks: list,
+    vector_store: Optional[FAISSVectorStore] = None,
+) -> dict:
+    if not final_chunks:
+        log_answer_outcome(user_id, question, REFUSAL_ANSWER)
+        return {"question": question, "answer": REFUSAL_ANSWER, "sources": []}
+
+    try:
+        with STAGE_SECONDS.time(route="ask", stage="llm"):
+            answer = await llm_service.agenerate_answer(
+                question,
+                [c["text"] for c in final_chunks],
+            )
+    except LLMUnavailableError:
+        raise HTTPException(
+            status_code=503,
+            detail="AI service is currently unavailable",
+        )
+
+    if is_refusal(answer):
+        REFUSALS.inc(reason="llm")
+        log_answer_outcome(user_id, question, REFUSAL_ANSWER)
+        return {"question": question, "answer": REFUSAL_ANSWER, "sources": []}
 
     log_answer_outcome(user_id, question, answer)
+    if vector_store is not None:
+        faithfulness_sampler.offer(user_id, question, answer, vector_store, [c["position"] for c in final_chunks])
 
     return {
         "question": question,
         "answer": answer,
-        "sources": list(unique_sources.values()),
+        "sources": unique_sources(final_chunks),
     }
+
+
+@router.post("/ask")
+async def ask_question(
+    question: str,
+    doc_id: Optional[str] = None,
+    mode: Optional[str] = None,
+    current_user: dict = Depends(get_current_user),
+):
+    user_id = current_user["username"]
+    await asyncio.to_thread(check_query_rate, user_id)
+
+    mode = mode or RETRIEVAL_MODE
+    if mode not in RETRIEVAL_MODES:
+        raise HTTPException(status_code=400, detail=f"mode must be one of {', '.join(RETRIEVAL_MODES)}")
+
+    vector_store = get_user_vector_store(user_id)
+    if vector_store is None:
+        raise HTTPException(status_code=400, detail="No documents indexed yet")
+
+    normalized_question = normalize_question(question)
+    version = get_index_version(user_id)
+
+    cached = None
+    if answer_cache is not None:
+        cached = answer_cache.get_exact(user_id, version, normalized_question, doc_id, mode)
+
+    lexical_hits = None
+    if cached is None and (mode == "lexical" or (mode == "hybrid" and is_keyword_query(question))):
+        # Keyword lookups never touch the embedding model; in hybrid mode
+        # they fall through to fusion (reusing these hits) unless every
+        # term matched.
+        lexical_hits = await asyncio.to_thread(search_lexical, vector_store, question, doc_id)
+        final_chunks = retrieve_lexical_chunks(user_id, question, lexical_hits, mode == "hybrid")
+        if final_chunks or mode == "lexical":
+            response = await answer_from_chunks(user_id, question, final_chunks, vector_store)
+            if answer_cache is not None:
+                answer_cache.put(user_id, version, normalized_question, doc_id, None, response, mode)
+            return response
+
+    query_embedding = None
+    lexical_task = None
+    if cached is None:
+        if mode == "hybrid" and lexical_hits is None:
+            # BM25 runs in a worker thread while the query is embedded
+            lexical_task = asyncio.ensure_future(asyncio.to_thread(
+                search_lexical,
+                vector_store,
+                question,
+                doc_id,
+            ))
+
+        with STAGE_SECONDS.time(route="ask", stage="embed"):
+            query_embedding = await query_batcher.embed(normalized_question)
+        if answer_cache is not None:
+            cached = answer_cache.get_semantic(user_id, version, doc_id, query_embedding, mode)
+
+    if cached is not None:
+        log_answer_outcome(user_id, question, cached["answer"])
+        return {**cached, "question": question}
+
+    response = await answer_from_embedding(
+        user_id,
+        question,
+        doc_id,
+        vector_store,
+        query_embedding,
+        await lexical_task if lexical_task is not None else lexical_hits,
+    )
+
+    if answer_cache is not None:
+        answer_cache.put(
+            user_id,
+            version,
+            normalized_question,
+            doc_id,
+            query_embedding,
+            response,
+            mode,
+        )
+
+    return response
+
+
+# =========================
+# Batch ask endpoint
+# =========================
+
+@router.post("/ask-batch")
+async def ask_batch(
+    request: AskBatchRequest,
+    current_user: dict = Depends(get_current_user),
+):
+    """
+    Answers many questions with one embedding call and one matrix search.
+    Retrieval cost stays nearly flat in the number of questions; LLM
+    calls run concurrently up to ASK_BATCH_LLM_CONCURRENCY.
+    """
+    user_id = current_user["username"]
+    questions = request.questions
+    doc_id = request.doc_id
+
+    if not questions:
+        raise HTTPException(status_code=400, detail="No questions given")
+    if len(questions) > ASK_BATCH_MAX_QUESTIONS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {ASK_BATCH_MAX_QUESTIONS} questions per batch",
+        )
+
+    # Every question counts against the rate limit, as it would via /ask
+    await asyncio.to_thread(check_query_rate, user_id, cost=len(questions))
+
+    vector_store = get_user_vector_store(user_id)
+    if vector_store is None:
+        raise HTTPException(status_code=400, detail="No documents indexed yet")
+
+    normalized = [normalize_question(q) for q in questions]
+    version = get_index_version(user_id)
+
+    with STAGE_SECONDS.time(route="ask_batch", stage="embed"):
+        query_embeddings = await asyncio.to_thread(embedding_service.embed_queries, normalized)
+    with STAGE_SECONDS.time(route="ask_batch", stage="search"):
+        retrieved_rows = await asyncio.to_thread(
+            vector_store.search_batch,
+            query_embeddings,
+            TOP_K,
+            doc_id or None,
+        )
+
+    semaphore = asyncio.Semaphore(ASK_BATCH_LLM_CONCURRENCY)
+
+    async def answer(i: int) -> dict:
+        question = questions[i]
+        embedding = query_embeddings[i:i + 1]
+
+        if answer_cache is not None:
+            cached = (
+                answer_cache.get_exact(user_id, version, normalized[i], doc_id)
+                or answer_cache.get_semantic(user_id, version, doc_id, embedding)
+            )
+            if cached is not None:
+                log_answer_outcome(user_id, question, cached["answer"])
+                return {**cached, "question": question}
+
+        final_chunks = gate_retrieved(user_id, question, retrieved_rows[i])
+
+        async with semaphore:
+            try:
+                response = await answer_from_chunks(user_id, question, final_chunks, vector_store)
+            except HTTPException as exc:
+                # One unavailable answer should not fail the whole batch
+                return {"question": question, "answer": None, "sources": [], "error": exc.detail}
+
+        if answer_cache is not None:
+            answer_cache.put(user_id, version, normalized[i], doc_id, embedding, response)
+        return response
+
+    return {"results": await asyncio.gather(*(answer(i) for i in range(len(questions))))}
+
+
+# =========================
+# Streaming ask endpoint
+# =========================
+
+def sse_event(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+async def stream_answer_events(
+    user_id: str,
+    question: str,
+    normalized_question: str,
+    doc_id: Optional[str],
+    vector_store: FAISSVectorStore,
+    version: int,
+) -> AsyncIterator[str]:
+    cached = None
+    if answer_cache is not None:
+        cached = answer_cache.get_exact(user_id, version, normalized_question, doc_id)
+
+    query_embedding = None
+    if cached is None:
+        with STAGE_SECONDS.time(route="ask", stage="embed"):
+            query_embedding = await query_batcher.embed(normalized_question)
+        if answer_cache is not None:
+            cached = answer_cache.get_semantic(user_id, version, doc_id, query_embedding)
+
+    if cached is not None:
+        log_answer_outcome(user_id, question, cached["answer"])
+        yield sse_event("sources", {"sources": cached["sources"]})
+        yield sse_event("token", {"text": cached["answer"]})
+        yield sse_event("done", {**cached, "question": question, "refused": is_refusal(cached["answer"])})
+        return
+
+    final_chunks = retrieve_final_chunks(
+        user_id,
+        question,
+        doc_id,
+        vector_store,
+        query_embedding,
+    )
+
+    sources = unique_sources(final_chunks)
+    yield sse_event("sources", {"sources": sources})
+
+    answer = ""
+    held_back = ""
+    refused = not final_chunks
+
+    if final_chunks:
+        tokens = llm_service.astream_answer(question, [c["text"] for c in final_chunks])
+        llm_started = time.perf_counter()
+        try:
+            async for token in tokens:
+                answer += token
+
+                # Cut generation short as soon as the model starts refusing
+                if is_refusal(answer):
+                    refused = True
+                    break
+
+                if may_become_refusal(answer):
+                    held_back += token
+                    continue
+
+                yield sse_event("token", {"text": held_back + token})
+                held_back = ""
+        except LLMUnavailableError:
+            yield sse_event("error", {"detail": "AI service is currently unavailable"})
+            return
+        finally:
+            await tokens.aclose()
+            STAGE_SECONDS.observe(time.perf_counter() - llm_started, route="ask_stream", stage="llm")
+
+        if refused:
+            REFUSALS.inc(reason="llm")
+        if held_back and not refused:
+            yield sse_event("token", {"text": held_back})
+
+    if refused:
+        response = {"question": question, "answer": REFUSAL_ANSWER, "sources": []}
+    else:
+        response = {"question": question, "answer": answer.strip(), "sources": sources}
+
+    log_answer_outcome(user_id, question, response["answer"])
+    if not refused:
+        faithfulness_sampler.offer(
+            user_id, question, response["answer"], vector_store, [c["position"] for c in final_chunks]
+        )
+
+    if answer_cache is not None:
+        answer_cache.put(
+            user_id,
+            version,
+            normalized_question,
+            doc_id,
+            query_embedding,
+            response,
+        )
+
+    yield sse_event("done", {**response, "refused": refused})
+
+
+@router.post("/ask-stream")
+async def ask_question_stream(
+    question: str,
+    doc_id: Optional[str] = None,
+    current_user: dict = Depends(get_current_user),
+):
+    """
+    Server-Sent Events variant of /ask: a `sources` event, then `token`
+    events as the model generates, then a final `done` event carrying the
+    full response. If the model refuses, `done` has `refused: true` and
+    no sources.
+    """
+    user_id = current_user["username"]
+    await asyncio.to_thread(check_query_rate, user_id)
+
+    vector_store = get_user_vector_store(user_id)
+    if vector_store is None:
+        raise HTTPException(status_code=400, detail="No documents indexed yet")
+
+    events = stream_answer_events(
+        user_id,
+        question,
+        normalize_question(question),
+        doc_id,
+        vector_store,
+        get_index_version(user_id),
+    )
+
+    return StreamingResponse(
+        events,
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -1,114 +1,153 @@
-from fastapi import APIRouter, Depends
+import os
+from typing import List
+
+from fastapi import APIRouter, Depends, HTTPException, Query, status
 from app.auth import get_current_user
 
-from app.rag_eval.retrieval_evaluator import (
-    evaluate_retrieval,
-    load_eval_dataset,
-)
-from app.rag_eval.faithfulness_evaluator import evaluate_faithfulness
-from app.rag_eval.rag_adapters import (
-    retrieve_chunks_adapter,
-    generate_answer_adapter,
+from app.jobs import JobQueue
+from app.rag_eval.eval_runner import (
+    new_run_id,
+    read_results,
+    read_run_meta,
+    run_eval,
+    summarize,
+    write_run_meta,
 )
+from app.rag_eval.retrieval_evaluator import load_eval_dataset
+from app.rag_eval.retrieval_sweep import DEFAULT_K_VALUES, DEFAULT_THRESHOLDS, sweep_retrieval
+from app.rag_eval.rag_adapters import get_user_vector_store, embedding_service
+from app.api.v1.routes.rag import FAITHFULNESS_SIMILARITY
 
 
-def user_has_required_sources(retrieved_chunks, required_sources):
-    if not required_sources:
-        return True
+# =========================
+# Eval run configuration
+# =========================
 
-    present_sources = {
-        c["source"].lower() for c in retrieved_chunks
-    }
+EVAL_DATASET_PATH = os.getenv("EVAL_DATASET_PATH", "app/rag_eval/eval_dataset.json")
+EVAL_JOB_WORKERS = int(os.getenv("EVAL_JOB_WORKERS", 1))
+# Dataset items (and so LLM calls) in flight per run
+EVAL_LLM_CONCURRENCY = int(os.getenv("EVAL_LLM_CONCURRENCY", 4))
 
-    for required in required_sources:
-        required = required.lower()
-        for present in present_sources:
-            if required in present:
-                return True
+eval_jobs = JobQueue(workers=EVAL_JOB_WORKERS)
+# run_id -> id of the latest job that ran it in this process
+run_jobs: dict[str, str] = {}
 
-    return False
 
+router = APIRouter(prefix="/rag/eval", tags=["RAG Evaluation"])
 
 
-router = APIRouter(prefix="/rag/eval", tags=["RAG Evaluation"])
+def submit_run(user_id: str, run_id: str, dataset_path: str) -> dict:
+    write_run_meta(user_id, run_id, dataset=dataset_path, status="queued")
+    job_id = eval_jobs.submit(
+        user_id,
+        "eval",
+        run_eval,
+        user_id,
+        run_id,
+        dataset_path,
+        EVAL_LLM_CONCURRENCY,
+        progress=eval_jobs.update,
+        faithfulness_threshold=FAITHFULNESS_SIMILARITY,
+    )
+    run_jobs[run_id] = job_id
 
+    return {
+        "message": "Evaluation run accepted.",
+        "run_id": run_id,
+        "job_id": job_id,
+        "status_url": f"/api/v1/rag/eval/runs/{run_id}",
+    }
 
-@router.post("/")
+
+@router.post("/", status_code=status.HTTP_202_ACCEPTED)
 def evaluate_rag(
     current_user: dict = Depends(get_current_user),
 ):
+    """
+    Starts an evaluation run over the dataset as a background job.
+    Results are checkpointed per item; poll the status URL for progress.
+    """
+    user_id = current_user["username"]
+    return submit_run(user_id, new_run_id(), EVAL_DATASET_PATH)
+
+
+@router.post("/runs/{run_id}/resume", status_code=status.HTTP_202_ACCEPTED)
+def resume_eval_run(
+    run_id: str,
+    current_user: dict = Depends(get_current_user),
+):
+    """Re-runs the items a crashed or failed run had not finished."""
     user_id = current_user["username"]
+    meta = read_run_meta(user_id, run_id)
+    if meta is None:
+        raise HTTPException(status_code=404, detail="Run not found")
 
-    dataset = load_eval_dataset("app/rag_eval/eval_dataset.json")
-    results = []
-
-    for item in dataset:
-        question = item["question"]
-        required_sources = item.get("required_sources", [])
-
-        # 1️⃣ Retrieve chunks (REAL pipeline)
-        retrieved_chunks = retrieve_chunks_adapter(
-            question=question,
-            user_id=user_id,
-        )
-
-        # 🚦 NEW: document-aware evaluation gate
-        if not user_has_required_sources(
-            retrieved_chunks,
-            required_sources,
-        ):
-            results.append({
-                "question_id": item["id"],
-                "question": question,
-                "skipped": True,
-                "reason": "required_documents_not_present",
-            })
-            continue
-
-        # 2️⃣ Evaluate retrieval quality
-        retrieval_result = evaluate_retrieval(
-            retrieved_chunks=retrieved_chunks,
-            expected_keywords=item["expected_keywords"],
-            expected_source=item["expected_source"],
-        )
-
-        # 3️⃣ Generate answer (REAL LLM)
-        answer = generate_answer_adapter(
-            question=question,
-            chunks=retrieved_chunks,
-        )
-
-        # 4️⃣ Faithfulness check
-        combined_context = " ".join(
-            c["content"] for c in retrieved_chunks
-        )
-
-        faithfulness_result = evaluate_faithfulness(
-            answer=answer,
-            retrieved_context=combined_context,
-        )
-
-        results.append({
-            "question_id": item["id"],
-            "question": question,
-            "answer": answer,
-            "retrieval": retrieval_result,
-            "faithfulness": faithfulness_result,
-        })
+    job = eval_jobs.get(run_jobs.get(run_id, ""), owner=user_id)
+    if job is not None and job["status"] in ("queued", "running"):
+        raise HTTPException(status_code=409, detail="Run is already in progress")
+
+    return submit_run(user_id, run_id, meta["dataset"])
+
+
+@router.get("/runs/{run_id}")
+def get_eval_run(
+    run_id: str,
+    offset: int = 0,
+    limit: int = 100,
+    current_user: dict = Depends(get_current_user),
+):
+    """
+    Run status plus the results checkpointed so far, in completion order.
+    """
+    user_id = current_user["username"]
+    meta = read_run_meta(user_id, run_id)
+    if meta is None:
+        raise HTTPException(status_code=404, detail="Run not found")
+
+    job = eval_jobs.get(run_jobs.get(run_id, ""), owner=user_id)
+    results = read_results(user_id, run_id)
+
+    if job is not None:
+        run_status, error = job["status"], job["error"]
+    else:
+        # Job record gone (restart or pruned): a run left "running" was interrupted
+        run_status = meta.get("status", "unknown")
+        run_status = "interrupted" if run_status in ("queued", "running") else run_status
+        error = None
 
     return {
-        "summary": {
-            "total": len(results),
-            "passed": sum(
-                1 for r in results
-                if not r.get("skipped")
-                and r["retrieval"]["passed"]
-                and r["faithfulness"]["faithful"]
-            ),
-            "skipped": sum(
-                1 for r in results
-                if r.get("skipped")
-            ),
-        },
-        "details": results,
+        "run_id": run_id,
+        "status": run_status,
+        "error": error,
+        "total": meta.get("total"),
+        "completed": len(results),
+        "summary": summarize(results),
+        "details": results[offset:offset + limit],
     }
+
+
+@router.post("/retrieval")
+def evaluate_retrieval_sweep(
+    k: List[int] = Query(list(DEFAULT_K_VALUES)),
+    threshold: List[float] = Query(list(DEFAULT_THRESHOLDS)),
+    current_user: dict = Depends(get_current_user),
+):
+    """
+    Retrieval-only evaluation (no LLM) for every TOP_K x MIN_SIMILARITY_SCORE
+    pair, from one batched embed and one search at the largest k.
+    """
+    user_id = current_user["username"]
+    if not k or min(k) < 1 or max(k) > 100:
+        raise HTTPException(status_code=400, detail="k values must be between 1 and 100")
+
+    vector_store = get_user_vector_store(user_id)
+    if vector_store is None:
+        raise HTTPException(status_code=400, detail="No documents indexed yet")
+
+    return sweep_retrieval(
+        load_eval_dataset(EVAL_DATASET_PATH),
+        vector_store,
+        embedding_service,
+        k_values=k,
+        thresholds=threshold,
+    )
@@ -1,12 +1,21 @@
 from datetime import datetime, timedelta
+import asyncio
+import hashlib
+import multiprocessing
 import os
-from typing import Optional
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from threading import Lock
+from typing import Dict, Optional, Tuple
 
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import jwt, JWTError
 from passlib.context import CryptContext
 
+from app.metrics import PASSWORD_PENDING, PASSWORD_QUEUE_SECONDS, PASSWORD_REJECTIONS, PASSWORD_VERIFY_SECONDS
+
 
 # =========================
 # Config
@@ -16,6 +25,12 @@ SECRET_KEY = os.getenv("SECRET_KEY", "unsafe-default")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 60
 
+# argon2 verification runs in its own processes, off the shared threadpool
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", 2))
+# Logins waiting beyond this are refused with 503 instead of queueing forever
+PASSWORD_HASH_MAX_PENDING = int(os.getenv("PASSWORD_HASH_MAX_PENDING", 32))
+JWT_CACHE_MAX_ENTRIES = int(os.getenv("JWT_CACHE_MAX_ENTRIES", 1024))
+
 
 # =========================
 # Password hashing (bcrypt)
@@ -37,10 +52,12 @@ fake_users_db = {
     "user1": {
         "username": "user1",
         "hashed_password": "$argon2id$v=19$m=65536,t=3,p=4$glAKgbA2BuCc03ovZSwFQA$3MdkcVPoBxCVHeNfYRUu55DLO9lgvVBqqklJxzEbxcU",
+        "tier": "free",
     },
     "user2": {
         "username": "user2",
         "hashed_password": "$argon2id$v=19$m=65536,t=3,p=4$glAKgbA2BuCc03ovZSwFQA$3MdkcVPoBxCVHeNfYRUu55DLO9lgvVBqqklJxzEbxcU",
+        "tier": "free",
     },
 }
 
@@ -56,6 +73,153 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
 
 
+def _verify_in_worker(plain_password: str, hashed_password: str) -> Tuple[bool, float, float]:
+    # Runs in a pool process; wall-clock timestamps let the parent split
+    # queue time from hashing time
+    started = time.time()
+    ok = verify_password(plain_password, hashed_password)
+    return ok, started, time.time()
+
+
+class PasswordVerifier:
+    """
+    Bounded process pool for password verification, with queue metrics.
+    At most `max_pending` verifications are queued or running; beyond
+    that, callers get a 503 rather than an ever-growing wait. Queue and
+    verify times and the pending count are also recorded in the metrics
+    registry.
+    """
+
+    def __init__(self, workers: int = PASSWORD_HASH_WORKERS, max_pending: int = PASSWORD_HASH_MAX_PENDING):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.executor: Optional[ProcessPoolExecutor] = None
+        self.lock = Lock()
+
+        self.pending = 0
+        self.completed = 0
+        self.rejected = 0
+        self.queue_ms_total = 0.0
+        self.queue_ms_max = 0.0
+        self.verify_ms_total = 0.0
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        # Started on first use, so importing the app spawns no processes.
+        # "spawn" rather than fork: the server is multithreaded with
+        # torch/faiss loaded, which a forked child can deadlock on.
+        if self.executor is None:
+            self.executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return self.executor
+
+    async def verify(self, plain_password: str, hashed_password: str) -> bool:
+        with self.lock:
+            if self.pending >= self.max_pending:
+                self.rejected += 1
+                PASSWORD_REJECTIONS.inc()
+                raise HTTPException(
+                    status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                    detail="Too many concurrent logins, retry shortly",
+                    headers={"Retry-After": "1"},
+                )
+            self.pending += 1
+            PASSWORD_PENDING.inc()
+            executor = self._get_executor()
+
+        submitted = time.time()
+        try:
+            ok, started, finished = await asyncio.wrap_future(
+                executor.submit(_verify_in_worker, plain_password, hashed_password)
+            )
+        finally:
+            with self.lock:
+                self.pending -= 1
+                PASSWORD_PENDING.dec()
+
+        queue_seconds = max(started - submitted, 0.0)
+        verify_seconds = max(finished - started, 0.0)
+        PASSWORD_QUEUE_SECONDS.observe(queue_seconds)
+        PASSWORD_VERIFY_SECONDS.observe(verify_seconds)
+        with self.lock:
+            self.completed += 1
+            self.queue_ms_total += queue_seconds * 1000
+            self.queue_ms_max = max(self.queue_ms_max, queue_seconds * 1000)
+            self.verify_ms_total += verify_seconds * 1000
+        return ok
+
+    def stats(self) -> Dict:
+        with self.lock:
+            done = self.completed or 1
+            return {
+                "workers": self.workers,
+                "pending": self.pending,
+                "max_pending": self.max_pending,
+                "completed": self.completed,
+                "rejected": self.rejected,
+                "avg_queue_ms": round(self.queue_ms_total / done, 2),
+                "max_queue_ms": round(self.queue_ms_max, 2),
+                "avg_verify_ms": round(self.verify_ms_total / done, 2),
+                "queue_seconds_histogram": PASSWORD_QUEUE_SECONDS.counts(),
+            }
+
+
+password_verifier = PasswordVerifier()
+
+
+# =========================
+# Validated token cache
+# =========================
+
+class TokenCache:
+    """
+    LRU of validated JWTs: sha256(token) -> (username, exp). Entries are
+    only served before their `exp`, so caching never extends a token.
+    """
+
+    def __init__(self, max_entries: int = JWT_CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self.entries: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+        self.lock = Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(token: str) -> str:
+        return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+    def get(self, token: str) -> Optional[str]:
+        key = self.make_key(token)
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None or entry[1] <= time.time():
+                if entry is not None:
+                    del self.entries[key]
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, token: str, username: str, exp: float):
+        if self.max_entries <= 0:
+            return
+        key = self.make_key(token)
+        with self.lock:
+            self.entries[key] = (username, exp)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def stats(self) -> Dict:
+        with self.lock:
+            return {"entries": len(self.entries), "hits": self.hits, "misses": self.misses}
+
+
+token_cache = TokenCache()
+
+
 def authenticate_user(username: str, password: str) -> Optional[dict]:
     user = fake_users_db.get(username)
     if not user:
@@ -65,6 +229,16 @@ def authenticate_user(username: str, password: str) -> Optional[dict]:
     return user
 
 
+async def authenticate_user_async(username: str, password: str) -> Optional[dict]:
+    """authenticate_user with the argon2 check on the password pool."""
+    user = fake_users_db.get(username)
+    if not user:
+        return None
+    if not await password_verifier.verify(password, user["hashed_password"]):
+        return None
+    return user
+
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
     expire = datetime.utcnow() + (
@@ -81,13 +255,18 @@ def get_current_user(token: str = Depends(oauth2_scheme)) -> dict:
         headers={"WWW-Authenticate": "Bearer"},
     )
 
-    try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        username: str = payload.get("sub")
-        if username is None:
+    username = token_cache.get(token)
+    if username is None:
+        try:
+            payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+            username = payload.get("sub")
+            if username is None:
+                raise credentials_exception
+        except JWTError:
             raise credentials_exception
-    except JWTError:
-        raise credentials_exception
+        # Tokens without exp are still validated every time
+        if "exp" in payload:
+            token_cache.put(token, username, float(payload["exp"]))
 
     user = fake_users_db.get(username)
     if user is None:
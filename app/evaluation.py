@@ -1,5 +1,144 @@
+import atexit
+import json
+import logging
+import os
+import queue
+import threading
 from datetime import datetime
-from typing import List, Dict
+from typing import List, Dict, Optional
+
+from app.metrics import ANSWERS, REQUEST_LOG_WRITE_ERRORS
+
+logger = logging.getLogger(__name__)
+
+
+# =========================
+# Request log configuration
+# =========================
+
+REQUEST_LOG_ENABLED = os.getenv("REQUEST_LOG_ENABLED", "true").lower() == "true"
+REQUEST_LOG_PATH = os.getenv("REQUEST_LOG_PATH", "data/logs/requests.jsonl")
+REQUEST_LOG_FLUSH_SECONDS = float(os.getenv("REQUEST_LOG_FLUSH_SECONDS", 1.0))
+REQUEST_LOG_MAX_QUEUE = int(os.getenv("REQUEST_LOG_MAX_QUEUE", 10_000))
+
+
+class JsonlWriter:
+    """
+    Non-blocking JSONL log. `write` only enqueues the record; a daemon
+    thread appends queued records in batches at least every
+    `flush_seconds`. When the queue is full, records are dropped (and
+    counted) rather than slowing requests down.
+
+    Each batch goes out as a single write() on an O_APPEND descriptor, so
+    every uvicorn worker can append to the same file without splitting or
+    interleaving each other's lines.
+
+    A failed write (full disk, removed directory) drops that batch, counts
+    and logs it, and the file is reopened for the next batch. `close`
+    flushes what is queued; it also runs at interpreter exit.
+    """
+
+    def __init__(self, path: str, flush_seconds: float = 1.0, max_queue: int = 10_000):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self.path = path
+        self.flush_seconds = flush_seconds
+        self.queue: "queue.Queue[Optional[Dict]]" = queue.Queue(maxsize=max_queue)
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+        self.closed = False
+
+        self.worker = threading.Thread(target=self._run, name="jsonl-writer", daemon=True)
+        self.worker.start()
+        atexit.register(self.close)
+
+    def write(self, record: Dict):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def close(self, timeout: float = 5.0):
+        """Writes out queued records and stops the worker thread."""
+        if self.closed:
+            return
+        self.closed = True
+        try:
+            # The sentinel queues behind every pending record
+            self.queue.put(None, timeout=timeout)
+        except queue.Full:
+            logger.warning("request log queue still full at close; %d records lost", self.queue.qsize())
+            return
+        self.worker.join(timeout)
+
+    def _run(self):
+        fd = None
+        try:
+            while True:
+                try:
+                    batch = [self.queue.get(timeout=self.flush_seconds)]
+                except queue.Empty:
+                    continue
+                while batch[-1] is not None:
+                    try:
+                        batch.append(self.queue.get_nowait())
+                    except queue.Empty:
+                        break
+
+                closing = batch[-1] is None
+                if closing:
+                    batch.pop()
+                if batch:
+                    fd = self._write_batch(fd, batch)
+                if closing:
+                    return
+        finally:
+            if fd is not None:
+                os.close(fd)
+
+    def _write_batch(self, fd: Optional[int], batch: List[Dict]) -> Optional[int]:
+        data = "".join(json.dumps(record, default=str) + "\n" for record in batch).encode("utf-8")
+        try:
+            if fd is None:
+                fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            written = os.write(fd, data)
+            # Regular files only write short on errors such as a full disk
+            while written < len(data):
+                written += os.write(fd, data[written:])
+        except OSError as exc:
+            self.failed += len(batch)
+            REQUEST_LOG_WRITE_ERRORS.inc()
+            logger.warning("request log write to %s failed, %d records dropped: %s", self.path, len(batch), exc)
+            if fd is not None:
+                os.close(fd)
+            return None
+
+        self.written += len(batch)
+        return fd
+
+    def stats(self) -> Dict:
+        return {
+            "path": self.path,
+            "queued": self.queue.qsize(),
+            "written": self.written,
+            "dropped": self.dropped,
+            "failed": self.failed,
+        }
+
+
+request_log = (
+    JsonlWriter(REQUEST_LOG_PATH, REQUEST_LOG_FLUSH_SECONDS, REQUEST_LOG_MAX_QUEUE)
+    if REQUEST_LOG_ENABLED
+    else None
+)
+
+
+def _log(event: str, metrics: Dict):
+    if request_log is not None:
+        request_log.write({"event": event, **metrics})
 
 
 def log_retrieval_metrics(
@@ -21,7 +160,7 @@ def log_retrieval_metrics(
         "passed_threshold": any(s >= threshold for s in scores),
     }
 
-    print("[RAG RETRIEVAL METRICS]", metrics)
+    _log("retrieval", metrics)
 
 
 def log_answer_outcome(
@@ -30,6 +169,7 @@ def log_answer_outcome(
     answer: str,
 ):
     outcome = "refused" if answer.lower().startswith("i don't know") else "answered"
+    ANSWERS.inc(outcome=outcome)
 
     metrics = {
         "timestamp": datetime.utcnow().isoformat(),
@@ -38,4 +178,19 @@ def log_answer_outcome(
         "outcome": outcome,
     }
 
-    print("[RAG ANSWER OUTCOME]", metrics)
+    _log("answer", metrics)
+
+
+def log_faithfulness(
+    user_id: str,
+    question: str,
+    result: Dict,
+):
+    metrics = {
+        "timestamp": datetime.utcnow().isoformat(),
+        "user_id": user_id,
+        "question": question,
+        **result,
+    }
+
+    _log("faithfulness", metrics)
@@ -0,0 +1,106 @@
+import os
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from threading import Lock
+from typing import Callable, Dict, Optional
+
+
+# =========================
+# Job queue configuration
+# =========================
+
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", 2))
+MAX_TRACKED_JOBS = int(os.getenv("MAX_TRACKED_JOBS", 1000))
+
+
+class JobQueue:
+    """
+    Bounded background worker pool with in-memory job status tracking.
+
+    Each submitted callable receives the job id as its first argument and
+    reports progress through `update`. Finished jobs are kept for status
+    queries until `max_tracked_jobs` is exceeded, oldest first.
+    """
+
+    def __init__(self, workers: int = JOB_WORKERS, max_tracked_jobs: int = MAX_TRACKED_JOBS):
+        self.executor = ThreadPoolExecutor(
+            max_workers=workers,
+            thread_name_prefix="job-worker",
+        )
+        self.max_tracked_jobs = max_tracked_jobs
+        self.jobs: "OrderedDict[str, Dict]" = OrderedDict()
+        self.lock = Lock()
+
+    def submit(self, owner: str, kind: str, fn: Callable, *args, **kwargs) -> str:
+        job_id = uuid.uuid4().hex
+
+        with self.lock:
+            self.jobs[job_id] = {
+                "job_id": job_id,
+                "owner": owner,
+                "kind": kind,
+                "status": "queued",
+                "progress": {},
+                "result": None,
+                "error": None,
+                "created_at": datetime.utcnow().isoformat(),
+                "finished_at": None,
+            }
+            self._prune()
+
+        self.executor.submit(self._run, job_id, fn, *args, **kwargs)
+        return job_id
+
+    def get(self, job_id: str, owner: Optional[str] = None) -> Optional[Dict]:
+        with self.lock:
+            job = self.jobs.get(job_id)
+            if job is None or (owner is not None and job["owner"] != owner):
+                return None
+            return {**job, "progress": dict(job["progress"])}
+
+    def update(self, job_id: str, **progress):
+        with self.lock:
+            job = self.jobs.get(job_id)
+            if job is not None:
+                job["progress"].update(progress)
+
+    def _run(self, job_id: str, fn: Callable, *args, **kwargs):
+        self._set(job_id, status="running")
+        try:
+            result = fn(job_id, *args, **kwargs)
+        except Exception as exc:
+            self._set(
+                job_id,
+                status="failed",
+                error=str(exc) or exc.__class__.__name__,
+                finished_at=datetime.utcnow().isoformat(),
+            )
+            return
+
+        self._set(
+            job_id,
+            status="completed",
+            result=result,
+            finished_at=datetime.utcnow().isoformat(),
+        )
+
+    def _set(self, job_id: str, **fields):
+        with self.lock:
+            job = self.jobs.get(job_id)
+            if job is not None:
+                job.update(fields)
+
+    def _prune(self):
+        # Only finished jobs are dropped; queued/running jobs stay visible.
+        excess = len(self.jobs) - self.max_tracked_jobs
+        if excess <= 0:
+            return
+
+        for job_id in list(self.jobs):
+            if excess <= 0:
+                break
+            if self.jobs[job_id]["status"] in ("completed", "failed"):
+                del self.jobs[job_id]
+                excess -= 1
@@ -1,10 +1,12 @@
 from fastapi import FastAPI, Depends, HTTPException
+from fastapi.responses import Response
 from fastapi.security import OAuth2PasswordRequestForm
 from datetime import timedelta
 from dotenv import load_dotenv
 
 from app.api.v1.routes import api_router
-from app.auth import authenticate_user, create_access_token
+from app.auth import authenticate_user_async, create_access_token
+from app.metrics import CONTENT_TYPE, registry
 
 load_dotenv()
 
@@ -18,8 +20,9 @@ app = FastAPI(
 app.include_router(api_router, prefix="/api/v1")
 
 @app.post("/login")
-def login(form_data: OAuth2PasswordRequestForm = Depends()):
-    user = authenticate_user(form_data.username, form_data.password)
+async def login(form_data: OAuth2PasswordRequestForm = Depends()):
+    # argon2 runs on the password process pool, not the shared threadpool
+    user = await authenticate_user_async(form_data.username, form_data.password)
 
     if not user:
         raise HTTPException(status_code=400, detail="Incorrect username or password")
@@ -33,3 +36,9 @@ def login(form_data: OAuth2PasswordRequestForm = Depends()):
         "access_token": access_token,
         "token_type": "bearer",
     }
+
+
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    # Prometheus scrape endpoint
+    return Response(registry.render(), media_type=CONTENT_TYPE)
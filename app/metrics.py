@@ -0,0 +1,285 @@
+import bisect
+import time
+from contextlib import contextmanager
+from threading import Lock
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+
+# =========================
+# Metric types
+# =========================
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _format_labels(labelnames: Sequence[str], values: Tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(labelnames, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.lock = Lock()
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self.values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0.0) + amount
+
+    def render(self) -> List[str]:
+        with self.lock:
+            values = dict(self.values)
+        return self.header() + [
+            f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+            for key, value in sorted(values.items())
+        ]
+
+
+class Gauge(_Metric):
+    """Set directly, or computed at scrape time by `callback`."""
+
+    kind = "gauge"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        callback: Optional[Callable[[], float]] = None,
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.values: Dict[Tuple[str, ...], float] = {}
+        self.callback = callback
+
+    def set(self, value: float, **labels):
+        key = self._key(labels)
+        with self.lock:
+            self.values[key] = value
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0.0) + amount
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+    def render(self) -> List[str]:
+        if self.callback is not None:
+            values = {(): self.callback()}
+        else:
+            with self.lock:
+                values = dict(self.values)
+        return self.header() + [
+            f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+            for key, value in sorted(values.items())
+        ]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # labels -> [per-bucket counts (+Inf last), sum, count]
+        self.values: Dict[Tuple[str, ...], list] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        slot = bisect.bisect_left(self.buckets, value)
+        with self.lock:
+            state = self.values.get(key)
+            if state is None:
+                state = self.values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][slot] += 1
+            state[1] += value
+            state[2] += 1
+
+    def counts(self, **labels) -> Dict[str, int]:
+        """Per-bucket (non-cumulative) counts, keyed le_<bound> and inf."""
+        key = self._key(labels)
+        with self.lock:
+            state = self.values.get(key)
+            counts = list(state[0]) if state else [0] * (len(self.buckets) + 1)
+        names = [f"le_{_format_value(bound)}" for bound in self.buckets] + ["inf"]
+        return dict(zip(names, counts))
+
+    @contextmanager
+    def time(self, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def render(self) -> List[str]:
+        with self.lock:
+            values = {key: (list(counts), total, count) for key, (counts, total, count) in self.values.items()}
+
+        lines = self.header()
+        for key, (counts, total, count) in sorted(values.items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {count}")
+        return lines
+
+
+# =========================
+# Registry
+# =========================
+
+class MetricsRegistry:
+    def __init__(self):
+        self.metrics: Dict[str, _Metric] = {}
+        self.lock = Lock()
+
+    def register(self, metric: _Metric) -> _Metric:
+        with self.lock:
+            if metric.name in self.metrics:
+                raise ValueError(f"Metric {metric.name} is already registered")
+            self.metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = (), callback=None) -> Gauge:
+        return self.register(Gauge(name, documentation, labelnames, callback))
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self) -> str:
+        """Prometheus text exposition format (version 0.0.4)."""
+        with self.lock:
+            metrics = list(self.metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+# =========================
+# Application metrics
+# =========================
+
+STAGE_SECONDS = registry.histogram(
+    "rag_stage_seconds",
+    "Latency of each request stage.",
+    ("route", "stage"),
+)
+ANSWERS = registry.counter(
+    "rag_answers_total",
+    "Answers returned, by outcome (answered or refused).",
+    ("outcome",),
+)
+REFUSALS = registry.counter(
+    "rag_refusals_total",
+    "Questions refused, by the check that refused them.",
+    ("reason",),
+)
+THRESHOLD_MISSES = registry.counter(
+    "rag_threshold_misses_total",
+    "Retrieved chunks dropped for scoring below MIN_SIMILARITY_SCORE.",
+)
+PURGES_DEFERRED = registry.counter(
+    "rag_purges_deferred_total",
+    "Tombstone purges postponed because an index upgrade or segment merge was running.",
+)
+FAITHFULNESS_FAILURES = registry.counter(
+    "rag_faithfulness_failures_total",
+    "Sampled answers whose faithfulness scoring raised an error.",
+)
+RATE_LIMIT_ERRORS = registry.counter(
+    "rag_rate_limit_errors_total",
+    "Rate limit checks whose counter backend failed, by fail mode (open or closed).",
+    ("mode",),
+)
+REQUEST_LOG_WRITE_ERRORS = registry.counter(
+    "rag_request_log_write_errors_total",
+    "Request log batches dropped because writing them to disk failed.",
+)
+
+QUERY_BATCH_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128)
+QUERY_BATCH_SIZE = registry.histogram(
+    "rag_query_embed_batch_size",
+    "Queries encoded per batched query-embedding call.",
+    buckets=QUERY_BATCH_BUCKETS,
+)
+QUERY_QUEUE_DEPTH = registry.histogram(
+    "rag_query_embed_queue_depth",
+    "Queries already waiting when a new query joins the embedding queue.",
+    buckets=QUERY_BATCH_BUCKETS,
+)
+
+PASSWORD_QUEUE_SECONDS = registry.histogram(
+    "auth_password_queue_seconds",
+    "Time a password verification waited for a free hashing worker.",
+)
+PASSWORD_VERIFY_SECONDS = registry.histogram(
+    "auth_password_verify_seconds",
+    "Time a hashing worker spent verifying one password.",
+)
+PASSWORD_PENDING = registry.gauge(
+    "auth_password_pending",
+    "Password verifications queued or running.",
+)
+PASSWORD_REJECTIONS = registry.counter(
+    "auth_password_rejections_total",
+    "Logins refused with 503 because the verification queue was full.",
+)
@@ -1,3 +1,5 @@
+from typing import List, Optional
+
 from pydantic import BaseModel
 
 class ChatRequest(BaseModel):
@@ -6,3 +8,7 @@ class ChatRequest(BaseModel):
 class ChatResponse(BaseModel):
     prompt: str
     response: str
+
+class AskBatchRequest(BaseModel):
+    questions: List[str]
+    doc_id: Optional[str] = None
@@ -1,7 +1,16 @@
-from datetime import datetime, timedelta
-from collections import defaultdict
+import json
+import logging
+import os
+from typing import Dict, Optional
+
 from fastapi import HTTPException, status
 
+from app.auth import fake_users_db
+from app.metrics import RATE_LIMIT_ERRORS
+from app.rate_limit import create_backend, retry_after_header
+
+logger = logging.getLogger(__name__)
+
 
 # =========================
 # Quota configuration
@@ -10,53 +19,94 @@ from fastapi import HTTPException, status
 MAX_UPLOADS_PER_DAY = 5
 MAX_QUERIES_PER_MINUTE = 10
 
+DEFAULT_TIER = os.getenv("DEFAULT_USER_TIER", "free")
 
-# =========================
-# In-memory stores
-# =========================
+# Per-tier limits; RATE_LIMIT_TIERS (JSON) overrides or adds tiers, e.g.
+# {"pro": {"uploads_per_day": 100, "queries_per_minute": 300}}
+TIER_LIMITS: Dict[str, Dict[str, float]] = {
+    "free": {"uploads_per_day": MAX_UPLOADS_PER_DAY, "queries_per_minute": MAX_QUERIES_PER_MINUTE},
+    "pro": {"uploads_per_day": 50, "queries_per_minute": 120},
+}
+for tier, limits in json.loads(os.getenv("RATE_LIMIT_TIERS", "{}")).items():
+    TIER_LIMITS[tier] = {**TIER_LIMITS.get(tier, TIER_LIMITS["free"]), **limits}
 
-user_uploads = defaultdict(list)   # user_id -> [timestamps]
-user_queries = defaultdict(list)   # user_id -> [timestamps]
+# "memory" (per process), "sqlite" (shared by all workers on a host) or
+# "network" (shared CounterStore; a local stand-in unless one is configured)
+RATE_LIMIT_BACKEND = os.getenv("RATE_LIMIT_BACKEND", "sqlite")
+RATE_LIMIT_SQLITE_PATH = os.getenv("RATE_LIMIT_SQLITE_PATH", "data/cache/rate_limits.sqlite3")
+# Longest wait for the SQLite write lock before the check counts as failed
+RATE_LIMIT_SQLITE_TIMEOUT = float(os.getenv("RATE_LIMIT_SQLITE_TIMEOUT", 0.25))
+# When the counter backend fails: "open" lets the request through,
+# "closed" refuses it with 503
+RATE_LIMIT_FAIL_MODE = os.getenv("RATE_LIMIT_FAIL_MODE", "open")
 
 
 # =========================
-# Helpers
+# Counter backend
 # =========================
 
-def _prune_old(entries: list, window: timedelta):
-    now = datetime.utcnow()
-    return [t for t in entries if now - t < window]
+limiter = create_backend(RATE_LIMIT_BACKEND, RATE_LIMIT_SQLITE_PATH, sqlite_timeout=RATE_LIMIT_SQLITE_TIMEOUT)
+
+
+def configure_rate_limiter(backend):
+    """Swaps the counter backend, e.g. for a NetworkBackend over Redis."""
+    global limiter
+    limiter = backend
 
 
 # =========================
-# Policy checks
+# Helpers
 # =========================
 
-def check_upload_quota(user_id: str):
-    now = datetime.utcnow()
-    window = timedelta(days=1)
+def get_user_tier(user_id: str) -> str:
+    user = fake_users_db.get(user_id) or {}
+    tier = user.get("tier", DEFAULT_TIER)
+    return tier if tier in TIER_LIMITS else DEFAULT_TIER
+
 
-    user_uploads[user_id] = _prune_old(user_uploads[user_id], window)
+def _enforce(user_id: str, name: str, window_seconds: float, cost: float, tier: Optional[str], detail: str):
+    tier = tier or get_user_tier(user_id)
+    limit = TIER_LIMITS[tier][name]
 
-    if len(user_uploads[user_id]) >= MAX_UPLOADS_PER_DAY:
+    # No amount of waiting makes this fit, so it is not a 429
+    if cost > limit:
         raise HTTPException(
-            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
-            detail="Daily upload quota exceeded",
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Request costs {cost:g}, above the {tier} tier limit of {limit:g} {name.replace('_', ' ')}",
         )
 
-    user_uploads[user_id].append(now)
+    try:
+        allowed, retry_after = limiter.hit(f"{name}:{user_id}", limit, window_seconds, cost)
+    except Exception as exc:
+        # A locked SQLite file or an unreachable store must not hang or
+        # crash requests; the configured fail mode decides
+        RATE_LIMIT_ERRORS.inc(mode=RATE_LIMIT_FAIL_MODE)
+        logger.warning("rate limit check %s failed (failing %s): %s", name, RATE_LIMIT_FAIL_MODE, exc)
+        if RATE_LIMIT_FAIL_MODE == "open":
+            return
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Rate limiter unavailable, retry shortly",
+            headers={"Retry-After": "1"},
+        )
+    if not allowed:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail=detail,
+            headers=retry_after_header(retry_after),
+        )
 
 
-def check_query_rate(user_id: str):
-    now = datetime.utcnow()
-    window = timedelta(minutes=1)
+# =========================
+# Policy checks
+# =========================
+#
+# Backends may block (SQLite lock waits, network round trips); async
+# routes call these through asyncio.to_thread.
 
-    user_queries[user_id] = _prune_old(user_queries[user_id], window)
+def check_upload_quota(user_id: str, cost: float = 1, tier: Optional[str] = None):
+    _enforce(user_id, "uploads_per_day", 24 * 60 * 60, cost, tier, "Daily upload quota exceeded")
 
-    if len(user_queries[user_id]) >= MAX_QUERIES_PER_MINUTE:
-        raise HTTPException(
-            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
-            detail="Query rate limit exceeded",
-        )
 
-    user_queries[user_id].append(now)
+def check_query_rate(user_id: str, cost: float = 1, tier: Optional[str] = None):
+    _enforce(user_id, "queries_per_minute", 60, cost, tier, "Query rate limit exceeded")
@@ -0,0 +1,131 @@
+import time
+from collections import OrderedDict
+from threading import Lock
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+
+class AnswerCache:
+    """
+    Two-tier /ask answer cache with TTL and LRU eviction.
+
+    The exact tier is keyed by (user, index version, normalized question,
+    doc_id, retrieval mode). The semantic tier returns an entry from the
+    same (user, index version, doc_id, mode) scope whose question embedding has
+    cosine similarity >= `similarity_threshold` with the new question.
+    Bumping a user's index version makes all their entries unreachable.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 2048,
+        ttl_seconds: float = 3600,
+        similarity_threshold: float = 0.95,
+    ):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.similarity_threshold = similarity_threshold
+
+        # key -> (expires_at, question embedding, response)
+        self.entries: "OrderedDict[Tuple, Tuple[float, Optional[np.ndarray], Dict]]" = OrderedDict()
+        self.lock = Lock()
+
+        self.exact_hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def _scope(key: Tuple) -> Tuple:
+        user_id, version, _, doc_id, mode = key
+        return user_id, version, doc_id, mode
+
+    def get_exact(
+        self,
+        user_id: str,
+        version: int,
+        question: str,
+        doc_id: Optional[str],
+        mode: str = "dense",
+    ) -> Optional[Dict]:
+        key = (user_id, version, question, doc_id, mode)
+        now = time.monotonic()
+
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None or entry[0] < now:
+                return None
+
+            self.entries.move_to_end(key)
+            self.exact_hits += 1
+            return entry[2]
+
+    def get_semantic(
+        self,
+        user_id: str,
+        version: int,
+        doc_id: Optional[str],
+        embedding: np.ndarray,
+        mode: str = "dense",
+    ) -> Optional[Dict]:
+        scope = (user_id, version, doc_id, mode)
+        now = time.monotonic()
+
+        with self.lock:
+            candidates = [
+                (key, entry[1])
+                for key, entry in self.entries.items()
+                if entry[1] is not None and entry[0] >= now and self._scope(key) == scope
+            ]
+
+            if candidates:
+                matrix = np.vstack([vector for _, vector in candidates])
+                scores = matrix @ embedding.reshape(-1)
+                best = int(np.argmax(scores))
+
+                if scores[best] >= self.similarity_threshold:
+                    key = candidates[best][0]
+                    self.entries.move_to_end(key)
+                    self.semantic_hits += 1
+                    return self.entries[key][2]
+
+            self.misses += 1
+            return None
+
+    def put(
+        self,
+        user_id: str,
+        version: int,
+        question: str,
+        doc_id: Optional[str],
+        embedding: Optional[np.ndarray],
+        response: Dict,
+        mode: str = "dense",
+    ):
+        key = (user_id, version, question, doc_id, mode)
+        vector = None if embedding is None else np.asarray(embedding, dtype=np.float32).reshape(-1)
+
+        with self.lock:
+            self.entries[key] = (time.monotonic() + self.ttl_seconds, vector, response)
+            self.entries.move_to_end(key)
+
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate_user(self, user_id: str):
+        with self.lock:
+            for key in [k for k in self.entries if k[0] == user_id]:
+                del self.entries[key]
+
+    def stats(self) -> Dict:
+        with self.lock:
+            return {
+                "entries": len(self.entries),
+                "max_entries": self.max_entries,
+                "exact_hits": self.exact_hits,
+                "semantic_hits": self.semantic_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
@@ -0,0 +1,72 @@
+"""
+Compares chunks.json against the binary chunk store.
+
+Reports load time and Python heap held after loading. The binary store's
+text lives in the page cache through mmap, so only touched pages count
+towards resident memory.
+
+Usage (from the repository root):
+    python -m app.rag_basics.bench_chunk_store [path/to/chunks.json]
+"""
+import gc
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from app.rag_basics.chunk_store import ChunkFile, write_chunk_file
+
+
+def measure(label: str, load):
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = load()
+    elapsed = time.perf_counter() - start
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    print(f"{label:<14} load={elapsed * 1000:8.2f} ms  "
+          f"heap={current / 1024:9.1f} KiB  peak={peak / 1024:9.1f} KiB")
+    return result
+
+
+def main():
+    json_path = sys.argv[1] if len(sys.argv) > 1 else "app/data/chunks.json"
+
+    with open(json_path, "r", encoding="utf-8") as f:
+        chunks = json.load(f)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        binary_path = os.path.join(tmp, "chunks.bin")
+        with open(binary_path, "wb") as f:
+            write_chunk_file(f, chunks)
+
+        print(f"chunks={len(chunks)}  "
+              f"json={os.path.getsize(json_path) / 1024:.1f} KiB  "
+              f"binary={os.path.getsize(binary_path) / 1024:.1f} KiB")
+
+        def load_json():
+            with open(json_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+
+        from_json = measure("json.load", load_json)
+        from_binary = measure("ChunkFile", lambda: ChunkFile(binary_path))
+
+        # What search pays per query: materializing the top-k hits only
+        top_k = random.sample(range(len(chunks)), min(5, len(chunks)))
+        start = time.perf_counter()
+        for _ in range(1000):
+            for i in top_k:
+                from_binary[i]
+        print(f"top-5 materialize: {(time.perf_counter() - start) * 1000:.3f} us/query")
+
+        assert all(from_binary[i]["text"] == from_json[i]["text"] for i in top_k)
+        del from_binary
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""
+Embedding throughput of the torch and ONNX backends.
+
+Encodes chunk texts at several batch sizes and reports texts/sec, plus
+each ONNX variant's cosine agreement with the torch model. The embedding
+cache is not used, so every text goes through the model.
+
+Usage (from the repository root):
+    python -m app.rag_basics.bench_embeddings [path/to/chunks.json] [threads]
+"""
+import json
+import sys
+import time
+
+from app.rag_basics.embeddings import EmbeddingService
+
+
+BATCH_SIZES = (1, 8, 32, 128)
+NUM_TEXTS = 512
+
+
+def throughput(service: EmbeddingService, texts, batch_size: int) -> float:
+    # Warm-up, so one-off session and allocator setup is not measured
+    service.model.encode(texts[:batch_size], batch_size=batch_size)
+
+    start = time.perf_counter()
+    service.model.encode(texts, batch_size=batch_size)
+    return len(texts) / (time.perf_counter() - start)
+
+
+def main():
+    chunks_path = sys.argv[1] if len(sys.argv) > 1 else "app/data/chunks.json"
+    threads = int(sys.argv[2]) if len(sys.argv) > 2 else 0
+
+    with open(chunks_path, "r", encoding="utf-8") as f:
+        texts = [c["text"] for c in json.load(f)][:NUM_TEXTS]
+
+    variants = [
+        ("torch", dict(backend="torch")),
+        ("onnx fp32", dict(backend="onnx", quantize=False)),
+        ("onnx int8", dict(backend="onnx", quantize=True)),
+    ]
+
+    print(f"texts={len(texts)}  threads={threads or 'default'}")
+    print(f"{'backend':<10} " + " ".join(f"{'bs=' + str(b):>10}" for b in BATCH_SIZES) + "  agreement")
+
+    for label, kwargs in variants:
+        start = time.perf_counter()
+        service = EmbeddingService(num_threads=threads, **kwargs)
+        load_seconds = time.perf_counter() - start
+
+        rates = [throughput(service, texts, b) for b in BATCH_SIZES]
+
+        agreement = ""
+        if service.backend == "onnx":
+            check = service.verify_against_torch(texts[:64])
+            agreement = f"min_cos={check['min_cosine']:.4f}"
+
+        print(f"{label:<10} " + " ".join(f"{r:>10.1f}" for r in rates)
+              + f"  {agreement}  (load {load_seconds:.1f}s)")
+
+
+if __name__ == "__main__":
+    main()
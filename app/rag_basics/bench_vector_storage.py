@@ -0,0 +1,92 @@
+"""
+Memory and recall of float32 / float16 / int8 vector storage.
+
+For each index it builds a flat index per storage type and measures
+resident bytes and recall@k against exact float32 search, both straight
+from the quantized codes and after re-scoring the top rescore_factor * k
+candidates on the exact vectors (what FAISSVectorStore does when the
+segment files are on disk).
+
+Usage (from the repository root):
+    python -m app.rag_basics.bench_vector_storage [index paths...]
+"""
+import glob
+import sys
+
+import faiss
+import numpy as np
+
+from app.rag_basics.index_backends import (
+    VECTOR_STORAGES,
+    IndexConfig,
+    add_vectors,
+    index_nbytes,
+    new_flat_index,
+)
+
+
+DEFAULT_INDEXES = ["app/data/faiss.index"] + sorted(glob.glob("app/data/users/*/faiss.index"))
+K = 5
+RESCORE_FACTOR = 4
+NUM_QUERIES = 200
+
+
+def recall(found: np.ndarray, truth_scores: np.ndarray, vectors: np.ndarray, queries: np.ndarray) -> float:
+    """
+    Share of returned hits scoring at least the true k-th score. Scores
+    rather than ids are compared, since the corpora hold duplicate chunks
+    whose ties any index may break differently.
+    """
+    hits = 0
+    for row, query, truth in zip(found, queries, truth_scores):
+        row = row[row != -1]
+        hits += int(np.sum(vectors[row] @ query >= truth[-1] - 1e-5))
+    return hits / truth_scores.size
+
+
+def rescored(index: faiss.Index, vectors: np.ndarray, queries: np.ndarray, k: int) -> np.ndarray:
+    _, candidates = index.search(queries, k * RESCORE_FACTOR)
+    rows = []
+    for query, row in zip(queries, candidates):
+        row = row[row != -1]
+        exact = vectors[row] @ query
+        rows.append(row[np.argsort(-exact)[:k]])
+    return np.vstack(rows)
+
+
+def main():
+    paths = sys.argv[1:] or DEFAULT_INDEXES
+
+    print(f"{'index':<36} {'n':>6} {'storage':<8} {'KiB':>9} {'saved':>6} "
+          f"{'recall@' + str(K):>9} {'rescored':>9}")
+
+    for path in paths:
+        source = faiss.read_index(path)
+        vectors = source.reconstruct_n(0, source.ntotal)
+        n = len(vectors)
+        k = min(K, n)
+
+        rng = np.random.default_rng(0)
+        # Perturbed copies of stored vectors stand in for real queries
+        queries = vectors[rng.choice(n, size=min(NUM_QUERIES, n), replace=False)]
+        queries = queries + rng.normal(scale=0.05, size=queries.shape).astype(np.float32)
+        queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+
+        exact = faiss.IndexFlatIP(vectors.shape[1])
+        exact.add(vectors)
+        truth, _ = exact.search(queries, k)
+        baseline = index_nbytes(exact)
+
+        for storage in VECTOR_STORAGES:
+            index = new_flat_index(vectors.shape[1], IndexConfig(storage=storage))
+            add_vectors(index, vectors)
+            _, found = index.search(queries, k)
+            nbytes = index_nbytes(index)
+
+            print(f"{path:<36} {n:>6} {storage:<8} {nbytes / 1024:>9.1f} "
+                  f"{1 - nbytes / baseline:>6.0%} {recall(found, truth, vectors, queries):>9.4f} "
+                  f"{recall(rescored(index, vectors, queries, k), truth, vectors, queries):>9.4f}")
+
+
+if __name__ == "__main__":
+    main()
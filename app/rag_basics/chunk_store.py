@@ -0,0 +1,192 @@
+import json
+import mmap
+import struct
+from typing import Dict, Iterable, Iterator, List, Tuple, Union
+
+import numpy as np
+
+
+MAGIC = b"RAGCHNK1"
+_HEADER_LEN = struct.Struct("<Q")
+_ALIGN = 8
+
+
+def _pad(size: int) -> int:
+    return (-size) % _ALIGN
+
+
+def write_chunk_file(f, chunks: Iterable[dict]):
+    """
+    Serializes chunks into the compact binary layout:
+    one UTF-8 text blob with an offsets array, interned doc_id/source
+    tables, and fixed-width index/page arrays.
+    """
+    doc_table: Dict[str, int] = {}
+    source_table: Dict[str, int] = {}
+    blob = bytearray()
+    offsets = [0]
+    doc_idx, source_idx, pages = [], [], []
+
+    for chunk in chunks:
+        meta = chunk["metadata"]
+        blob += chunk["text"].encode("utf-8")
+        offsets.append(len(blob))
+        doc_idx.append(doc_table.setdefault(meta.get("doc_id", ""), len(doc_table)))
+        source_idx.append(source_table.setdefault(meta.get("source", ""), len(source_table)))
+        pages.append(meta.get("page", 0))
+
+    arrays = {
+        "offsets": np.asarray(offsets, dtype="<u8"),
+        "doc_idx": np.asarray(doc_idx, dtype="<u4"),
+        "source_idx": np.asarray(source_idx, dtype="<u4"),
+        "pages": np.asarray(pages, dtype="<i4"),
+    }
+
+    # Lay out arrays first (all 8-byte aligned), then the text blob
+    layout = {}
+    position = 0
+    for name, array in arrays.items():
+        layout[name] = [position, array.dtype.str, len(array)]
+        position += array.nbytes + _pad(array.nbytes)
+    layout["text"] = [position, len(blob)]
+
+    header = json.dumps({
+        "count": len(pages),
+        "docs": list(doc_table),
+        "sources": list(source_table),
+        "layout": layout,
+    }).encode("utf-8")
+    header += b" " * _pad(len(MAGIC) + _HEADER_LEN.size + len(header))
+
+    f.write(MAGIC)
+    f.write(_HEADER_LEN.pack(len(header)))
+    f.write(header)
+    for array in arrays.values():
+        f.write(array.tobytes())
+        f.write(b"\0" * _pad(array.nbytes))
+    f.write(bytes(blob))
+
+
+class ChunkFile:
+    """
+    Read-only, memory-mapped view over a chunk file. Chunks are only
+    decoded when indexed.
+    """
+
+    def __init__(self, path: str):
+        with open(path, "rb") as f:
+            self.buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        if self.buffer[:len(MAGIC)] != MAGIC:
+            raise ValueError(f"Not a chunk file: {path}")
+
+        (header_len,) = _HEADER_LEN.unpack_from(self.buffer, len(MAGIC))
+        header_start = len(MAGIC) + _HEADER_LEN.size
+        header = json.loads(bytes(self.buffer[header_start:header_start + header_len]))
+        base = header_start + header_len
+
+        self.count = header["count"]
+        self.docs: List[str] = header["docs"]
+        self.sources: List[str] = header["sources"]
+
+        layout = header["layout"]
+        for name in ("offsets", "doc_idx", "source_idx", "pages"):
+            offset, dtype, count = layout[name]
+            setattr(self, name, np.frombuffer(self.buffer, dtype=dtype, count=count, offset=base + offset))
+        self.text_start = base + layout["text"][0]
+
+    def __len__(self) -> int:
+        return self.count
+
+    def __getitem__(self, i: int) -> dict:
+        start = self.text_start + int(self.offsets[i])
+        end = self.text_start + int(self.offsets[i + 1])
+        return {
+            "text": self.buffer[start:end].decode("utf-8"),
+            "metadata": {
+                "doc_id": self.docs[self.doc_idx[i]],
+                "source": self.sources[self.source_idx[i]],
+                "page": int(self.pages[i]),
+            },
+        }
+
+    def nbytes(self) -> int:
+        return len(self.buffer)
+
+    def doc_runs(self) -> Iterator[Tuple[str, int, int]]:
+        """Yields (doc_id, start, end) for each run of consecutive chunks."""
+        if self.count == 0:
+            return
+
+        boundaries = np.flatnonzero(np.diff(self.doc_idx)) + 1
+        starts = np.concatenate(([0], boundaries))
+        ends = np.concatenate((boundaries, [self.count]))
+        for start, end in zip(starts.tolist(), ends.tolist()):
+            yield self.docs[self.doc_idx[start]], start, end
+
+
+class ChunkStore:
+    """
+    List-like chunk metadata for a vector store: sealed, memory-mapped
+    segment files followed by chunks added since the last persist.
+    """
+
+    def __init__(self, chunks: Iterable[dict] = ()):
+        self.files: List[ChunkFile] = []
+        self.file_count = 0
+        self.pending: List[dict] = list(chunks)
+
+    def add_file(self, chunk_file: ChunkFile):
+        self.files.append(chunk_file)
+        self.file_count += len(chunk_file)
+
+    def seal(self, count: int, chunk_file: ChunkFile):
+        """Replaces the first `count` pending chunks by their persisted file."""
+        self.pending = self.pending[count:]
+        self.add_file(chunk_file)
+
+    def extend(self, chunks: Iterable[dict]):
+        self.pending.extend(chunks)
+
+    def __len__(self) -> int:
+        return self.file_count + len(self.pending)
+
+    def memory_bytes(self) -> int:
+        # Mapped files are charged in full; pending chunks by text size
+        mapped = sum(f.nbytes() for f in self.files)
+        pending = sum(len(c["text"]) + 64 for c in self.pending if isinstance(c, dict))
+        return mapped + pending
+
+    def __getitem__(self, i: Union[int, slice]):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError("chunk index out of range")
+
+        if i >= self.file_count:
+            return self.pending[i - self.file_count]
+
+        for chunk_file in self.files:
+            if i < len(chunk_file):
+                return chunk_file[i]
+            i -= len(chunk_file)
+
+    def doc_runs(self) -> Iterator[Tuple[str, int, int]]:
+        offset = 0
+        for chunk_file in self.files:
+            for doc_id, start, end in chunk_file.doc_runs():
+                yield doc_id, offset + start, offset + end
+            offset += len(chunk_file)
+
+        for i, chunk in enumerate(self.pending):
+            if isinstance(chunk, dict):
+                yield chunk["metadata"].get("doc_id", ""), offset + i, offset + i + 1
+
+    def __iter__(self) -> Iterator[dict]:
+        for chunk_file in self.files:
+            for i in range(len(chunk_file)):
+                yield chunk_file[i]
+        yield from self.pending
@@ -1,11 +1,39 @@
 import os
-from typing import List, Dict
+import re
+from typing import List, Dict, Tuple
+
+
+# Sentence ends, or blank lines between blocks
+_SENTENCE_BOUNDARY = re.compile(r"(?<=[.!?])\s+|\n\s*\n")
 
 
 class ChunkingService:
-    def __init__(self, chunk_size: int = 500, overlap: int = 100):
+    def __init__(
+        self,
+        chunk_size: int = 500,
+        overlap: int = 100,
+        tokenizer=None,
+        max_tokens: int = 256,
+        token_overlap: int = 0,
+    ):
+        """
+        Without a tokenizer, text is cut into `chunk_size`-character windows
+        overlapping by `overlap` characters. With the embedding model's
+        tokenizer, chunks are packed from whole sentences up to `max_tokens`
+        (the model's window, special tokens included), repeating up to
+        `token_overlap` tokens of trailing sentences.
+        """
         self.chunk_size = chunk_size
         self.overlap = overlap
+        self.tokenizer = tokenizer
+        self.max_tokens = max_tokens
+        self.token_overlap = token_overlap
+
+        if tokenizer is not None and hasattr(tokenizer, "num_special_tokens_to_add"):
+            self.token_budget = max_tokens - tokenizer.num_special_tokens_to_add(pair=False)
+        else:
+            # [CLS] ... [SEP]
+            self.token_budget = max_tokens - 2
 
     def chunk_documents(self, documents: List[Dict]) -> List[Dict]:
         """
@@ -14,16 +42,12 @@ class ChunkingService:
         chunks = []
 
         for doc in documents:
-            text = doc["text"]
-            metadata = doc["metadata"]
-
-            start = 0
-            text_length = len(text)
-
-            while start < text_length:
-                end = start + self.chunk_size
-                chunk_text = text[start:end]
+            if self.tokenizer is not None:
+                pieces = self._token_windows(doc["text"])
+            else:
+                pieces = self._char_windows(doc["text"])
 
+            for chunk_text in pieces:
                 chunks.append({
                 "text": chunk_text,
                 "metadata": {
@@ -33,6 +57,75 @@ class ChunkingService:
                 }
             })
 
-                start = end - self.overlap
-
         return chunks
+
+    def _char_windows(self, text: str) -> List[str]:
+        windows = []
+
+        start = 0
+        text_length = len(text)
+
+        while start < text_length:
+            end = start + self.chunk_size
+            windows.append(text[start:end])
+
+            start = end - self.overlap
+
+        return windows
+
+    def _token_windows(self, text: str) -> List[str]:
+        sentences = [" ".join(s.split()) for s in _SENTENCE_BOUNDARY.split(text)]
+        sentences = [s for s in sentences if s]
+        if not sentences:
+            return []
+
+        # One tokenizer call per document, not per sentence or chunk
+        encoded = self.tokenizer(
+            sentences,
+            add_special_tokens=False,
+            return_offsets_mapping=True,
+        )
+
+        budget = self.token_budget
+        pieces: List[Tuple[str, int]] = []
+        for sentence, offsets in zip(sentences, encoded["offset_mapping"]):
+            if len(offsets) <= budget:
+                pieces.append((sentence, len(offsets)))
+                continue
+
+            # A sentence longer than the window is cut on token boundaries
+            for i in range(0, len(offsets), budget):
+                window = offsets[i:i + budget]
+                pieces.append((sentence[window[0][0]:window[-1][1]], len(window)))
+
+        windows = []
+        current: List[Tuple[str, int]] = []
+        used = 0
+
+        for piece, n_tokens in pieces:
+            if current and used + n_tokens > budget:
+                windows.append(" ".join(p for p, _ in current))
+                current = self._overlap_tail(current)
+                used = sum(n for _, n in current)
+                if used + n_tokens > budget:
+                    current, used = [], 0
+
+            current.append((piece, n_tokens))
+            used += n_tokens
+
+        if current:
+            windows.append(" ".join(p for p, _ in current))
+
+        return windows
+
+    def _overlap_tail(self, pieces: List[Tuple[str, int]]) -> List[Tuple[str, int]]:
+        tail = []
+        used = 0
+
+        for piece, n_tokens in reversed(pieces):
+            if used + n_tokens > self.token_overlap:
+                break
+            tail.insert(0, (piece, n_tokens))
+            used += n_tokens
+
+        return tail
@@ -1,30 +1,93 @@
 from pypdf import PdfReader
-from typing import List, Dict
+from concurrent.futures import ProcessPoolExecutor
+from collections import deque
+from threading import Lock
+from typing import Iterator, List, Dict, Optional
+import multiprocessing
 import os
 
 
+def _extract_page_range(file_path: str, start: int, end: int) -> List[Optional[str]]:
+    """
+    Extracts text for pages [start, end). Runs inside a worker process,
+    so each worker opens its own reader.
+    """
+    reader = PdfReader(file_path)
+    return [reader.pages[i].extract_text() for i in range(start, end)]
+
+
 class PDFLoader:
+    def __init__(self, workers: int = 1, pages_per_task: int = 8):
+        # workers > 1 enables the process-pool mode for large PDFs
+        self.workers = workers
+        self.pages_per_task = pages_per_task
+        self.pool: Optional[ProcessPoolExecutor] = None
+        self.lock = Lock()
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        # One long-lived pool shared by every load, started on first use.
+        # "spawn" because the server is multithreaded with torch/faiss
+        # loaded, which a forked child can deadlock on.
+        with self.lock:
+            if self.pool is None:
+                self.pool = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+            return self.pool
+
     def load(self, file_path: str) -> List[Dict]:
         """
         Loads a PDF and returns text with metadata.
         Source is derived deterministically from filename.
         """
-        reader = PdfReader(file_path)
-        documents = []
+        return list(self.iter_pages(file_path))
 
+    def iter_pages(self, file_path: str) -> Iterator[Dict]:
+        """
+        Yields pages with text in page order as soon as they are extracted.
+        """
         # ✅ Derive source from filename (ethical & scalable)
         filename = os.path.basename(file_path)
         source = filename.lower().replace(".pdf", "")
 
-        for page_number, page in enumerate(reader.pages):
-            text = page.extract_text()
+        for page_number, text in enumerate(self._iter_texts(file_path)):
             if text:
-                documents.append({
+                yield {
                     "text": text,
                     "metadata": {
-                        "source": source,         
+                        "source": source,
                         "page": page_number + 1
                     }
-                })
+                }
+
+    def _iter_texts(self, file_path: str) -> Iterator[Optional[str]]:
+        reader = PdfReader(file_path)
+        num_pages = len(reader.pages)
+
+        if self.workers <= 1 or num_pages <= self.pages_per_task:
+            for page in reader.pages:
+                yield page.extract_text()
+            return
+
+        ranges = deque(
+            (start, min(start + self.pages_per_task, num_pages))
+            for start in range(0, num_pages, self.pages_per_task)
+        )
+
+        # Keep a bounded number of ranges in flight so memory stays flat
+        # while results are still consumed strictly in page order.
+        max_in_flight = self.workers * 2
+        pool = self._get_pool()
+        pending = deque()
+        try:
+            while ranges or pending:
+                while ranges and len(pending) < max_in_flight:
+                    start, end = ranges.popleft()
+                    pending.append(pool.submit(_extract_page_range, file_path, start, end))
 
-        return documents
+                yield from pending.popleft().result()
+        finally:
+            # Abandoned early (consumer stopped or failed): drop queued ranges
+            for future in pending:
+                future.cancel()
@@ -0,0 +1,97 @@
+import asyncio
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from app.metrics import QUERY_BATCH_SIZE, QUERY_QUEUE_DEPTH
+from app.rag_basics.embeddings import EmbeddingService
+
+
+class QueryEmbeddingBatcher:
+    """
+    Collects query embeddings from concurrent requests and encodes them
+    together: a batch closes after `max_wait_ms` or at `max_batch_size`,
+    runs in a worker thread, and resolves each caller's future. Batch
+    sizes and queue depths are recorded in the metrics registry.
+    """
+
+    def __init__(
+        self,
+        embedding_service: EmbeddingService,
+        max_batch_size: int = 32,
+        max_wait_ms: float = 5.0,
+    ):
+        self.embedding_service = embedding_service
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+
+        self.queue: Optional[asyncio.Queue] = None
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.worker: Optional[asyncio.Task] = None
+
+        self.requests = 0
+        self.batches = 0
+
+    def _ensure_worker(self):
+        loop = asyncio.get_running_loop()
+        if self.loop is not loop or self.worker is None or self.worker.done():
+            self.loop = loop
+            self.queue = asyncio.Queue()
+            self.worker = loop.create_task(self._run())
+
+    async def embed(self, text: str) -> np.ndarray:
+        self._ensure_worker()
+
+        future = self.loop.create_future()
+        QUERY_QUEUE_DEPTH.observe(self.queue.qsize())
+        self.requests += 1
+        await self.queue.put((text, future))
+        return await future
+
+    async def _collect(self) -> List:
+        batch = [await self.queue.get()]
+        deadline = self.loop.time() + self.max_wait
+
+        while len(batch) < self.max_batch_size:
+            if not self.queue.empty():
+                batch.append(self.queue.get_nowait())
+                continue
+
+            remaining = deadline - self.loop.time()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self.queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+
+        return batch
+
+    async def _run(self):
+        while True:
+            batch = await self._collect()
+            self.batches += 1
+            QUERY_BATCH_SIZE.observe(len(batch))
+
+            texts = [text for text, _ in batch]
+            try:
+                vectors = await asyncio.to_thread(self.embedding_service.embed_queries, texts)
+            except Exception as exc:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(exc)
+                continue
+
+            for i, (_, future) in enumerate(batch):
+                if not future.done():
+                    future.set_result(vectors[i:i + 1])
+
+    def stats(self) -> Dict:
+        return {
+            "queue_depth": self.queue.qsize() if self.queue else 0,
+            "requests": self.requests,
+            "batches": self.batches,
+            "avg_batch_size": round(self.requests / self.batches, 2) if self.batches else None,
+            "batch_size_histogram": QUERY_BATCH_SIZE.counts(),
+            "queue_depth_histogram": QUERY_QUEUE_DEPTH.counts(),
+        }
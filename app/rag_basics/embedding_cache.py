@@ -0,0 +1,133 @@
+import hashlib
+import os
+import sqlite3
+import time
+from threading import Lock
+from typing import Dict, List
+
+import numpy as np
+
+
+class EmbeddingCache:
+    """
+    Persistent, content-addressed embedding cache.
+
+    Entries are keyed by (model name, sha256 of the text), so identical
+    chunks are embedded once no matter which user or upload they come
+    from. The cache is bounded by entry count and evicts the least
+    recently used rows.
+    """
+
+    def __init__(self, path: str, max_entries: int = 200_000):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.lock = Lock()
+
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS embeddings (
+                key TEXT PRIMARY KEY,
+                vector BLOB NOT NULL,
+                last_used INTEGER NOT NULL
+            )
+            """
+        )
+        self.conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_embeddings_last_used ON embeddings(last_used)"
+        )
+        self.conn.commit()
+
+        self.size = self.conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+    @staticmethod
+    def make_key(model_name: str, text: str) -> str:
+        digest = hashlib.sha256(text.encode("utf-8")).hexdigest()
+        return f"{model_name}:{digest}"
+
+    def get_many(self, keys: List[str]) -> Dict[str, np.ndarray]:
+        unique_keys = list(dict.fromkeys(keys))
+        found: Dict[str, np.ndarray] = {}
+
+        with self.lock:
+            # SQLite caps the number of bound parameters per statement
+            for start in range(0, len(unique_keys), 500):
+                batch = unique_keys[start:start + 500]
+                placeholders = ",".join("?" * len(batch))
+                rows = self.conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})",
+                    batch,
+                ).fetchall()
+                for key, blob in rows:
+                    found[key] = np.frombuffer(blob, dtype=np.float32)
+
+            if found:
+                now = time.time_ns()
+                self.conn.executemany(
+                    "UPDATE embeddings SET last_used = ? WHERE key = ?",
+                    [(now, key) for key in found],
+                )
+                self.conn.commit()
+
+            hits = sum(1 for key in keys if key in found)
+            self.hits += hits
+            self.misses += len(keys) - hits
+
+        return found
+
+    def put_many(self, items: Dict[str, np.ndarray]):
+        if not items:
+            return
+
+        now = time.time_ns()
+        rows = [
+            (key, np.asarray(vector, dtype=np.float32).tobytes(), now)
+            for key, vector in items.items()
+        ]
+
+        with self.lock:
+            before = self.conn.total_changes
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO embeddings (key, vector, last_used) VALUES (?, ?, ?)",
+                rows,
+            )
+            self.size += self.conn.total_changes - before
+            self._evict()
+            self.conn.commit()
+
+    def _evict(self):
+        excess = self.size - self.max_entries
+        if excess <= 0:
+            return
+
+        self.conn.execute(
+            """
+            DELETE FROM embeddings WHERE key IN (
+                SELECT key FROM embeddings ORDER BY last_used ASC LIMIT ?
+            )
+            """,
+            (excess,),
+        )
+        self.size -= excess
+        self.evictions += excess
+
+    def stats(self) -> Dict:
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": self.size,
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+            }
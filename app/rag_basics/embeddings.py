@@ -1,19 +1,106 @@
-from sentence_transformers import SentenceTransformer
-from typing import List
+import os
+from typing import List, Optional
 import numpy as np
 
+from app.rag_basics.embedding_cache import EmbeddingCache
+from app.rag_basics.onnx_encoder import OnnxEncoder, VERIFY_TEXTS, compare_embeddings, export_onnx, is_exported
+
 
 class EmbeddingService:
-    def __init__(self, model_name: str = "all-MiniLM-L6-v2"):
-        self.model = SentenceTransformer(model_name)
+    def __init__(
+        self,
+        model_name: str = "all-MiniLM-L6-v2",
+        cache: Optional[EmbeddingCache] = None,
+        backend: str = "torch",
+        onnx_dir: str = "data/models",
+        quantize: bool = True,
+        num_threads: int = 0,
+    ):
+        """
+        backend="torch" loads the SentenceTransformer; backend="onnx" runs
+        the same model through ONNX Runtime (int8-quantized when
+        `quantize`), exporting it into `onnx_dir` on first use.
+        `num_threads` sets intra-op threads (0 = library default).
+        """
+        self.model_name = model_name
+        self.backend = backend
+        self.cache = cache
 
-    def embed_texts(self, texts: List[str]) -> np.ndarray:
-        embeddings = self.model.encode(
+        if backend == "onnx":
+            directory = os.path.join(onnx_dir, model_name.replace("/", "__"))
+            if not is_exported(directory, quantize):
+                export_onnx(model_name, directory, quantize=quantize)
+            self.model = OnnxEncoder(directory, quantized=quantize, num_threads=num_threads)
+            # Vectors differ slightly between backends; keep their cache entries apart
+            self.cache_namespace = f"{model_name}@onnx{'-int8' if quantize else ''}"
+        elif backend == "torch":
+            # Imported lazily so the ONNX backend never loads torch
+            from sentence_transformers import SentenceTransformer
+
+            if num_threads:
+                import torch
+                torch.set_num_threads(num_threads)
+            self.model = SentenceTransformer(model_name)
+            self.cache_namespace = model_name
+        else:
+            raise ValueError(f"Unknown embedding backend: {backend}")
+
+    @property
+    def tokenizer(self):
+        return self.model.tokenizer
+
+    @property
+    def max_tokens(self) -> int:
+        # Inputs longer than this are truncated by the model
+        return self.model.max_seq_length
+
+    def _encode(self, texts: List[str]) -> np.ndarray:
+        return self.model.encode(
             texts,
             convert_to_numpy=True,
             normalize_embeddings=True
         )
-        return embeddings
+
+    def verify_against_torch(self, texts: List[str] = VERIFY_TEXTS, tolerance: float = 0.02) -> dict:
+        """Cosine agreement between this backend and the torch model."""
+        from sentence_transformers import SentenceTransformer
+
+        reference = SentenceTransformer(self.model_name).encode(
+            texts,
+            convert_to_numpy=True,
+            normalize_embeddings=True,
+        )
+        return compare_embeddings(self._encode(texts), reference, tolerance)
+
+    def embed_texts(self, texts: List[str]) -> np.ndarray:
+        if self.cache is None or not texts:
+            return self._encode(texts)
+
+        keys = [EmbeddingCache.make_key(self.cache_namespace, t) for t in texts]
+        vectors = self.cache.get_many(keys)
+
+        # Only cache misses go to the model, each distinct text once
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in vectors:
+                missing.setdefault(key, text)
+
+        if missing:
+            encoded = self._encode(list(missing.values()))
+            new_vectors = dict(zip(missing.keys(), encoded))
+            self.cache.put_many(new_vectors)
+            vectors.update(new_vectors)
+
+        return np.vstack([vectors[key] for key in keys]).astype(np.float32, copy=False)
+
+    def embed_queries(self, queries: List[str]) -> np.ndarray:
+        """
+        Encodes texts that are rarely repeated (questions, answer sentences)
+        straight through the model. They stay out of the chunk-embedding
+        cache, where they would only cost a write and push chunks out of
+        the LRU; repeated questions are served by the answer cache.
+        """
+        return self._encode(queries).astype(np.float32, copy=False)
 
     def embed_query(self, query: str) -> np.ndarray:
-        return self.embed_texts([query])
+        return self.embed_queries([query])
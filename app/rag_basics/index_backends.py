@@ -0,0 +1,381 @@
+import bisect
+import math
+import time
+from typing import Dict, List, Optional, Sequence
+
+import faiss
+import numpy as np
+
+
+INDEX_BACKENDS = ("flat", "ivf_flat", "hnsw", "ivf_pq")
+# How vectors are held in memory; ivf_pq always uses its own PQ codes
+VECTOR_STORAGES = ("float32", "float16", "int8")
+MAX_TRAINING_POINTS = 100_000
+# Embeddings are L2-normalized, so every component lies in [-1, 1]. int8
+# codes use that fixed range instead of ranges learned from whatever batch
+# happens to be added first, which later data would be clipped against.
+INT8_RANGE = (-1.0, 1.0)
+
+
+class IndexConfig:
+    """
+    Index backend selection and per-backend parameters.
+
+    Stores start as exact `flat` indexes and switch to `backend` once
+    they hold `upgrade_threshold` vectors (0 disables the upgrade).
+    `storage` selects float32, float16 or int8 codes; with lossy codes the
+    top `rescore_factor` * k candidates are re-scored on exact vectors.
+    """
+
+    def __init__(
+        self,
+        backend: str = "flat",
+        upgrade_threshold: int = 0,
+        nlist: int = 1024,
+        nprobe: int = 16,
+        hnsw_m: int = 32,
+        ef_construction: int = 80,
+        ef_search: int = 64,
+        pq_m: int = 48,
+        pq_nbits: int = 8,
+        storage: str = "float32",
+        rescore_factor: int = 4,
+    ):
+        if backend not in INDEX_BACKENDS:
+            raise ValueError(f"Unknown index backend: {backend}")
+        if storage not in VECTOR_STORAGES:
+            raise ValueError(f"Unknown vector storage: {storage}")
+
+        self.backend = backend
+        self.upgrade_threshold = upgrade_threshold
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.hnsw_m = hnsw_m
+        self.ef_construction = ef_construction
+        self.ef_search = ef_search
+        self.pq_m = pq_m
+        self.pq_nbits = pq_nbits
+        self.storage = storage
+        self.rescore_factor = rescore_factor
+
+
+_STORAGE_CODES = {"float32": "Flat", "float16": "SQfp16", "int8": "SQ8"}
+
+
+def _nlist_for(n: int, config: IndexConfig) -> int:
+    # Keep ~39+ training points per centroid, as k-means expects
+    return max(1, min(config.nlist, int(4 * math.sqrt(n)), n // 39 or 1))
+
+
+def _pq_nbits_for(n: int, config: IndexConfig) -> int:
+    # PQ codebooks have 2**nbits centroids; shrink them for small corpora
+    return max(4, min(config.pq_nbits, int(math.log2(max(n // 39, 16)))))
+
+
+def build_index(backend: str, vectors: np.ndarray, config: IndexConfig) -> faiss.Index:
+    """
+    Builds (and trains, where needed) an inner-product index over `vectors`.
+    """
+    n, dim = vectors.shape
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+
+    codes = _STORAGE_CODES[config.storage]
+
+    if backend == "flat":
+        index = new_flat_index(dim, config)
+    elif backend == "hnsw":
+        index = faiss.index_factory(dim, f"HNSW{config.hnsw_m},{codes}", faiss.METRIC_INNER_PRODUCT)
+        index.hnsw.efConstruction = config.ef_construction
+        if config.storage == "int8":
+            _train_fixed_int8(index, faiss.downcast_index(index.storage).sq, dim)
+    elif backend == "ivf_flat":
+        index = faiss.index_factory(dim, f"IVF{_nlist_for(n, config)},{codes}", faiss.METRIC_INNER_PRODUCT)
+    elif backend == "ivf_pq":
+        index = faiss.index_factory(
+            dim,
+            f"IVF{_nlist_for(n, config)},PQ{config.pq_m}x{_pq_nbits_for(n, config)}",
+            faiss.METRIC_INNER_PRODUCT,
+        )
+    else:
+        raise ValueError(f"Unknown index backend: {backend}")
+
+    add_vectors(index, vectors)
+    enable_reconstruct(index)
+    return index
+
+
+def new_flat_index(dim: int, config: IndexConfig) -> faiss.Index:
+    """Exhaustive index with the configured vector storage."""
+    if config.storage == "float32":
+        return faiss.IndexFlatIP(dim)
+
+    qtype = (
+        faiss.ScalarQuantizer.QT_fp16
+        if config.storage == "float16"
+        else faiss.ScalarQuantizer.QT_8bit
+    )
+    index = faiss.IndexScalarQuantizer(dim, qtype, faiss.METRIC_INNER_PRODUCT)
+    if config.storage == "int8":
+        _train_fixed_int8(index, index.sq, dim)
+    return index
+
+
+def _train_fixed_int8(index: faiss.Index, sq: faiss.ScalarQuantizer, dim: int):
+    """Trains int8 codes on INT8_RANGE in every dimension, independent of the data."""
+    sq.rangestat = faiss.ScalarQuantizer.RS_minmax
+    sq.rangestat_arg = 0
+    low, high = INT8_RANGE
+    index.train(np.array([[low] * dim, [high] * dim], dtype=np.float32))
+
+
+class SegmentedFlatIndex:
+    """
+    Exact inner-product index over memory-mapped flat segments plus an
+    in-memory tail of vectors added since. Segments are searched where
+    they are mapped, so opening a float32 flat store copies no vectors and
+    only the pages a search scans are read. Implements the part of the
+    faiss.Index API the vector store uses; ids are positions across all
+    segments in order.
+    """
+
+    def __init__(self, dim: int, segments: Sequence[faiss.Index] = ()):
+        self.d = dim
+        self.is_trained = True
+        self.segments: List[faiss.Index] = []
+        self.starts: List[int] = []
+        self.persisted = 0
+        self.tail = faiss.IndexFlatIP(dim)
+        # Segment-local -> global ids, for translating search selectors
+        self._id_maps: List[Optional[faiss.Int64Vector]] = []
+        for segment in segments:
+            self._add_segment(segment)
+
+    @property
+    def ntotal(self) -> int:
+        return self.persisted + self.tail.ntotal
+
+    def _add_segment(self, segment: faiss.Index):
+        self.segments.append(segment)
+        self.starts.append(self.persisted)
+        self._id_maps.append(None)
+        self.persisted += segment.ntotal
+
+    def add(self, vectors: np.ndarray):
+        self.tail.add(np.ascontiguousarray(vectors, dtype=np.float32))
+
+    def seal(self, segment: faiss.Index):
+        """Replaces the in-memory tail with the mapped segment holding its rows."""
+        if segment.ntotal != self.tail.ntotal:
+            raise ValueError(f"Segment holds {segment.ntotal} rows, tail {self.tail.ntotal}")
+        self._add_segment(segment)
+        self.tail.reset()
+
+    def resident_bytes(self) -> int:
+        """Heap memory only: mapped segments live in the page cache."""
+        id_maps = sum(m.size() * 8 for m in self._id_maps if m is not None)
+        return self.tail.ntotal * self.d * 4 + id_maps
+
+    def _parts(self):
+        yield from zip(range(len(self.segments)), self.starts, self.segments)
+        yield None, self.persisted, self.tail
+
+    def _id_map(self, part: Optional[int], start: int, count: int) -> faiss.Int64Vector:
+        id_map = self._id_maps[part] if part is not None else None
+        if id_map is None:
+            id_map = faiss.Int64Vector()
+            faiss.copy_array_to_vector(np.arange(start, start + count, dtype=np.int64), id_map)
+            if part is not None:
+                self._id_maps[part] = id_map
+        return id_map
+
+    def reconstruct(self, position: int) -> np.ndarray:
+        part = bisect.bisect_right(self.starts, position) - 1
+        if position >= self.persisted:
+            return self.tail.reconstruct(position - self.persisted)
+        return self.segments[part].reconstruct(position - self.starts[part])
+
+    def reconstruct_n(self, start: int, count: int) -> np.ndarray:
+        end = start + count
+        rows = [np.zeros((0, self.d), dtype=np.float32)]
+        for _, part_start, index in self._parts():
+            lo, hi = max(start, part_start), min(end, part_start + index.ntotal)
+            if lo < hi:
+                rows.append(index.reconstruct_n(lo - part_start, hi - lo))
+        return np.vstack(rows)
+
+    def search(self, queries: np.ndarray, k: int, params=None):
+        selector = params.sel if params is not None else None
+        all_scores, all_ids = [], []
+        for part, start, index in self._parts():
+            if index.ntotal == 0:
+                continue
+            part_params = translated = None
+            if selector is not None:
+                # SWIG keeps no references: the translated selector, its id
+                # map and the wrapped selector must stay alive for the call
+                id_map = self._id_map(part, start, index.ntotal)
+                translated = faiss.IDSelectorTranslated(id_map, selector)
+                part_params = faiss.SearchParameters()
+                part_params.sel = translated
+            scores, ids = index.search(queries, min(k, index.ntotal), params=part_params)
+            all_scores.append(scores)
+            all_ids.append(np.where(ids >= 0, ids + start, -1))
+
+        n = len(queries)
+        if not all_scores:
+            return np.full((n, k), -np.inf, dtype=np.float32), np.full((n, k), -1, dtype=np.int64)
+
+        scores = np.hstack(all_scores)
+        ids = np.hstack(all_ids)
+        scores[ids < 0] = -np.inf
+        order = np.argsort(-scores, axis=1, kind="stable")[:, :k]
+        scores = np.take_along_axis(scores, order, axis=1)
+        ids = np.take_along_axis(ids, order, axis=1)
+        if ids.shape[1] < k:
+            pad = k - ids.shape[1]
+            scores = np.pad(scores, ((0, 0), (0, pad)), constant_values=-np.inf)
+            ids = np.pad(ids, ((0, 0), (0, pad)), constant_values=-1)
+        return scores, ids
+
+
+def add_vectors(index: faiss.Index, vectors: np.ndarray):
+    """Adds vectors, training the index on them first if it needs it."""
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    if not index.is_trained and len(vectors):
+        n = len(vectors)
+        if n > MAX_TRAINING_POINTS:
+            sample = np.random.default_rng(0).choice(n, size=MAX_TRAINING_POINTS, replace=False)
+            index.train(vectors[np.sort(sample)])
+        else:
+            index.train(vectors)
+    index.add(vectors)
+
+
+def enable_reconstruct(index: faiss.Index):
+    """
+    IVF indexes need a direct map before vectors can be reconstructed by
+    position (used by document-filtered search).
+    """
+    if isinstance(index, faiss.IndexIVF):
+        index.set_direct_map_type(faiss.DirectMap.Array)
+
+
+def backend_of(index: faiss.Index) -> str:
+    if isinstance(index, faiss.IndexHNSW):
+        return "hnsw"
+    if isinstance(index, faiss.IndexIVFPQ):
+        return "ivf_pq"
+    if isinstance(index, faiss.IndexIVF):
+        return "ivf_flat"
+    return "flat"
+
+
+def storage_of(index: faiss.Index) -> str:
+    """Vector storage of an index ("pq" for IVF-PQ)."""
+    if isinstance(index, faiss.IndexIVFPQ):
+        return "pq"
+    if isinstance(index, faiss.IndexHNSW):
+        index = faiss.downcast_index(index.storage)
+    if isinstance(index, (faiss.IndexScalarQuantizer, faiss.IndexIVFScalarQuantizer)):
+        return "float16" if index.sq.qtype == faiss.ScalarQuantizer.QT_fp16 else "int8"
+    return "float32"
+
+
+def index_nbytes(index: faiss.Index) -> int:
+    """
+    Approximate resident size of an index: stored codes plus the
+    per-backend structures (IVF ids and centroids, HNSW links).
+    """
+    if isinstance(index, SegmentedFlatIndex):
+        return index.resident_bytes()
+
+    backend = backend_of(index)
+
+    if backend == "hnsw":
+        storage = faiss.downcast_index(index.storage)
+        links = index.ntotal * index.hnsw.nb_neighbors(0) * 4
+        return index.ntotal * storage.code_size + links
+    if backend in ("ivf_flat", "ivf_pq"):
+        return index.ntotal * (index.code_size + 8) + index.nlist * index.d * 4
+    return index.ntotal * getattr(index, "code_size", index.d * 4)
+
+
+def search_params(index: faiss.Index, config: IndexConfig, selector=None):
+    """
+    Per-call search parameters, so concurrent searches never race on
+    index-wide settings like nprobe.
+    """
+    backend = backend_of(index)
+
+    if backend in ("ivf_flat", "ivf_pq"):
+        params = faiss.SearchParametersIVF()
+        params.nprobe = config.nprobe
+    elif backend == "hnsw":
+        params = faiss.SearchParametersHNSW()
+        params.efSearch = config.ef_search
+    else:
+        params = faiss.SearchParameters()
+
+    if selector is not None:
+        params.sel = selector
+    return params
+
+
+def recall_latency_report(
+    vectors: np.ndarray,
+    config: IndexConfig,
+    k: int = 5,
+    num_queries: int = 100,
+    backends: Optional[List[str]] = None,
+) -> List[Dict]:
+    """
+    Measures recall@k (against exact flat search) and query latency of
+    each backend, using a sample of the stored vectors as queries.
+    """
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    n = len(vectors)
+    if n == 0:
+        return []
+
+    rng = np.random.default_rng(0)
+    queries = vectors[rng.choice(n, size=min(num_queries, n), replace=False)]
+    k = min(k, n)
+
+    # Exact float32 search, whatever config.storage says: quantized
+    # "truth" would overstate every backend's recall
+    exact = faiss.IndexFlatIP(vectors.shape[1])
+    exact.add(vectors)
+    _, truth = exact.search(queries, k)
+
+    report = []
+    for backend in backends or INDEX_BACKENDS:
+        try:
+            start = time.perf_counter()
+            index = build_index(backend, vectors, config)
+            build_seconds = time.perf_counter() - start
+
+            params = search_params(index, config)
+            start = time.perf_counter()
+            for q in queries:
+                index.search(q[None, :], k, params=params)
+            latency_ms = (time.perf_counter() - start) * 1000 / len(queries)
+
+            _, found = index.search(queries, k, params=params)
+        except RuntimeError as exc:
+            report.append({"backend": backend, "error": str(exc).strip().splitlines()[-1]})
+            continue
+
+        hits = sum(
+            len(set(row_found) & set(row_truth))
+            for row_found, row_truth in zip(found.tolist(), truth.tolist())
+        )
+
+        report.append({
+            "backend": backend,
+            f"recall@{k}": round(hits / (len(queries) * k), 4),
+            "latency_ms": round(latency_ms, 4),
+            "build_seconds": round(build_seconds, 3),
+            "vectors": n,
+        })
+
+    return report
@@ -0,0 +1,331 @@
+import bisect
+import json
+import math
+import mmap
+import re
+import struct
+from array import array
+from typing import Dict, Iterable, List, Optional, Tuple, Union
+
+import numpy as np
+
+
+_TOKEN = re.compile(r"\w+")
+
+STOPWORDS = frozenset("""
+a an and are as at be by for from has have how in is it its of on or that
+the this to was were what when where which who why with does do did can
+""".split())
+
+# Term frequencies are stored as uint16
+_MAX_TF = 65535
+
+POSTINGS_MAGIC = b"RAGPOST1"
+_HEADER_LEN = struct.Struct("<Q")
+_ALIGN = 8
+
+
+def analyze(text: str) -> List[str]:
+    return [t for t in _TOKEN.findall(text.lower()) if t not in STOPWORDS]
+
+
+def _in_ranges(positions: np.ndarray, ranges: List[Tuple[int, int]]) -> np.ndarray:
+    starts = np.array([s for s, _ in ranges], dtype=np.int64)
+    ends = np.array([e for _, e in ranges], dtype=np.int64)
+    slot = np.searchsorted(starts, positions, side="right") - 1
+    return (slot >= 0) & (positions < ends[np.maximum(slot, 0)])
+
+
+def _pad(size: int) -> int:
+    return (-size) % _ALIGN
+
+
+# =========================
+# Postings of one block of chunks
+# =========================
+
+class MemoryPostings:
+    """
+    Appendable postings for a block of consecutive chunks. Each term's
+    postings are two typed arrays (uint32 local positions, uint16 term
+    frequencies), so adding a chunk only touches the terms it contains.
+    """
+
+    def __init__(self):
+        self.vocabulary: Dict[str, int] = {}
+        self.positions: List[array] = []
+        self.frequencies: List[array] = []
+        self.doc_lengths = array("I")
+
+    def __len__(self) -> int:
+        return len(self.doc_lengths)
+
+    def add(self, text: str) -> int:
+        """Indexes one chunk at the next local position; returns its length."""
+        position = len(self.doc_lengths)
+        terms = analyze(text)
+        counts: Dict[str, int] = {}
+        for term in terms:
+            counts[term] = counts.get(term, 0) + 1
+
+        for term, tf in counts.items():
+            term_id = self.vocabulary.get(term)
+            if term_id is None:
+                term_id = self.vocabulary[term] = len(self.positions)
+                self.positions.append(array("I"))
+                self.frequencies.append(array("H"))
+            self.positions[term_id].append(position)
+            self.frequencies[term_id].append(min(tf, _MAX_TF))
+
+        self.doc_lengths.append(len(terms))
+        return len(terms)
+
+    def lengths(self) -> np.ndarray:
+        return np.frombuffer(self.doc_lengths, dtype=np.uint32)
+
+    def postings(self, term: str) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+        term_id = self.vocabulary.get(term)
+        if term_id is None:
+            return None
+        return (
+            np.frombuffer(self.positions[term_id], dtype=np.uint32),
+            np.frombuffer(self.frequencies[term_id], dtype=np.uint16),
+        )
+
+    def memory_bytes(self) -> int:
+        postings = sum(p.itemsize * len(p) for p in self.positions)
+        postings += sum(f.itemsize * len(f) for f in self.frequencies)
+        # Rough per-term overhead of the vocabulary dict and array headers
+        vocabulary = len(self.vocabulary) * 200
+        return postings + vocabulary + len(self.doc_lengths) * 4
+
+
+def write_postings_file(f, texts: Iterable[str]):
+    """
+    Serializes the postings of `texts` (local positions 0, 1, ...) as one
+    term table plus CSR arrays: per-term offsets into shared position and
+    frequency arrays, and the chunk lengths.
+    """
+    block = MemoryPostings()
+    for text in texts:
+        block.add(text)
+
+    terms = sorted(block.vocabulary)
+    ids = [block.vocabulary[t] for t in terms]
+    sizes = [len(block.positions[i]) for i in ids]
+    arrays = {
+        "offsets": np.concatenate(([0], np.cumsum(sizes, dtype=np.uint64))).astype("<u8"),
+        "positions": np.concatenate([np.frombuffer(block.positions[i], dtype=np.uint32) for i in ids] or [np.zeros(0)]).astype("<u4"),
+        "frequencies": np.concatenate([np.frombuffer(block.frequencies[i], dtype=np.uint16) for i in ids] or [np.zeros(0)]).astype("<u2"),
+        "doc_lengths": block.lengths().astype("<u4"),
+    }
+
+    layout = {}
+    position = 0
+    for name, values in arrays.items():
+        layout[name] = [position, values.dtype.str, len(values)]
+        position += values.nbytes + _pad(values.nbytes)
+
+    header = json.dumps({"count": len(block), "terms": terms, "layout": layout}).encode("utf-8")
+    header += b" " * _pad(len(POSTINGS_MAGIC) + _HEADER_LEN.size + len(header))
+
+    f.write(POSTINGS_MAGIC)
+    f.write(_HEADER_LEN.pack(len(header)))
+    f.write(header)
+    for values in arrays.values():
+        f.write(values.tobytes())
+        f.write(b"\0" * _pad(values.nbytes))
+
+
+class PostingsFile:
+    """
+    Read-only, memory-mapped postings of a persisted segment. Opening it
+    only parses the term table; postings are paged in per query term.
+    """
+
+    def __init__(self, path: str):
+        with open(path, "rb") as f:
+            self.buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        if self.buffer[:len(POSTINGS_MAGIC)] != POSTINGS_MAGIC:
+            raise ValueError(f"Not a postings file: {path}")
+
+        (header_len,) = _HEADER_LEN.unpack_from(self.buffer, len(POSTINGS_MAGIC))
+        header_start = len(POSTINGS_MAGIC) + _HEADER_LEN.size
+        header = json.loads(bytes(self.buffer[header_start:header_start + header_len]))
+        base = header_start + header_len
+
+        self.count = header["count"]
+        self.vocabulary: Dict[str, int] = {term: i for i, term in enumerate(header["terms"])}
+        for name in ("offsets", "positions", "frequencies", "doc_lengths"):
+            offset, dtype, count = header["layout"][name]
+            setattr(self, name, np.frombuffer(self.buffer, dtype=dtype, count=count, offset=base + offset))
+
+    def __len__(self) -> int:
+        return self.count
+
+    def lengths(self) -> np.ndarray:
+        return self.doc_lengths
+
+    def postings(self, term: str) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+        term_id = self.vocabulary.get(term)
+        if term_id is None:
+            return None
+        start, end = int(self.offsets[term_id]), int(self.offsets[term_id + 1])
+        return self.positions[start:end], self.frequencies[start:end]
+
+    def memory_bytes(self) -> int:
+        # Mapped bytes plus the parsed term table
+        return len(self.buffer) + len(self.vocabulary) * 100
+
+
+Postings = Union[MemoryPostings, PostingsFile]
+
+
+# =========================
+# Index over a whole store
+# =========================
+
+class BM25Index:
+    """
+    Append-only BM25 inverted index over chunk positions, made of blocks
+    of consecutive positions: memory-mapped postings files of persisted
+    segments, followed by in-memory postings of chunks added since.
+    Reopening a store maps the files instead of re-tokenizing the corpus.
+    Deleted positions are masked until the owning store is purged.
+    """
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+
+        # (start position, postings) in position order
+        self.blocks: List[Tuple[int, Postings]] = []
+        self.count = 0
+        self.dead = bytearray()
+
+        self.live_docs = 0
+        self.total_length = 0
+
+    def __len__(self) -> int:
+        return self.count
+
+    def _append_block(self, start: int, block: Postings):
+        if start != self.count:
+            raise ValueError("BM25Index positions must be appended in order")
+        self.blocks.append((start, block))
+        self.count += len(block)
+        self.dead.extend(bytes(len(block)))
+        self.live_docs += len(block)
+        self.total_length += int(block.lengths().sum(dtype=np.int64))
+
+    def add(self, start: int, texts: Iterable[str]):
+        """Indexes `texts` at positions start, start + 1, ..."""
+        if start != self.count:
+            raise ValueError("BM25Index positions must be appended in order")
+
+        if not self.blocks or not isinstance(self.blocks[-1][1], MemoryPostings):
+            self.blocks.append((start, MemoryPostings()))
+        block = self.blocks[-1][1]
+
+        for text in texts:
+            self.total_length += block.add(text)
+            self.dead.append(0)
+            self.live_docs += 1
+            self.count += 1
+
+    def add_file(self, start: int, postings: PostingsFile):
+        """Appends a persisted segment's postings at positions start, ..."""
+        self._append_block(start, postings)
+
+    def seal(self, start: int, postings: PostingsFile) -> bool:
+        """
+        Swaps the in-memory block at `start` for the same chunks' persisted
+        postings file. Returns False if the block does not match exactly.
+        """
+        if not self.blocks:
+            return False
+        block_start, block = self.blocks[-1]
+        if block_start != start or not isinstance(block, MemoryPostings) or len(block) != len(postings):
+            return False
+        self.blocks[-1] = (start, postings)
+        return True
+
+    def _doc_length(self, position: int) -> int:
+        starts = [start for start, _ in self.blocks]
+        start, block = self.blocks[bisect.bisect_right(starts, position) - 1]
+        return int(block.lengths()[position - start])
+
+    def delete(self, ranges: Iterable[Tuple[int, int]]):
+        for start, end in ranges:
+            for position in range(start, end):
+                if not self.dead[position]:
+                    self.dead[position] = 1
+                    self.live_docs -= 1
+                    self.total_length -= self._doc_length(position)
+
+    def search(
+        self,
+        query: str,
+        top_k: int,
+        ranges: Optional[List[Tuple[int, int]]] = None,
+    ) -> List[Tuple[float, int, float]]:
+        """
+        Returns (bm25 score, position, share of query terms matched),
+        best first. Cost follows the postings of the query terms only.
+        `ranges` restricts results to those position ranges.
+        """
+        query_terms = set(analyze(query))
+        if not query_terms or not self.live_docs or ranges == []:
+            return []
+
+        # Per term, its postings in every block, with global positions
+        found: Dict[str, List[Tuple[np.ndarray, np.ndarray, np.ndarray]]] = {}
+        for start, block in self.blocks:
+            lengths = None
+            for term in query_terms:
+                postings = block.postings(term)
+                if postings is None:
+                    continue
+                local, tf = postings
+                if lengths is None:
+                    lengths = block.lengths()
+                found.setdefault(term, []).append((local.astype(np.int64) + start, tf, lengths[local]))
+        if not found:
+            return []
+
+        avg_length = self.total_length / self.live_docs
+
+        candidates, contributions = [], []
+        for parts in found.values():
+            positions = np.concatenate([p for p, _, _ in parts])
+            tf = np.concatenate([t for _, t, _ in parts]).astype(np.float32)
+            doc_lengths = np.concatenate([l for _, _, l in parts])
+
+            idf = math.log(1 + (self.live_docs - len(positions) + 0.5) / (len(positions) + 0.5))
+            norm = self.k1 * (1 - self.b + self.b * doc_lengths / avg_length)
+            candidates.append(positions)
+            contributions.append(idf * tf * (self.k1 + 1) / (tf + norm))
+
+        candidates = np.concatenate(candidates)
+        unique, inverse = np.unique(candidates, return_inverse=True)
+        scores = np.bincount(inverse, weights=np.concatenate(contributions))
+        matched = np.bincount(inverse)
+
+        keep = np.frombuffer(self.dead, dtype=np.uint8)[unique] == 0
+        if ranges is not None:
+            keep &= _in_ranges(unique, ranges)
+        unique, scores, matched = unique[keep], scores[keep], matched[keep]
+        if not len(unique):
+            return []
+
+        k = min(top_k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [
+            (float(scores[i]), int(unique[i]), float(matched[i] / len(query_terms)))
+            for i in top
+        ]
+
+    def memory_bytes(self) -> int:
+        return sum(block.memory_bytes() for _, block in self.blocks) + len(self.dead)
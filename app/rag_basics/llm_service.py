@@ -1,12 +1,52 @@
+import asyncio
+import json
 import subprocess
-from typing import List
+import threading
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+
+import httpx
+
+
+class LLMUnavailableError(RuntimeError):
+    """Raised when the model backend cannot be reached or times out."""
 
 
 class LLMService:
-    def __init__(self, model_name: str = "llama3"):
+    def __init__(
+        self,
+        model_name: str = "llama3",
+        backend: str = "cli",
+        base_url: str = "http://localhost:11434",
+        timeout: float = 120.0,
+        keep_alive: str = "30m",
+        max_concurrency: int = 4,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+    ):
+        """
+        backend="cli" shells out to `ollama run` per call (original
+        behaviour); backend="http" talks to the Ollama HTTP API over pooled
+        keep-alive connections. `transport` lets tests and load runs point
+        the async client at an in-process stub server.
+        """
         self.model_name = model_name
+        self.backend = backend
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.keep_alive = keep_alive
+        self.max_concurrency = max_concurrency
+        self.transport = transport
 
-    def generate_answer(self, question: str, context_chunks: List[str]) -> str:
+        self._limits = httpx.Limits(
+            max_connections=max_concurrency,
+            max_keepalive_connections=max_concurrency,
+        )
+        self._client: Optional[httpx.Client] = None
+        # Async clients and semaphores are bound to the loop that created
+        # them: one pair per running loop (server loop, eval threads, ...)
+        self._async_clients: Dict[asyncio.AbstractEventLoop, Tuple[httpx.AsyncClient, asyncio.Semaphore]] = {}
+        self._clients_lock = threading.Lock()
+
+    def build_prompt(self, question: str, context_chunks: List[str]) -> str:
         context = "\n\n".join(context_chunks)
 
         prompt = f"""
@@ -33,13 +73,145 @@ class LLMService:
         Answer:
         """.strip()
 
-        result = subprocess.run(
-                ["ollama", "run", self.model_name],
-                input=prompt,
-                text=True,
-                capture_output=True,
-                encoding="utf-8",
-                errors="replace",
-            )
+        return prompt
+
+    def _payload(self, prompt: str, stream: bool) -> dict:
+        return {
+            "model": self.model_name,
+            "prompt": prompt,
+            "stream": stream,
+            "keep_alive": self.keep_alive,
+        }
+
+    # =========================
+    # Sync API
+    # =========================
+
+    def generate_answer(self, question: str, context_chunks: List[str]) -> str:
+        prompt = self.build_prompt(question, context_chunks)
+
+        if self.backend == "http":
+            with self._clients_lock:
+                if self._client is None:
+                    self._client = httpx.Client(base_url=self.base_url, limits=self._limits)
+                client = self._client
+            try:
+                response = client.post(
+                    "/api/generate",
+                    json=self._payload(prompt, stream=False),
+                    timeout=self.timeout,
+                )
+                response.raise_for_status()
+            except httpx.HTTPError as exc:
+                raise LLMUnavailableError(str(exc)) from exc
+            return response.json().get("response", "").strip()
+
+        try:
+            result = subprocess.run(
+                    ["ollama", "run", self.model_name],
+                    input=prompt,
+                    text=True,
+                    capture_output=True,
+                    encoding="utf-8",
+                    errors="replace",
+                    timeout=self.timeout,
+                )
+        except (OSError, subprocess.TimeoutExpired) as exc:
+            raise LLMUnavailableError(str(exc)) from exc
 
         return result.stdout.strip()
+
+    # =========================
+    # Async API
+    # =========================
+
+    def _get_async_client(self) -> Tuple[httpx.AsyncClient, asyncio.Semaphore]:
+        """The running loop's client and concurrency semaphore."""
+        loop = asyncio.get_running_loop()
+        with self._clients_lock:
+            pair = self._async_clients.get(loop)
+            if pair is None:
+                # Entries of loops that have since closed are unusable
+                for closed in [l for l in self._async_clients if l.is_closed()]:
+                    del self._async_clients[closed]
+                pair = self._async_clients[loop] = (
+                    httpx.AsyncClient(
+                        base_url=self.base_url,
+                        limits=self._limits,
+                        transport=self.transport,
+                    ),
+                    asyncio.Semaphore(self.max_concurrency),
+                )
+            return pair
+
+    async def agenerate_answer(
+        self,
+        question: str,
+        context_chunks: List[str],
+        timeout: Optional[float] = None,
+    ) -> str:
+        if self.backend != "http":
+            return await asyncio.to_thread(self.generate_answer, question, context_chunks)
+
+        client, semaphore = self._get_async_client()
+        prompt = self.build_prompt(question, context_chunks)
+
+        async with semaphore:
+            try:
+                response = await client.post(
+                    "/api/generate",
+                    json=self._payload(prompt, stream=False),
+                    timeout=timeout or self.timeout,
+                )
+                response.raise_for_status()
+            except httpx.HTTPError as exc:
+                raise LLMUnavailableError(str(exc) or exc.__class__.__name__) from exc
+
+        return response.json().get("response", "").strip()
+
+    async def astream_answer(
+        self,
+        question: str,
+        context_chunks: List[str],
+        timeout: Optional[float] = None,
+    ) -> AsyncIterator[str]:
+        """
+        Yields answer tokens as the model produces them. Closing the
+        generator early closes the HTTP response, which stops generation.
+        """
+        if self.backend != "http":
+            yield await asyncio.to_thread(self.generate_answer, question, context_chunks)
+            return
+
+        client, semaphore = self._get_async_client()
+        prompt = self.build_prompt(question, context_chunks)
+
+        async with semaphore:
+            try:
+                async with client.stream(
+                    "POST",
+                    "/api/generate",
+                    json=self._payload(prompt, stream=True),
+                    timeout=timeout or self.timeout,
+                ) as response:
+                    response.raise_for_status()
+                    async for line in response.aiter_lines():
+                        if not line:
+                            continue
+                        event = json.loads(line)
+                        if event.get("response"):
+                            yield event["response"]
+                        if event.get("done"):
+                            break
+            except httpx.HTTPError as exc:
+                raise LLMUnavailableError(str(exc) or exc.__class__.__name__) from exc
+
+    async def aclose(self):
+        """Closes the running loop's async client and the sync client."""
+        with self._clients_lock:
+            pair = self._async_clients.pop(asyncio.get_running_loop(), None)
+            client, self._client = self._client, None
+        if pair is not None:
+            await pair[0].aclose()
+        if client is not None:
+            client.close()
@@ -0,0 +1,113 @@
+"""
+Converts per-user vector stores into shared tenant shards.
+
+Each user directory under data/users (segment manifest, or the legacy
+faiss.index + chunks.json pair) is appended to its shard as one segment,
+with deleted rows dropped and doc ids normalized and namespaced as
+"<user>/<doc_id>". Documents already in the shard (live or deleted) are
+skipped, so the tool can be re-run to pick up documents uploaded since;
+a document re-uploaded under the same name is not refreshed. The per-user
+files are left in place; run the app with STORAGE_MODE=sharded and the
+same TENANT_SHARDS afterwards.
+
+Usage (from the repository root):
+    python -m app.rag_basics.migrate_to_shards [users_dir] [shard_root] [num_shards]
+"""
+import json
+import os
+import sys
+from typing import Dict, List, Tuple
+
+import faiss
+import numpy as np
+
+from app.rag_basics.segment_storage import SegmentStorage
+from app.rag_basics.tenant_shards import shard_name, tenant_doc_id
+from app.rag_basics.vector_store import normalize_doc_id
+
+
+def load_user_rows(user_dir: str) -> Tuple[np.ndarray, List[dict]]:
+    """Live vectors and chunks of one per-user store, in position order."""
+    storage = SegmentStorage(user_dir)
+    if storage.exists():
+        vectors, chunks = storage.load()
+        chunks = list(chunks)
+        live = np.ones(len(chunks), dtype=bool)
+        for start, end in storage.tombstones():
+            live[start:end] = False
+        return vectors[live], [c for c, keep in zip(chunks, live) if keep]
+
+    index_path = os.path.join(user_dir, "faiss.index")
+    metadata_path = os.path.join(user_dir, "chunks.json")
+    if os.path.exists(index_path) and os.path.exists(metadata_path):
+        index = faiss.read_index(index_path)
+        with open(metadata_path, "r", encoding="utf-8") as f:
+            chunks = json.load(f)
+        return index.reconstruct_n(0, index.ntotal), chunks
+
+    return np.zeros((0, 0), dtype=np.float32), []
+
+
+def migrated_documents(storage: SegmentStorage) -> set:
+    """Namespaced doc ids with rows in the shard, deleted ones included."""
+    if not storage.exists():
+        return set()
+    return {normalize_doc_id(doc_id) for doc_id, _, _ in storage.load_chunks().doc_runs()}
+
+
+def migrate(users_dir: str, shard_root: str, num_shards: int) -> Dict[str, int]:
+    shards: Dict[str, SegmentStorage] = {}
+    done: Dict[str, set] = {}
+    summary = {"users": 0, "documents": 0, "skipped": 0, "chunks": 0}
+
+    for user_id in sorted(os.listdir(users_dir)):
+        user_dir = os.path.join(users_dir, user_id)
+        if not os.path.isdir(user_dir):
+            continue
+
+        name = shard_name(user_id, num_shards)
+        if name not in shards:
+            os.makedirs(os.path.join(shard_root, name), exist_ok=True)
+            shards[name] = SegmentStorage(os.path.join(shard_root, name))
+            done[name] = migrated_documents(shards[name])
+
+        vectors, chunks = load_user_rows(user_dir)
+        doc_ids = [tenant_doc_id(user_id, normalize_doc_id(c["metadata"].get("doc_id", ""))) for c in chunks]
+        new = [i for i, doc_id in enumerate(doc_ids) if doc_id not in done[name]]
+        summary["skipped"] += len(set(doc_ids) & done[name])
+        if not new:
+            continue
+
+        chunks = [
+            {**chunks[i], "metadata": {**chunks[i]["metadata"], "doc_id": doc_ids[i]}}
+            for i in new
+        ]
+        shards[name].append(np.ascontiguousarray(vectors[new], dtype=np.float32), chunks)
+        migrated = {doc_ids[i] for i in new}
+        done[name].update(migrated)
+
+        summary["users"] += 1
+        summary["documents"] += len(migrated)
+        summary["chunks"] += len(chunks)
+        print(f"{user_id} -> {name}: {len(migrated)} documents, {len(chunks)} chunks")
+
+    # One segment per user so far; fold each shard into a single segment
+    for name, storage in shards.items():
+        storage.compact()
+        print(f"{name}: {storage.segment_count()} segment(s)")
+
+    return summary
+
+
+def main():
+    users_dir = sys.argv[1] if len(sys.argv) > 1 else "data/users"
+    shard_root = sys.argv[2] if len(sys.argv) > 2 else "data/shards"
+    num_shards = int(sys.argv[3]) if len(sys.argv) > 3 else int(os.getenv("TENANT_SHARDS", 16))
+
+    summary = migrate(users_dir, shard_root, num_shards)
+    print(f"migrated {summary['documents']} documents of {summary['users']} users "
+          f"({summary['chunks']} chunks), skipped {summary['skipped']} already in their shard")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+"""
+Minimal stand-in for the Ollama HTTP API, for offline load tests.
+
+Run it as a server:
+    OLLAMA_STUB_LATENCY_MS=200 uvicorn app.rag_basics.ollama_stub:app --port 11435
+    OLLAMA_BASE_URL=http://localhost:11435 LLM_BACKEND=http uvicorn app.main:app
+
+or plug it into LLMService in-process:
+    LLMService(backend="http", transport=httpx.ASGITransport(app=app))
+"""
+import asyncio
+import json
+import os
+
+from fastapi import FastAPI, Request
+from fastapi.responses import StreamingResponse
+
+
+STUB_LATENCY_MS = float(os.getenv("OLLAMA_STUB_LATENCY_MS", 100))
+STUB_TOKEN_DELAY_MS = float(os.getenv("OLLAMA_STUB_TOKEN_DELAY_MS", 5))
+STUB_ANSWER = os.getenv(
+    "OLLAMA_STUB_ANSWER",
+    "This is a stubbed answer generated without a model.",
+)
+
+app = FastAPI(title="Ollama stub")
+
+
+@app.get("/api/tags")
+async def tags():
+    return {"models": [{"name": "llama3:latest"}]}
+
+
+@app.post("/api/generate")
+async def generate(request: Request):
+    body = await request.json()
+    model = body.get("model", "llama3")
+
+    await asyncio.sleep(STUB_LATENCY_MS / 1000)
+
+    if not body.get("stream", True):
+        return {"model": model, "response": STUB_ANSWER, "done": True}
+
+    async def tokens():
+        for word in STUB_ANSWER.split(" "):
+            await asyncio.sleep(STUB_TOKEN_DELAY_MS / 1000)
+            yield json.dumps({"model": model, "response": word + " ", "done": False}) + "\n"
+        yield json.dumps({"model": model, "response": "", "done": True}) + "\n"
+
+    return StreamingResponse(tokens(), media_type="application/x-ndjson")
@@ -0,0 +1,187 @@
+import inspect
+import json
+import os
+from typing import Dict, List
+
+import numpy as np
+
+
+ONNX_MODEL_NAME = "model.onnx"
+QUANTIZED_MODEL_NAME = "model_int8.onnx"
+ENCODER_CONFIG = "encoder.json"
+
+# Compared against the torch model when an ONNX file is exported
+VERIFY_TEXTS = [
+    "Retrieval augmented generation grounds answers in uploaded documents.",
+    "FastAPI routes are declared with path operation decorators.",
+    "Roll number 03, submitted for 20MCA104 Advanced Computer Networks.",
+    "If the answer is not present, refuse instead of guessing.",
+    "short",
+]
+
+
+def model_file(quantized: bool) -> str:
+    return QUANTIZED_MODEL_NAME if quantized else ONNX_MODEL_NAME
+
+
+def is_exported(directory: str, quantized: bool) -> bool:
+    config_path = os.path.join(directory, ENCODER_CONFIG)
+    if not os.path.exists(config_path):
+        return False
+    with open(config_path, "r", encoding="utf-8") as f:
+        config = json.load(f)
+    return model_file(quantized) in config.get("verification", {})
+
+
+def export_onnx(model_name: str, directory: str, quantize: bool = True, tolerance: float = 0.02) -> Dict:
+    """
+    Exports a mean-pooling sentence-transformers model to ONNX (and an
+    int8 dynamically quantized copy), then checks the ONNX embeddings
+    against the torch model. Needs torch; loading the result does not.
+    Raises ValueError when the exported model is out of tolerance.
+    """
+    import torch
+    from sentence_transformers import SentenceTransformer
+
+    model = SentenceTransformer(model_name, device="cpu")
+    pooling = model[1]
+    # 2.x exposes get_pooling_mode_str(); later releases a pooling_mode field
+    mode = pooling.get_pooling_mode_str() if hasattr(pooling, "get_pooling_mode_str") else pooling.pooling_mode
+    if mode != "mean":
+        raise ValueError(f"{model_name}: only mean pooling is supported by the ONNX backend")
+
+    os.makedirs(directory, exist_ok=True)
+    model.tokenizer.save_pretrained(directory)
+
+    transformer = model[0].auto_model.eval()
+    sample = model.tokenizer(["export sample"], return_tensors="pt")
+    # Positional inputs in forward() order
+    input_names = [
+        name for name in inspect.signature(transformer.forward).parameters
+        if name in sample
+    ]
+    dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in input_names}
+    dynamic_axes["last_hidden_state"] = {0: "batch", 1: "sequence"}
+
+    fp32_path = os.path.join(directory, ONNX_MODEL_NAME)
+    with torch.no_grad():
+        torch.onnx.export(
+            transformer,
+            tuple(sample[name] for name in input_names),
+            fp32_path,
+            input_names=input_names,
+            output_names=["last_hidden_state"],
+            dynamic_axes=dynamic_axes,
+            opset_version=14,
+        )
+
+    if quantize:
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+
+        quantize_dynamic(
+            fp32_path,
+            os.path.join(directory, QUANTIZED_MODEL_NAME),
+            weight_type=QuantType.QInt8,
+        )
+
+    config = {
+        "model_name": model_name,
+        "max_seq_length": model.max_seq_length,
+        "dim": model.get_sentence_embedding_dimension(),
+        "verification": {},
+    }
+    with open(os.path.join(directory, ENCODER_CONFIG), "w", encoding="utf-8") as f:
+        json.dump(config, f, indent=2)
+
+    reference = model.encode(VERIFY_TEXTS, convert_to_numpy=True, normalize_embeddings=True)
+    for quantized in ([False, True] if quantize else [False]):
+        encoded = OnnxEncoder(directory, quantized=quantized).encode(VERIFY_TEXTS)
+        config["verification"][model_file(quantized)] = compare_embeddings(encoded, reference, tolerance)
+
+    failed = [name for name, check in config["verification"].items() if not check["ok"]]
+    if failed:
+        raise ValueError(f"{model_name}: ONNX embeddings out of tolerance for {', '.join(failed)}")
+
+    with open(os.path.join(directory, ENCODER_CONFIG), "w", encoding="utf-8") as f:
+        json.dump(config, f, indent=2)
+    return config
+
+
+def compare_embeddings(embeddings: np.ndarray, reference: np.ndarray, tolerance: float) -> Dict:
+    """Row-wise cosine between two sets of normalized embeddings."""
+    cosines = np.sum(embeddings * reference, axis=1)
+    return {
+        "min_cosine": float(cosines.min()),
+        "mean_cosine": float(cosines.mean()),
+        "tolerance": tolerance,
+        "ok": bool(cosines.min() >= 1 - tolerance),
+    }
+
+
+class OnnxEncoder:
+    """
+    Runs an exported model with ONNX Runtime on CPU. Exposes the parts of
+    the SentenceTransformer API that EmbeddingService and chunking use:
+    encode(), tokenizer and max_seq_length.
+    """
+
+    def __init__(self, directory: str, quantized: bool = True, num_threads: int = 0):
+        import onnxruntime as ort
+        from transformers import AutoTokenizer
+
+        with open(os.path.join(directory, ENCODER_CONFIG), "r", encoding="utf-8") as f:
+            config = json.load(f)
+
+        self.max_seq_length = config["max_seq_length"]
+        self.dim = config["dim"]
+        self.tokenizer = AutoTokenizer.from_pretrained(directory)
+
+        options = ort.SessionOptions()
+        if num_threads:
+            options.intra_op_num_threads = num_threads
+        options.inter_op_num_threads = 1
+
+        self.session = ort.InferenceSession(
+            os.path.join(directory, model_file(quantized)),
+            options,
+            providers=["CPUExecutionProvider"],
+        )
+        self.input_names = [i.name for i in self.session.get_inputs()]
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return self.dim
+
+    def encode(
+        self,
+        texts: List[str],
+        batch_size: int = 32,
+        convert_to_numpy: bool = True,
+        normalize_embeddings: bool = True,
+    ) -> np.ndarray:
+        if not texts:
+            return np.zeros((0, self.dim), dtype=np.float32)
+
+        # Similar lengths share a batch, so less padding is computed
+        order = np.argsort([-len(t) for t in texts], kind="stable")
+        embeddings = np.empty((len(texts), self.dim), dtype=np.float32)
+
+        for start in range(0, len(texts), batch_size):
+            rows = order[start:start + batch_size]
+            features = self.tokenizer(
+                [texts[i] for i in rows],
+                padding=True,
+                truncation=True,
+                max_length=self.max_seq_length,
+                return_tensors="np",
+            )
+            inputs = {name: features[name].astype(np.int64) for name in self.input_names}
+            hidden = self.session.run(None, inputs)[0]
+
+            # Mean pooling over real tokens
+            mask = features["attention_mask"][..., None].astype(np.float32)
+            pooled = (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+            if normalize_embeddings:
+                pooled /= np.clip(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12, None)
+            embeddings[rows] = pooled
+
+        return embeddings
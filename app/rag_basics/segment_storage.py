@@ -0,0 +1,415 @@
+import json
+import os
+import threading
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+import faiss
+import numpy as np
+
+from app.rag_basics.chunk_store import ChunkFile, ChunkStore, write_chunk_file
+from app.rag_basics.lexical_index import PostingsFile, write_postings_file
+
+
+MANIFEST_NAME = "manifest.json"
+SEGMENTS_DIR = "segments"
+ANN_INDEX_NAME = "ann.index"
+
+
+def atomic_write(path: str, write: Callable, mode: str = "wb"):
+    """
+    Writes through a temp file and renames it over `path`, so readers
+    either see the old file or the complete new one.
+    """
+    tmp_path = path + ".tmp"
+    with open(tmp_path, mode) as f:
+        write(f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def atomic_write_index(index, path: str):
+    tmp_path = path + ".tmp"
+    faiss.write_index(index, tmp_path)
+    with open(tmp_path, "rb") as f:
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def read_index_mmap(path: str):
+    """
+    Prefers a memory-mapped, read-only load so cold reads only page in
+    what is used; falls back to a regular read for unsupported types.
+    IO_FLAG_MMAP only maps IVF inverted lists: flat segments need
+    IO_FLAG_MMAP_IFC (faiss >= 1.10), else they are read into memory.
+    """
+    flags = getattr(faiss, "IO_FLAG_MMAP_IFC", 0)
+    if flags:
+        try:
+            return faiss.read_index(path, flags | faiss.IO_FLAG_READ_ONLY)
+        except RuntimeError:
+            pass
+    return faiss.read_index(path)
+
+
+class SegmentStorage:
+    """
+    Append-only on-disk layout for a vector store.
+
+    Every persist writes one immutable segment (a flat FAISS index holding
+    that segment's vectors, a metadata file and its BM25 postings) and then
+    swaps in a new
+    manifest listing the live segments in order. Compaction merges
+    segments into one without blocking appends.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.segments_dir = os.path.join(directory, SEGMENTS_DIR)
+        self.manifest_path = os.path.join(directory, MANIFEST_NAME)
+        self.lock = threading.Lock()
+        self.compacting = False
+
+    # =========================
+    # Manifest
+    # =========================
+
+    def exists(self) -> bool:
+        return os.path.exists(self.manifest_path)
+
+    def read_manifest(self) -> Dict:
+        if not self.exists():
+            return {"version": 1, "next_segment": 1, "segments": []}
+        with open(self.manifest_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def _write_manifest(self, manifest: Dict):
+        atomic_write(
+            self.manifest_path,
+            lambda f: json.dump(manifest, f, indent=2),
+            mode="w",
+        )
+
+    def _reserve_segment_id(self) -> int:
+        manifest = self.read_manifest()
+        segment_id = manifest["next_segment"]
+        manifest["next_segment"] = segment_id + 1
+        self._write_manifest(manifest)
+        return segment_id
+
+    def segment_count(self) -> int:
+        return len(self.read_manifest()["segments"])
+
+    def dim(self) -> int:
+        return self.read_manifest().get("dim", 0)
+
+    # =========================
+    # Segment files
+    # =========================
+
+    def _segment_paths(self, segment_id: int) -> Tuple[str, str, str]:
+        name = f"{segment_id:06d}"
+        return (
+            os.path.join(SEGMENTS_DIR, f"{name}.index"),
+            os.path.join(SEGMENTS_DIR, f"{name}.chunks"),
+            os.path.join(SEGMENTS_DIR, f"{name}.postings"),
+        )
+
+    def _write_segment(self, segment_id: int, vectors: np.ndarray, chunks: Iterable[dict]) -> Dict:
+        os.makedirs(self.segments_dir, exist_ok=True)
+        vectors_file, metadata_file, postings_file = self._segment_paths(segment_id)
+
+        index = faiss.IndexFlatIP(vectors.shape[1])
+        index.add(np.ascontiguousarray(vectors, dtype=np.float32))
+        atomic_write_index(index, os.path.join(self.directory, vectors_file))
+        atomic_write(
+            os.path.join(self.directory, metadata_file),
+            lambda f: write_chunk_file(f, chunks),
+        )
+        # Postings are built from the written file, so `chunks` may be a
+        # one-shot iterator
+        chunk_file = ChunkFile(os.path.join(self.directory, metadata_file))
+        atomic_write(
+            os.path.join(self.directory, postings_file),
+            lambda f: write_postings_file(f, (chunk_file[i]["text"] for i in range(len(chunk_file)))),
+        )
+
+        return {
+            "id": segment_id,
+            "vectors": vectors_file,
+            "metadata": metadata_file,
+            "postings": postings_file,
+            "count": int(vectors.shape[0]),
+        }
+
+    def open_chunks(self, segment: Dict):
+        path = os.path.join(self.directory, segment["metadata"])
+        if path.endswith(".json"):
+            # Segments written before the binary chunk format
+            with open(path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        return ChunkFile(path)
+
+    def open_postings(self, segment: Dict) -> Optional[PostingsFile]:
+        """The segment's BM25 postings, or None for segments written before them."""
+        if "postings" not in segment:
+            return None
+        return PostingsFile(os.path.join(self.directory, segment["postings"]))
+
+    def open_vectors(self, segment: Dict):
+        """The segment's exact vectors as a memory-mapped flat index."""
+        return read_index_mmap(os.path.join(self.directory, segment["vectors"]))
+
+    def _read_segment(self, segment: Dict):
+        index = self.open_vectors(segment)
+        vectors = index.reconstruct_n(0, index.ntotal)
+        return vectors, self.open_chunks(segment)
+
+    # =========================
+    # Public API
+    # =========================
+
+    def append(
+        self,
+        vectors: np.ndarray,
+        chunks: List[dict],
+        tombstones: Iterable[Tuple[int, int]] = (),
+    ) -> Dict:
+        """
+        Writes one segment and commits it to the manifest, together with
+        any `tombstones` for rows it replaces.
+        """
+        if len(chunks) == 0:
+            return None
+
+        with self.lock:
+            segment_id = self._reserve_segment_id()
+            segment = self._write_segment(segment_id, vectors, chunks)
+
+            # The manifest is the commit point: a crash before this line
+            # leaves an orphaned segment file, never a half-visible one.
+            manifest = self.read_manifest()
+            manifest["dim"] = int(vectors.shape[1])
+            manifest["segments"].append(segment)
+            tombstones = [[int(s), int(e)] for s, e in tombstones]
+            if tombstones:
+                manifest.setdefault("tombstones", []).extend(tombstones)
+            self._write_manifest(manifest)
+
+        return segment
+
+    def load(self) -> Tuple[np.ndarray, ChunkStore]:
+        all_vectors = []
+        all_chunks = ChunkStore()
+
+        # Held so compaction cannot delete segment files mid-read
+        with self.lock:
+            manifest = self.read_manifest()
+            for segment in manifest["segments"]:
+                vectors, chunks = self._read_segment(segment)
+                all_vectors.append(vectors)
+                if isinstance(chunks, ChunkFile):
+                    all_chunks.add_file(chunks)
+                else:
+                    all_chunks.extend(chunks)
+
+        if not all_vectors:
+            return np.zeros((0, manifest.get("dim", 0)), dtype=np.float32), all_chunks
+
+        return np.vstack(all_vectors), all_chunks
+
+    def load_chunks(self) -> ChunkStore:
+        """Every segment's chunks, without reading any vectors."""
+        all_chunks = ChunkStore()
+        with self.lock:
+            for segment in self.read_manifest()["segments"]:
+                chunks = self.open_chunks(segment)
+                if isinstance(chunks, ChunkFile):
+                    all_chunks.add_file(chunks)
+                else:
+                    all_chunks.extend(chunks)
+        return all_chunks
+
+    def open_exact_vectors(self) -> List[Tuple[int, faiss.Index]]:
+        """(start position, memory-mapped flat index) for every segment."""
+        with self.lock:
+            result = []
+            start = 0
+            for segment in self.read_manifest()["segments"]:
+                result.append((start, self.open_vectors(segment)))
+                start += segment["count"]
+        return result
+
+    def open_all_postings(self) -> List[Tuple[int, int, Optional[PostingsFile]]]:
+        """(start position, count, postings or None) for every segment."""
+        with self.lock:
+            result = []
+            start = 0
+            for segment in self.read_manifest()["segments"]:
+                result.append((start, segment["count"], self.open_postings(segment)))
+                start += segment["count"]
+        return result
+
+    def load_vectors(self) -> np.ndarray:
+        with self.lock:
+            manifest = self.read_manifest()
+            vectors = [
+                self._read_segment(segment)[0]
+                for segment in manifest["segments"]
+            ]
+
+        if not vectors:
+            return np.zeros((0, manifest.get("dim", 0)), dtype=np.float32)
+        return np.vstack(vectors)
+
+    # =========================
+    # Trained ANN snapshot
+    # =========================
+
+    def save_ann(self, index, count: int):
+        """
+        Stores a trained ANN index covering the first `count` vectors, so
+        reloads add only the vectors appended after it.
+        """
+        with self.lock:
+            atomic_write_index(index, os.path.join(self.directory, ANN_INDEX_NAME))
+            manifest = self.read_manifest()
+            manifest["ann"] = {"file": ANN_INDEX_NAME, "count": count}
+            self._write_manifest(manifest)
+
+    def load_ann(self):
+        manifest = self.read_manifest()
+        ann = manifest.get("ann")
+        if not ann:
+            return None, 0
+
+        path = os.path.join(self.directory, ann["file"])
+        if not os.path.exists(path):
+            return None, 0
+        return faiss.read_index(path), ann["count"]
+
+    # =========================
+    # Tombstones
+    # =========================
+
+    def tombstones(self) -> List[Tuple[int, int]]:
+        return [(start, end) for start, end in self.read_manifest().get("tombstones", [])]
+
+    def add_tombstones(self, ranges: Iterable[Tuple[int, int]]):
+        """Marks position ranges as deleted; rows stay on disk until purge()."""
+        with self.lock:
+            manifest = self.read_manifest()
+            manifest.setdefault("tombstones", []).extend([int(s), int(e)] for s, e in ranges)
+            self._write_manifest(manifest)
+
+    def purge(self) -> bool:
+        """
+        Rewrites storage as a single segment holding only live rows.
+        Positions shift, so tombstones are cleared and the ANN snapshot
+        is dropped. Returns False when there was nothing to purge or a
+        segment merge is running.
+        """
+        with self.lock:
+            manifest = self.read_manifest()
+            dead = manifest.get("tombstones", [])
+            if not dead or self.compacting:
+                return False
+
+            segments = manifest["segments"]
+            vectors, chunks = [], ChunkStore()
+            for segment in segments:
+                v, c = self._read_segment(segment)
+                vectors.append(v)
+                if isinstance(c, ChunkFile):
+                    chunks.add_file(c)
+                else:
+                    chunks.extend(c)
+
+            keep = np.ones(len(chunks), dtype=bool)
+            for start, end in dead:
+                keep[start:end] = False
+            live = np.flatnonzero(keep)
+
+            merged = []
+            if live.size:
+                segment_id = manifest["next_segment"]
+                manifest["next_segment"] = segment_id + 1
+                merged = [self._write_segment(
+                    segment_id,
+                    np.vstack(vectors)[live],
+                    (chunks[int(i)] for i in live),
+                )]
+
+            ann = manifest.pop("ann", None)
+            manifest["segments"] = merged
+            manifest["tombstones"] = []
+            self._write_manifest(manifest)
+
+        self._remove_segment_files(segments)
+        if ann:
+            path = os.path.join(self.directory, ann["file"])
+            if os.path.exists(path):
+                os.remove(path)
+        return True
+
+    def compact(self):
+        """
+        Merges all current segments into one. Segments appended while the
+        merge runs are kept after the merged segment.
+        """
+        with self.lock:
+            snapshot = list(self.read_manifest()["segments"])
+            if len(snapshot) < 2:
+                return
+            segment_id = self._reserve_segment_id()
+
+        vectors, chunks = [], ChunkStore()
+        for segment in snapshot:
+            v, c = self._read_segment(segment)
+            vectors.append(v)
+            if isinstance(c, ChunkFile):
+                chunks.add_file(c)
+            else:
+                chunks.extend(c)
+
+        merged = self._write_segment(segment_id, np.vstack(vectors), chunks)
+
+        with self.lock:
+            manifest = self.read_manifest()
+            snapshot_ids = [s["id"] for s in snapshot]
+            current_ids = [s["id"] for s in manifest["segments"]]
+            if current_ids[:len(snapshot_ids)] != snapshot_ids:
+                # Layout changed underneath us; drop the merged segment.
+                self._remove_segment_files([merged])
+                return
+
+            manifest["segments"] = [merged] + manifest["segments"][len(snapshot):]
+            self._write_manifest(manifest)
+
+        self._remove_segment_files(snapshot)
+
+    def compact_in_background(self, min_segments: int):
+        if self.segment_count() < min_segments:
+            return
+
+        with self.lock:
+            if self.compacting:
+                return
+            self.compacting = True
+
+        def run():
+            try:
+                self.compact()
+            finally:
+                self.compacting = False
+
+        threading.Thread(target=run, name="segment-compaction", daemon=True).start()
+
+    def _remove_segment_files(self, segments: List[Dict]):
+        for segment in segments:
+            for key in ("vectors", "metadata", "postings"):
+                if key not in segment:
+                    continue
+                path = os.path.join(self.directory, segment[key])
+                if os.path.exists(path):
+                    os.remove(path)
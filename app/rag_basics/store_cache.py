@@ -0,0 +1,99 @@
+from collections import OrderedDict
+from threading import Lock
+from typing import Dict, Optional
+
+
+class VectorStoreCache:
+    """
+    LRU cache of loaded vector stores bounded by a memory budget.
+
+    Each entry is charged the store's `memory_bytes()`. When the total
+    exceeds `max_bytes`, least recently used stores are dropped; they are
+    reloaded from disk the next time they are needed. Stores that grow in
+    place (ANN upgrade, lexical index build) report it through `on_grow`
+    and are re-measured.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.stores: "OrderedDict[str, object]" = OrderedDict()
+        self.sizes: Dict[str, int] = {}
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.lock = Lock()
+
+    def get(self, key: str):
+        with self.lock:
+            store = self.stores.get(key)
+            if store is None:
+                self.misses += 1
+                return None
+
+            self.stores.move_to_end(key)
+            self.hits += 1
+            return store
+
+    def put(self, key: str, store):
+        with self.lock:
+            self.stores[key] = store
+            self.stores.move_to_end(key)
+            store.on_grow = lambda: self.resize(key)
+            self._charge(key, store.memory_bytes())
+            self._evict(keep=key)
+
+    def resize(self, key: str):
+        """Re-measures a store after it has grown."""
+        with self.lock:
+            store = self.stores.get(key)
+            if store is None:
+                return
+            self._charge(key, store.memory_bytes())
+            self._evict(keep=key)
+
+    def pop(self, key: str) -> Optional[object]:
+        with self.lock:
+            store = self.stores.pop(key, None)
+            self.total_bytes -= self.sizes.pop(key, 0)
+            return store
+
+    def clear(self):
+        with self.lock:
+            self.stores.clear()
+            self.sizes.clear()
+            self.total_bytes = 0
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.stores
+
+    def __len__(self) -> int:
+        return len(self.stores)
+
+    def _charge(self, key: str, size: int):
+        self.total_bytes += size - self.sizes.get(key, 0)
+        self.sizes[key] = size
+
+    def _evict(self, keep: str):
+        # The store just used is never evicted, even if it alone is over budget
+        while self.total_bytes > self.max_bytes and len(self.stores) > 1:
+            key = next(iter(self.stores))
+            if key == keep:
+                self.stores.move_to_end(key)
+                continue
+            del self.stores[key]
+            self.total_bytes -= self.sizes.pop(key)
+            self.evictions += 1
+
+    def stats(self) -> Dict:
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "stores": len(self.stores),
+                "bytes": self.total_bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+            }
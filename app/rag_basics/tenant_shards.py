@@ -0,0 +1,100 @@
+import zlib
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from app.rag_basics.vector_store import FAISSVectorStore, normalize_doc_id
+
+
+TENANT_SEPARATOR = "/"
+
+
+def shard_name(tenant: str, num_shards: int) -> str:
+    """Stable tenant -> shard assignment (crc32, so it survives restarts)."""
+    return f"shard-{zlib.crc32(tenant.encode('utf-8')) % num_shards:03d}"
+
+
+def tenant_doc_id(tenant: str, doc_id: str) -> str:
+    return f"{tenant}{TENANT_SEPARATOR}{doc_id}"
+
+
+def tenants_of(store: FAISSVectorStore) -> List[str]:
+    return sorted({d.split(TENANT_SEPARATOR, 1)[0] for d in store.doc_ranges if TENANT_SEPARATOR in d})
+
+
+class TenantView:
+    """
+    One tenant's slice of a shared shard store.
+
+    Every chunk in a shard carries a "<tenant>/<doc_id>" doc_id, so a
+    tenant's rows are the union of its documents' position ranges. Search
+    is an exact scan over those ranges (tenants are small; the shard's ANN
+    index would have to over-fetch to filter them). Doc ids are prefixed on
+    the way in and stripped from returned chunks, so callers see the same
+    API and metadata as a per-user FAISSVectorStore.
+    """
+
+    def __init__(self, store: FAISSVectorStore, tenant: str):
+        self.store = store
+        self.tenant = tenant
+        self.prefix = tenant + TENANT_SEPARATOR
+
+    def __getattr__(self, name):
+        # Shard-wide state (lock, upgrading, dead_count, backend, ...)
+        return getattr(self.store, name)
+
+    @property
+    def doc_ranges(self) -> Dict[str, List[Tuple[int, int]]]:
+        with self.store.lock:
+            return {
+                doc_id[len(self.prefix):]: ranges
+                for doc_id, ranges in self.store.doc_ranges.items()
+                if doc_id.startswith(self.prefix)
+            }
+
+    def _ranges(self, doc_id: Optional[str] = None) -> List[Tuple[int, int]]:
+        if doc_id is not None:
+            return list(self.store.doc_ranges.get(normalize_doc_id(self.prefix + doc_id), []))
+        with self.store.lock:
+            return sorted(r for ranges in self.doc_ranges.values() for r in ranges)
+
+    def _strip(self, chunk: dict) -> dict:
+        metadata = chunk["metadata"]
+        return {**chunk, "metadata": {**metadata, "doc_id": metadata["doc_id"][len(self.prefix):]}}
+
+    def has_documents(self) -> bool:
+        return any(d.startswith(self.prefix) for d in list(self.store.doc_ranges))
+
+    def live_count(self) -> int:
+        return sum(end - start for start, end in self._ranges())
+
+    def add_embeddings(self, embeddings: np.ndarray, chunks: List[dict]):
+        chunks = [
+            {**c, "metadata": {**c["metadata"], "doc_id": self.prefix + c["metadata"].get("doc_id", "")}}
+            for c in chunks
+        ]
+        self.store.add_embeddings(embeddings, chunks)
+
+    def delete_document(self, doc_id: str) -> List[Tuple[int, int]]:
+        return self.store.delete_document(self.prefix + doc_id)
+
+    def search(self, query_embedding: np.ndarray, top_k: int = 3, doc_id: Optional[str] = None):
+        return self.search_batch(query_embedding, top_k, doc_id)[0]
+
+    def search_batch(self, query_embeddings: np.ndarray, top_k: int = 3, doc_id: Optional[str] = None):
+        with self.store.lock:
+            rows = self.store.search_batch(query_embeddings, top_k, ranges=self._ranges(doc_id))
+        return [[{**r, "chunk": self._strip(r["chunk"])} for r in row] for row in rows]
+
+    def lexical_search(self, query: str, top_k: int = 3, doc_id: Optional[str] = None):
+        with self.store.lock:
+            hits = self.store.lexical_search(query, top_k, ranges=self._ranges(doc_id))
+        return [{**h, "chunk": self._strip(h["chunk"])} for h in hits]
+
+    def vectors(self) -> np.ndarray:
+        """The tenant's live vectors, in position order."""
+        with self.store.lock:
+            ranges = self._ranges()
+            if not ranges:
+                return np.zeros((0, self.store.index.d), dtype=np.float32)
+            return np.vstack([self.store._vectors_range(start, end) for start, end in ranges])
@@ -1,48 +1,484 @@
+import bisect
 import faiss
 import numpy as np
 import json
 import os
-from typing import List
+import threading
+from typing import Callable, Dict, List, Optional, Tuple
+
+from app.rag_basics.chunk_store import ChunkFile, ChunkStore
+from app.rag_basics.index_backends import (
+    IndexConfig,
+    SegmentedFlatIndex,
+    add_vectors,
+    backend_of,
+    build_index,
+    enable_reconstruct,
+    index_nbytes,
+    new_flat_index,
+    search_params,
+    storage_of,
+)
+from app.rag_basics.lexical_index import BM25Index
+from app.rag_basics.segment_storage import SegmentStorage
+
+
+def normalize_doc_id(doc_id: str) -> str:
+    """
+    Canonical doc id: the file name lowercased without ".pdf", as PDFLoader
+    derives it. Legacy stores kept the original name ("ACN-ASSIGNMENT2.pdf");
+    a "<tenant>/" prefix is left untouched.
+    """
+    prefix, separator, name = doc_id.rpartition("/")
+    return prefix + separator + name.lower().replace(".pdf", "")
+
+
+def _subtract_ranges(ranges: List[Tuple[int, int]], removed: List[Tuple[int, int]]) -> List[Tuple[int, int]]:
+    result = []
+    for start, end in ranges:
+        pieces = [(start, end)]
+        for r_start, r_end in removed:
+            next_pieces = []
+            for p_start, p_end in pieces:
+                if r_end <= p_start or r_start >= p_end:
+                    next_pieces.append((p_start, p_end))
+                    continue
+                if p_start < r_start:
+                    next_pieces.append((p_start, r_start))
+                if r_end < p_end:
+                    next_pieces.append((r_end, p_end))
+            pieces = next_pieces
+        result.extend(pieces)
+    return result
 
 
 class FAISSVectorStore:
-    def __init__(self, embedding_dim: int):
-        self.index = faiss.IndexFlatIP(embedding_dim)
-        self.text_chunks: List[dict] = []
+    def __init__(self, embedding_dim: int, index_config: Optional[IndexConfig] = None):
+        self.index_config = index_config or IndexConfig()
+        self.index = new_flat_index(embedding_dim, self.index_config)
+        self.text_chunks = ChunkStore()
+        # Exact vectors added since the last persist
+        self.pending_vectors: List[np.ndarray] = []
+        # Exact vectors of persisted segments: (start position, mmapped flat index)
+        self.exact_segments: List[Tuple[int, faiss.Index]] = []
+        self.lock = threading.RLock()
+        self.upgrading = False
+        # doc_id -> [(start, end)] position ranges; uploads append contiguously
+        self.doc_ranges: Dict[str, List[Tuple[int, int]]] = {}
+        # Deleted position ranges, excluded from search until storage is purged
+        self.tombstones: List[Tuple[int, int]] = []
+        # Tombstones not yet in the manifest; persist() commits them
+        # together with the pending vectors
+        self.pending_tombstones: List[Tuple[int, int]] = []
+        self.dead_count = 0
+        self._dead_ids = None
+        self._live_selector = None
+        # Kept up to date by add_embeddings; reopened stores map the
+        # postings persisted with each segment
+        self.lexical_index = BM25Index()
+        # Called (without the lock held) after the store grows in place,
+        # so whoever charged memory_bytes() can re-measure it
+        self.on_grow: Optional[Callable[[], None]] = None
+
+    @property
+    def backend(self) -> str:
+        return backend_of(self.index)
+
+    @property
+    def storage(self) -> str:
+        return storage_of(self.index)
+
+    def memory_bytes(self) -> int:
+        with self.lock:
+            pending = sum(v.nbytes for v in self.pending_vectors)
+            lexical = self.lexical_index.memory_bytes()
+            return index_nbytes(self.index) + self.text_chunks.memory_bytes() + pending + lexical
+
+    def _grew(self):
+        if self.on_grow is not None:
+            self.on_grow()
+
+    def _add_doc_run(self, doc_id: str, start: int, end: int):
+        ranges = self.doc_ranges.setdefault(normalize_doc_id(doc_id), [])
+        if ranges and ranges[-1][1] == start:
+            ranges[-1] = (ranges[-1][0], end)
+        else:
+            ranges.append((start, end))
+
+    def _rebuild_doc_ranges(self):
+        self.doc_ranges = {}
+        for doc_id, start, end in self.text_chunks.doc_runs():
+            self._add_doc_run(doc_id, start, end)
+
+        if self.tombstones:
+            for doc_id in list(self.doc_ranges):
+                live = _subtract_ranges(self.doc_ranges[doc_id], self.tombstones)
+                if live:
+                    self.doc_ranges[doc_id] = live
+                else:
+                    del self.doc_ranges[doc_id]
+
+    # 🔹 Deletes: tombstone the rows, purge() drops them from storage later
+    def _set_tombstones(self, tombstones: List[Tuple[int, int]]):
+        self.tombstones = list(tombstones)
+        self.dead_count = sum(end - start for start, end in self.tombstones)
+
+        if not self.tombstones:
+            self._dead_ids = self._live_selector = None
+            return
+
+        dead = np.concatenate([np.arange(s, e, dtype=np.int64) for s, e in self.tombstones])
+        # The batch selector must outlive the IDSelectorNot that points at it
+        self._dead_ids = faiss.IDSelectorBatch(dead)
+        self._live_selector = faiss.IDSelectorNot(self._dead_ids)
+
+    def delete_document(self, doc_id: str) -> List[Tuple[int, int]]:
+        """
+        Tombstones every row of `doc_id` and returns the ranges removed.
+        The next persist() records them in storage.
+        """
+        with self.lock:
+            ranges = self.doc_ranges.pop(normalize_doc_id(doc_id), [])
+            if ranges:
+                self._set_tombstones(self.tombstones + ranges)
+                self.pending_tombstones.extend(ranges)
+                self.lexical_index.delete(ranges)
+            return ranges
+
+    def live_count(self) -> int:
+        return self.index.ntotal - self.dead_count
+
+    def dead_ratio(self) -> float:
+        total = self.index.ntotal
+        return self.dead_count / total if total else 0.0
 
     def add_embeddings(self, embeddings: np.ndarray, chunks: List[dict]):
-        self.index.add(embeddings)
-        self.text_chunks.extend(chunks)
+        with self.lock:
+            start = len(self.text_chunks)
+            add_vectors(self.index, embeddings)
+            self.text_chunks.extend(chunks)
+            self.pending_vectors.append(np.asarray(embeddings, dtype=np.float32))
+            self.lexical_index.add(start, (c["text"] for c in chunks))
+
+            for offset, chunk in enumerate(chunks):
+                if isinstance(chunk, dict):
+                    doc_id = chunk["metadata"].get("doc_id", "")
+                    self._add_doc_run(doc_id, start + offset, start + offset + 1)
+
+    def search(self, query_embedding: np.ndarray, top_k: int = 3, doc_id: Optional[str] = None):
+        return self.search_batch(query_embedding, top_k, doc_id)[0]
+
+    def search_batch(
+        self,
+        query_embeddings: np.ndarray,
+        top_k: int = 3,
+        doc_id: Optional[str] = None,
+        ranges: Optional[List[Tuple[int, int]]] = None,
+    ):
+        """
+        One search over a matrix of queries; returns one result list per row.
+        `doc_id` or explicit position `ranges` restrict it to those rows.
+        """
+        query_embeddings = np.atleast_2d(np.asarray(query_embeddings, dtype=np.float32))
 
-    def search(self, query_embedding: np.ndarray, top_k: int = 3):
-        scores, indices = self.index.search(query_embedding, top_k)
+        with self.lock:
+            if doc_id is not None:
+                ranges = self.doc_ranges.get(normalize_doc_id(doc_id), [])
 
-        results = []
-        for score, idx in zip(scores[0], indices[0]):
-            if idx == -1:
-                continue
-            results.append({
-                "chunk": self.text_chunks[idx],
-                "score": float(score)
-            })
+            if ranges is None:
+                # Lossy codes only shortlist candidates; exact vectors rank them
+                rescore = self.storage != "float32" and self.index_config.rescore_factor > 1
+                scores, indices = self.index.search(
+                    query_embeddings,
+                    top_k * self.index_config.rescore_factor if rescore else top_k,
+                    params=search_params(self.index, self.index_config, self._live_selector),
+                )
+                if rescore:
+                    rows = [
+                        self._rescore(query, row_scores, row_indices, top_k)
+                        for query, row_scores, row_indices in zip(query_embeddings, scores, indices)
+                    ]
+                else:
+                    rows = [zip(row_scores, row_indices) for row_scores, row_indices in zip(scores, indices)]
+            else:
+                rows = self._search_ranges(query_embeddings, top_k, ranges)
+
+            results = []
+            for hits in rows:
+                row = []
+                for score, idx in hits:
+                    if idx == -1:
+                        continue
+                    row.append({
+                        "chunk": self.text_chunks[idx],
+                        "score": float(score),
+                        "position": int(idx),
+                    })
+                results.append(row)
 
         return results
 
+    def _search_ranges(self, query_embeddings: np.ndarray, top_k: int, ranges: List[Tuple[int, int]]):
+        """
+        Exact top-k restricted to the given position ranges. Only the
+        vectors inside the ranges are touched, so cost follows their size
+        rather than the size of the whole index.
+        """
+        if not ranges:
+            return [[] for _ in range(len(query_embeddings))]
+
+        vectors = np.vstack([self._vectors_range(start, end) for start, end in ranges])
+        positions = np.concatenate([np.arange(start, end) for start, end in ranges])
+        scores = query_embeddings @ vectors.T
+
+        k = min(top_k, len(positions))
+        rows = []
+        for row in scores:
+            top = np.argpartition(-row, k - 1)[:k]
+            top = top[np.argsort(-row[top])]
+            rows.append([(row[i], int(positions[i])) for i in top])
+        return rows
+
+    # 🔹 Exact vectors: persisted segments (mmapped) plus the pending tail
+    def _has_exact(self) -> bool:
+        persisted = sum(index.ntotal for _, index in self.exact_segments)
+        pending = sum(len(v) for v in self.pending_vectors)
+        return persisted + pending == self.index.ntotal
+
+    def _exact_row(self, position: int) -> np.ndarray:
+        persisted = sum(index.ntotal for _, index in self.exact_segments)
+        if position >= persisted:
+            offset = position - persisted
+            for vectors in self.pending_vectors:
+                if offset < len(vectors):
+                    return vectors[offset]
+                offset -= len(vectors)
+
+        starts = [start for start, _ in self.exact_segments]
+        start, index = self.exact_segments[bisect.bisect_right(starts, position) - 1]
+        return index.reconstruct(position - start)
+
+    def _vectors_range(self, start: int, end: int) -> np.ndarray:
+        """Rows start..end, exact when available, else decoded from the index."""
+        if not self._has_exact() or self.storage == "float32":
+            return self.index.reconstruct_n(start, end - start)
+        return self._exact_range(start, end)
+
+    def _exact_range(self, start: int, end: int) -> np.ndarray:
+        parts = [np.zeros((0, self.index.d), dtype=np.float32)]
+        for segment_start, index in self.exact_segments:
+            lo, hi = max(start, segment_start), min(end, segment_start + index.ntotal)
+            if lo < hi:
+                parts.append(index.reconstruct_n(lo - segment_start, hi - lo))
+        persisted = sum(index.ntotal for _, index in self.exact_segments)
+        if end > persisted:
+            pending = np.vstack(self.pending_vectors)
+            parts.append(pending[max(start, persisted) - persisted:end - persisted])
+        return np.vstack(parts)
+
+    def _vectors_at(self, positions: List[int]) -> np.ndarray:
+        if not self._has_exact() or self.storage == "float32":
+            return np.vstack([self.index.reconstruct(int(p)) for p in positions])
+        return np.vstack([self._exact_row(int(p)) for p in positions])
+
+    def _rescore(self, query: np.ndarray, scores: np.ndarray, indices: np.ndarray, top_k: int):
+        valid = indices[indices != -1]
+        if not len(valid):
+            return []
+        if not self._has_exact():
+            return list(zip(scores[:top_k], indices[:top_k]))
+
+        exact = self._vectors_at(valid.tolist()) @ query
+        order = np.argsort(-exact)[:top_k]
+        return [(exact[i], int(valid[i])) for i in order]
+
+    # 🔹 Lexical (BM25) retrieval over the same positions
+    def lexical_search(
+        self,
+        query: str,
+        top_k: int = 3,
+        doc_id: Optional[str] = None,
+        ranges: Optional[List[Tuple[int, int]]] = None,
+    ):
+        with self.lock:
+            if doc_id is not None:
+                ranges = self.doc_ranges.get(normalize_doc_id(doc_id), [])
+            hits = self.lexical_index.search(query, top_k, ranges)
+            return [
+                {
+                    "chunk": self.text_chunks[position],
+                    "bm25": score,
+                    "coverage": coverage,
+                    "position": position,
+                }
+                for score, position, coverage in hits
+            ]
+
+    def vectors_at(self, positions: List[int]) -> np.ndarray:
+        """Stored (exact when available) vectors of the given rows."""
+        with self.lock:
+            return self._vectors_at(positions)
+
+    def similarity(self, query_embedding: np.ndarray, positions: List[int]) -> np.ndarray:
+        """Exact inner products between the query and the given rows."""
+        return self.vectors_at(positions) @ np.asarray(query_embedding, dtype=np.float32).reshape(-1)
 
     # 🔹 NEW: Save index + metadata
     def save(self, index_path: str, metadata_path: str):
         faiss.write_index(self.index, index_path)
         with open(metadata_path, "w", encoding="utf-8") as f:
-            json.dump(self.text_chunks, f)
+            json.dump(list(self.text_chunks), f)
 
     # 🔹 NEW: Load index + metadata
     @classmethod
-    def load(cls, index_path: str, metadata_path: str):
+    def load(cls, index_path: str, metadata_path: str, index_config: Optional[IndexConfig] = None):
         index = faiss.read_index(index_path)
         with open(metadata_path, "r", encoding="utf-8") as f:
             chunks = json.load(f)
+        # Legacy chunks carry the original file name as doc_id
+        for chunk in chunks:
+            metadata = chunk["metadata"]
+            if "doc_id" in metadata:
+                metadata["doc_id"] = normalize_doc_id(metadata["doc_id"])
+
+        store = cls(index.d, index_config)
+        vectors = index.reconstruct_n(0, index.ntotal)
+        if store.index_config.storage == "float32":
+            store.index = index
+        else:
+            add_vectors(store.index, vectors)
+        store.text_chunks = ChunkStore(chunks)
+        store.lexical_index.add(0, (c["text"] for c in chunks))
+        store._rebuild_doc_ranges()
+        # Nothing of a legacy store is in segment storage yet
+        store.pending_vectors = [vectors]
+        return store
+
+    # 🔹 Segmented persistence: only vectors added since the last persist are written
+    def persist(self, storage: SegmentStorage):
+        """
+        Writes pending vectors as a new segment. Pending tombstones go into
+        the same manifest write, so replacing a document never leaves
+        storage with the old copy deleted and the new one missing.
+        """
+        with self.lock:
+            tombstones = self.pending_tombstones
+            if not self.pending_vectors:
+                if tombstones:
+                    storage.add_tombstones(tombstones)
+                    self.pending_tombstones = []
+                return
+
+            vectors = np.vstack(self.pending_vectors)
+            end = len(self.text_chunks)
+            start = end - len(vectors)
+
+            segment = storage.append(vectors, self.text_chunks[start:end], tombstones=tombstones)
+            self.pending_vectors = []
+            self.pending_tombstones = []
+            mapped = storage.open_vectors(segment)
+            self.exact_segments.append((start, mapped))
+
+            # A segmented flat index searches the mapped copy from now on
+            if isinstance(self.index, SegmentedFlatIndex) and self.index.persisted == start:
+                self.index.seal(mapped)
+
+            # Swap the in-memory chunks for the memory-mapped segment file
+            chunks = storage.open_chunks(segment)
+            if isinstance(chunks, ChunkFile) and self.text_chunks.file_count == start:
+                self.text_chunks.seal(end - start, chunks)
 
-        store = cls(index.d)
-        store.index = index
+            # Likewise the in-memory postings for the persisted postings file
+            postings = storage.open_postings(segment)
+            if postings is not None:
+                self.lexical_index.seal(start, postings)
+
+    @classmethod
+    def open(cls, storage: SegmentStorage, index_config: Optional[IndexConfig] = None):
+        """
+        Opens a store over segment storage. float32 flat stores search the
+        memory-mapped segments in place; other configurations decode the
+        segments one at a time into their in-memory index.
+        """
+        chunks = storage.load_chunks()
+        total = len(chunks)
+
+        store = cls(storage.dim(), index_config)
         store.text_chunks = chunks
+        store.exact_segments = storage.open_exact_vectors()
+        store._set_tombstones(storage.tombstones())
+        store._rebuild_doc_ranges()
+
+        # Segments written before postings were persisted are tokenized once here
+        for start, count, postings in storage.open_all_postings():
+            if postings is not None:
+                store.lexical_index.add_file(start, postings)
+            else:
+                store.lexical_index.add(start, (chunks[i]["text"] for i in range(start, start + count)))
+        store.lexical_index.delete(store.tombstones)
+
+        # Reuse a trained ANN snapshot if it matches the configured backend and storage
+        config = store.index_config
+        ann, covered = storage.load_ann()
+        if (
+            ann is not None
+            and backend_of(ann) == config.backend
+            and (config.backend == "ivf_pq" or storage_of(ann) == config.storage)
+            and covered <= total
+        ):
+            enable_reconstruct(ann)
+            ann.add(store._exact_range(covered, total))
+            store.index = ann
+        elif config.storage == "float32":
+            store.index = SegmentedFlatIndex(store.index.d, [index for _, index in store.exact_segments])
+        else:
+            for _, index in store.exact_segments:
+                add_vectors(store.index, index.reconstruct_n(0, index.ntotal))
+
         return store
+
+    # 🔹 Automatic flat -> ANN upgrade
+    def maybe_upgrade(self, storage: Optional[SegmentStorage] = None):
+        """
+        Trains the configured ANN backend in a background thread once the
+        flat index passes the upgrade threshold, then swaps it in.
+        """
+        config = self.index_config
+        if config.backend == "flat" or not config.upgrade_threshold:
+            return
+        if self.backend != "flat" or self.index.ntotal < config.upgrade_threshold:
+            return
+
+        with self.lock:
+            if self.upgrading:
+                return
+            self.upgrading = True
+
+        threading.Thread(
+            target=self._upgrade,
+            args=(storage,),
+            name="index-upgrade",
+            daemon=True,
+        ).start()
+
+    def _upgrade(self, storage: Optional[SegmentStorage]):
+        try:
+            with self.lock:
+                covered = self.index.ntotal
+                vectors = self._vectors_range(0, covered)
+
+            # Training runs without the lock; searches keep using the flat index
+            index = build_index(self.index_config.backend, vectors, self.index_config)
+            del vectors
+
+            if storage is not None:
+                storage.save_ann(index, covered)
+
+            with self.lock:
+                added = self.index.ntotal - covered
+                if added > 0:
+                    index.add(self._vectors_range(covered, covered + added))
+                self.index = index
+        finally:
+            self.upgrading = False
+        self._grew()
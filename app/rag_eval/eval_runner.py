@@ -0,0 +1,310 @@
+import json
+import logging
+import os
+import uuid
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from app.rag_basics.segment_storage import atomic_write
+from app.rag_eval.retrieval_evaluator import evaluate_retrieval, load_eval_dataset
+from app.rag_eval.faithfulness_evaluator import evaluate_faithfulness, evaluate_faithfulness_batch
+from app.rag_eval.rag_adapters import (
+    retrieve_chunks_adapter,
+    generate_answer_adapter,
+    embedding_service,
+)
+
+
+logger = logging.getLogger(__name__)
+
+EVAL_RUNS_ROOT = "data/eval_runs"
+RESULTS_FILE = "results.jsonl"
+META_FILE = "run.json"
+
+
+def user_has_required_sources(retrieved_chunks, required_sources):
+    if not required_sources:
+        return True
+
+    present_sources = {
+        c["source"].lower() for c in retrieved_chunks
+    }
+
+    for required in required_sources:
+        required = required.lower()
+        for present in present_sources:
+            if required in present:
+                return True
+
+    return False
+
+
+def item_id(item: Dict, position: int) -> str:
+    return str(item.get("id", position))
+
+
+def evaluate_item(item: Dict, user_id: str, faithfulness_threshold: float = 0.5) -> Dict:
+    question = item["question"]
+    required_sources = item.get("required_sources", [])
+
+    # 1️⃣ Retrieve chunks (REAL pipeline)
+    retrieved_chunks = retrieve_chunks_adapter(
+        question=question,
+        user_id=user_id,
+        with_vectors=True,
+    )
+
+    # 🚦 Document-aware evaluation gate
+    if not user_has_required_sources(
+        retrieved_chunks,
+        required_sources,
+    ):
+        return {
+            "question_id": item["id"],
+            "question": question,
+            "skipped": True,
+            "reason": "required_documents_not_present",
+        }
+
+    # 2️⃣ Evaluate retrieval quality
+    retrieval_result = evaluate_retrieval(
+        retrieved_chunks=retrieved_chunks,
+        expected_keywords=item["expected_keywords"],
+        expected_source=item["expected_source"],
+    )
+
+    # 3️⃣ Generate answer (REAL LLM)
+    answer = generate_answer_adapter(
+        question=question,
+        chunks=retrieved_chunks,
+    )
+
+    # 4️⃣ Faithfulness check
+    combined_context = " ".join(
+        c["content"] for c in retrieved_chunks
+    )
+
+    faithfulness_result = evaluate_faithfulness(
+        answer=answer,
+        retrieved_context=combined_context,
+    )
+
+    return {
+        "question_id": item["id"],
+        "question": question,
+        "answer": answer,
+        "retrieval": retrieval_result,
+        "faithfulness": faithfulness_result,
+        "semantic_faithfulness": score_semantic_faithfulness(answer, retrieved_chunks, faithfulness_threshold),
+    }
+
+
+def score_semantic_faithfulness(answer: str, chunks: List[Dict], threshold: float) -> Dict:
+    """
+    Sentence-level faithfulness of one answer against the stored vectors
+    of the chunks it was generated from. Scored while the item runs:
+    positions kept in results.jsonl go stale once a re-upload or purge
+    moves rows. A scoring error is recorded, not raised, so the item's
+    answer is kept.
+    """
+    vectors = (
+        np.vstack([c["vector"] for c in chunks])
+        if chunks
+        else np.zeros((0, 0), dtype=np.float32)
+    )
+    try:
+        return evaluate_faithfulness_batch([answer], [vectors], embedding_service.embed_queries, threshold)[0]
+    except Exception as exc:
+        logger.exception("semantic faithfulness scoring failed")
+        return {"faithful": False, "reason": "scoring_failed", "error": str(exc) or exc.__class__.__name__}
+
+
+def summarize(results: List[Dict]) -> Dict:
+    return {
+        "total": len(results),
+        "passed": sum(
+            1 for r in results
+            if not r.get("skipped")
+            and not r.get("error")
+            and r["retrieval"]["passed"]
+            and r["faithfulness"]["faithful"]
+        ),
+        "skipped": sum(
+            1 for r in results
+            if r.get("skipped")
+        ),
+        "errors": sum(
+            1 for r in results
+            if r.get("error")
+        ),
+        "semantically_faithful": sum(
+            1 for r in results
+            if r.get("semantic_faithfulness", {}).get("faithful")
+        ),
+    }
+
+
+# =========================
+# Run directories
+# =========================
+
+def new_run_id() -> str:
+    return uuid.uuid4().hex
+
+
+def get_run_dir(user_id: str, run_id: str) -> str:
+    return os.path.join(EVAL_RUNS_ROOT, user_id, run_id)
+
+
+def read_run_meta(user_id: str, run_id: str) -> Optional[Dict]:
+    if not run_id.isalnum():
+        return None
+    path = os.path.join(get_run_dir(user_id, run_id), META_FILE)
+    if not os.path.exists(path):
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def write_run_meta(user_id: str, run_id: str, **fields) -> Dict:
+    run_dir = get_run_dir(user_id, run_id)
+    os.makedirs(run_dir, exist_ok=True)
+
+    meta = read_run_meta(user_id, run_id) or {"run_id": run_id, "user_id": user_id}
+    meta.update(fields)
+    atomic_write(
+        os.path.join(run_dir, META_FILE),
+        lambda f: json.dump(meta, f, indent=2),
+        mode="w",
+    )
+    return meta
+
+
+def read_results(user_id: str, run_id: str) -> List[Dict]:
+    """
+    Checkpointed results in completion order. A line cut short by a crash
+    mid-write is ignored; that item simply runs again on resume.
+    """
+    path = os.path.join(get_run_dir(user_id, run_id), RESULTS_FILE)
+    if not os.path.exists(path):
+        return []
+
+    results = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                results.append(json.loads(line))
+            except json.JSONDecodeError:
+                break
+    return results
+
+
+# =========================
+# Background run
+# =========================
+
+def run_eval(
+    job_id: str,
+    user_id: str,
+    run_id: str,
+    dataset_path: str,
+    concurrency: int,
+    progress=None,
+    faithfulness_threshold: float = 0.5,
+) -> Dict:
+    """
+    Evaluates every dataset item not yet in the run's results file, up to
+    `concurrency` items (and LLM calls) at a time. Each finished item is
+    appended and fsynced, so a crashed run resumes where it stopped.
+    `progress(job_id, **fields)` receives counts as items finish. A run
+    that raises is marked "failed" in its meta before the error propagates.
+    """
+    try:
+        return _run_eval(job_id, user_id, run_id, dataset_path, concurrency, progress, faithfulness_threshold)
+    except Exception as exc:
+        write_run_meta(
+            user_id,
+            run_id,
+            status="failed",
+            error=str(exc) or exc.__class__.__name__,
+            finished_at=datetime.utcnow().isoformat(),
+        )
+        raise
+
+
+def _run_eval(
+    job_id: str,
+    user_id: str,
+    run_id: str,
+    dataset_path: str,
+    concurrency: int,
+    progress,
+    faithfulness_threshold: float,
+) -> Dict:
+    dataset = load_eval_dataset(dataset_path)
+    write_run_meta(
+        user_id,
+        run_id,
+        job_id=job_id,
+        dataset=dataset_path,
+        total=len(dataset),
+        status="running",
+        started_at=datetime.utcnow().isoformat(),
+    )
+
+    # Failed items are retried; rewriting also drops a torn trailing line
+    done = [r for r in read_results(user_id, run_id) if not r.get("error")]
+    results_path = os.path.join(get_run_dir(user_id, run_id), RESULTS_FILE)
+    atomic_write(
+        results_path,
+        lambda f: f.writelines(json.dumps(r) + "\n" for r in done),
+        mode="w",
+    )
+
+    done_ids = {r["question_id"] for r in done}
+    todo = [
+        (position, item) for position, item in enumerate(dataset)
+        if item_id(item, position) not in done_ids
+    ]
+    logger.info("eval run %s: total=%d resumed=%d todo=%d", run_id, len(dataset), len(done), len(todo))
+
+    completed = len(done)
+    if progress:
+        progress(job_id, total=len(dataset), completed=completed)
+
+    def evaluate(position: int, item: Dict) -> Dict:
+        item = {**item, "id": item_id(item, position)}
+        try:
+            return evaluate_item(item, user_id, faithfulness_threshold)
+        except Exception as exc:
+            # Recorded rather than raised, so one bad item does not sink the run
+            return {
+                "question_id": item["id"],
+                "question": item.get("question", ""),
+                "error": str(exc) or exc.__class__.__name__,
+            }
+
+    with open(results_path, "a", encoding="utf-8") as out, \
+            ThreadPoolExecutor(max_workers=max(concurrency, 1), thread_name_prefix="eval") as pool:
+        futures = [pool.submit(evaluate, position, item) for position, item in todo]
+        for future in as_completed(futures):
+            out.write(json.dumps(future.result()) + "\n")
+            out.flush()
+            os.fsync(out.fileno())
+            completed += 1
+            if progress:
+                progress(job_id, completed=completed)
+
+    results = read_results(user_id, run_id)
+    summary = summarize(results)
+    write_run_meta(
+        user_id,
+        run_id,
+        status="completed",
+        summary=summary,
+        finished_at=datetime.utcnow().isoformat(),
+    )
+    return {"run_id": run_id, "summary": summary}
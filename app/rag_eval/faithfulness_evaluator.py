@@ -1,4 +1,17 @@
-from typing import Dict
+import logging
+import queue
+import random
+import re
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from app.metrics import FAITHFULNESS_FAILURES
+
+
+logger = logging.getLogger(__name__)
 
 
 def evaluate_faithfulness(
@@ -37,3 +50,172 @@ def evaluate_faithfulness(
         "overlap_score": round(overlap_score, 2),
         "overlap_words_sample": list(overlap)[:10],
     }
+
+
+# =========================
+# Embedding-based (sentence level)
+# =========================
+
+_SENTENCE_BOUNDARY = re.compile(r"(?<=[.!?])\s+|\n+")
+# Fragments shorter than this (list markers, "Yes.") carry no claim
+MIN_SENTENCE_WORDS = 3
+
+
+def split_sentences(answer: str) -> List[str]:
+    sentences = [" ".join(s.split()) for s in _SENTENCE_BOUNDARY.split(answer)]
+    return [s for s in sentences if len(s.split()) >= MIN_SENTENCE_WORDS]
+
+
+def evaluate_faithfulness_batch(
+    answers: List[str],
+    context_vectors: List[np.ndarray],
+    embed_texts: Callable[[List[str]], np.ndarray],
+    threshold: float = 0.5,
+) -> List[Dict]:
+    """
+    Sentence-level faithfulness for many answers at once.
+
+    Every sentence of every answer is embedded in one call and compared
+    with its own answer's context vectors (the retrieved chunks' stored
+    embeddings) in one matrix product; a sentence is supported when its
+    best cosine reaches `threshold`.
+    """
+    sentences, sentence_owner = [], []
+    for i, answer in enumerate(answers):
+        for sentence in split_sentences(answer):
+            sentences.append(sentence)
+            sentence_owner.append(i)
+
+    context_owner = np.concatenate([
+        np.full(len(vectors), i) for i, vectors in enumerate(context_vectors)
+    ]) if context_vectors else np.zeros(0, dtype=int)
+
+    support = np.zeros(len(sentences), dtype=np.float32)
+    if sentences and len(context_owner):
+        sentence_owner_arr = np.array(sentence_owner)
+        similarities = embed_texts(sentences) @ np.vstack([v for v in context_vectors if len(v)]).T
+        # Each sentence only counts support from its own answer's chunks
+        similarities[sentence_owner_arr[:, None] != context_owner[None, :]] = -1.0
+        support = similarities.max(axis=1)
+
+    results = []
+    for i, answer in enumerate(answers):
+        rows = [j for j, owner in enumerate(sentence_owner) if owner == i]
+        if not rows:
+            results.append({"faithful": False, "reason": "no_sentences", "support_score": 0.0})
+            continue
+        if not len(context_vectors[i]):
+            results.append({"faithful": False, "reason": "empty_context", "support_score": 0.0})
+            continue
+
+        scores = support[rows]
+        unsupported = [sentences[j] for j, score in zip(rows, scores) if score < threshold]
+        results.append({
+            "faithful": not unsupported,
+            "support_score": round(float(scores.mean()), 4),
+            "min_sentence_score": round(float(scores.min()), 4),
+            "sentences": len(rows),
+            "unsupported_sentences": unsupported,
+        })
+
+    return results
+
+
+class FaithfulnessSampler:
+    """
+    Scores a random sample of live answers off the request path.
+
+    `offer` only records the answer and its chunk positions; a daemon
+    thread collects samples for up to `max_wait_seconds` or `batch_size`
+    answers, reads the chunk vectors from the store and scores the batch
+    with evaluate_faithfulness_batch, passing each result to `report`.
+    """
+
+    def __init__(
+        self,
+        embed_texts: Callable[[List[str]], np.ndarray],
+        report: Callable[..., None],
+        sample_rate: float = 0.05,
+        threshold: float = 0.5,
+        batch_size: int = 16,
+        max_wait_seconds: float = 10.0,
+    ):
+        self.embed_texts = embed_texts
+        self.report = report
+        self.sample_rate = sample_rate
+        self.threshold = threshold
+        self.batch_size = batch_size
+        self.max_wait = max_wait_seconds
+
+        self.queue: "queue.Queue" = queue.Queue(maxsize=batch_size * 8)
+        self.worker: Optional[threading.Thread] = None
+        self.lock = threading.Lock()
+
+        self.sampled = 0
+        self.dropped = 0
+        self.scored = 0
+        self.unfaithful = 0
+        self.failed = 0
+
+    def offer(self, user_id: str, question: str, answer: str, vector_store, positions: List[int]) -> bool:
+        if self.sample_rate <= 0 or random.random() >= self.sample_rate or not positions:
+            return False
+
+        self._ensure_worker()
+        try:
+            self.queue.put_nowait((user_id, question, answer, vector_store, list(positions)))
+        except queue.Full:
+            # Never let scoring back-pressure reach requests
+            self.dropped += 1
+            return False
+        self.sampled += 1
+        return True
+
+    def _ensure_worker(self):
+        with self.lock:
+            if self.worker is None or not self.worker.is_alive():
+                self.worker = threading.Thread(target=self._run, name="faithfulness-sampler", daemon=True)
+                self.worker.start()
+
+    def _run(self):
+        while True:
+            batch = [self.queue.get()]
+            deadline = time.monotonic() + self.max_wait
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self.queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+
+            try:
+                self._score(batch)
+            except Exception:
+                # The sampler must outlive bad samples; the batch is lost
+                logger.exception("faithfulness scoring failed for %d sampled answers", len(batch))
+                self.failed += len(batch)
+                FAITHFULNESS_FAILURES.inc(len(batch))
+
+    def _score(self, batch: List[Tuple]):
+        results = evaluate_faithfulness_batch(
+            [answer for _, _, answer, _, _ in batch],
+            [store.vectors_at(positions) for _, _, _, store, positions in batch],
+            self.embed_texts,
+            self.threshold,
+        )
+        for (user_id, question, _, _, _), result in zip(batch, results):
+            self.scored += 1
+            self.unfaithful += not result["faithful"]
+            self.report(user_id=user_id, question=question, result=result)
+
+    def stats(self) -> Dict:
+        return {
+            "sample_rate": self.sample_rate,
+            "sampled": self.sampled,
+            "dropped": self.dropped,
+            "scored": self.scored,
+            "unfaithful": self.unfaithful,
+            "failed": self.failed,
+        }
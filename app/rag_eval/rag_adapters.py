@@ -9,15 +9,18 @@ from app.api.v1.routes.rag import (
 )
 
 
-def retrieve_chunks_adapter(question: str, user_id: str) -> List[Dict]:
+def retrieve_chunks_adapter(question: str, user_id: str, with_vectors: bool = False) -> List[Dict]:
     """
     Returns chunks in evaluation-friendly format:
     [
         {
             "content": "...",
-            "source": "fastapi_docs"
+            "source": "fastapi_docs",
+            "position": 12
         }
     ]
+    With `with_vectors`, each chunk also carries its stored "vector",
+    read from the same store the search ran on.
     """
 
     vector_store = get_user_vector_store(user_id)
@@ -34,14 +37,24 @@ def retrieve_chunks_adapter(question: str, user_id: str) -> List[Dict]:
         if r["score"] >= MIN_SIMILARITY_SCORE
     ]
 
-    return [
+    chunks = [
         {
             "content": r["chunk"]["text"],
             "source": r["chunk"]["metadata"].get("source", ""),
+            "position": r["position"],
         }
         for r in filtered
     ]
 
+    if with_vectors and chunks:
+        # A purge reopens the store under new positions, but this object
+        # keeps the rows it just returned
+        vectors = vector_store.vectors_at([c["position"] for c in chunks])
+        for chunk, vector in zip(chunks, vectors):
+            chunk["vector"] = vector
+
+    return chunks
+
 
 def generate_answer_adapter(question: str, chunks: List[Dict]) -> str:
     texts = [c["content"] for c in chunks]
@@ -0,0 +1,128 @@
+import time
+from typing import Dict, List, Sequence
+
+import numpy as np
+
+
+DEFAULT_K_VALUES = (1, 3, 5, 10, 20)
+DEFAULT_THRESHOLDS = (0.0, 0.2, 0.3, 0.4, 0.5, 0.6)
+
+
+def first_per_page(rows: List[List[Dict]], width: int) -> np.ndarray:
+    """
+    (questions, width) mask of hits kept by deduplicate_chunks: rows are
+    sorted by score, so the best hit of a (doc_id, page) is its first one.
+    The mask is the same for every prefix k of the row.
+    """
+    keep = np.zeros((len(rows), width), dtype=bool)
+    for i, row in enumerate(rows):
+        seen = set()
+        for j, hit in enumerate(row):
+            meta = hit["chunk"]["metadata"]
+            key = (meta.get("doc_id"), meta.get("page"))
+            if key not in seen:
+                seen.add(key)
+                keep[i, j] = True
+    return keep
+
+
+def sweep_retrieval(
+    dataset: List[Dict],
+    vector_store,
+    embedding_service,
+    k_values: Sequence[int] = DEFAULT_K_VALUES,
+    thresholds: Sequence[float] = DEFAULT_THRESHOLDS,
+) -> Dict:
+    """
+    Retrieval-only evaluation over a grid of TOP_K x MIN_SIMILARITY_SCORE.
+
+    The dataset is embedded in one batch and searched once at the largest
+    k; every grid cell is then a mask over that single result. A hit is
+    relevant when its source contains the item's expected_source, so
+    recall@k is the share of questions with a relevant chunk among the
+    kept hits and MRR uses the rank of the first one. keyword_score and
+    passed follow evaluate_retrieval on the same kept hits.
+    """
+    started = time.perf_counter()
+
+    doc_ids = [d.lower() for d in vector_store.doc_ranges]
+    items, skipped = [], []
+    for item in dataset:
+        required = [r.lower() for r in item.get("required_sources", [])]
+        if required and not any(r in d for r in required for d in doc_ids):
+            skipped.append(item["id"])
+        else:
+            items.append(item)
+
+    if not items:
+        return {"questions": 0, "skipped": skipped, "grid": [], "best": None}
+
+    max_k = max(k_values)
+    embeddings = embedding_service.embed_queries([item["question"] for item in items])
+    embed_ms = (time.perf_counter() - started) * 1000
+
+    rows = vector_store.search_batch(embeddings, top_k=max_k)
+    search_ms = (time.perf_counter() - started) * 1000 - embed_ms
+
+    # Dense (questions, max_k) views of the single search result; missing
+    # hits get -inf scores so no threshold keeps them
+    n = len(items)
+    scores = np.full((n, max_k), -np.inf, dtype=np.float32)
+    relevant = np.zeros((n, max_k), dtype=bool)
+    max_keywords = max(len(item["expected_keywords"]) for item in items) or 1
+    keyword_hits = np.zeros((n, max_k, max_keywords), dtype=bool)
+    keyword_counts = np.array([max(len(item["expected_keywords"]), 1) for item in items], dtype=np.float32)
+
+    for i, (item, row) in enumerate(zip(items, rows)):
+        expected_source = item["expected_source"].lower()
+        keywords = [kw.lower() for kw in item["expected_keywords"]]
+        for j, hit in enumerate(row):
+            text = hit["chunk"]["text"].lower()
+            scores[i, j] = hit["score"]
+            relevant[i, j] = expected_source in hit["chunk"]["metadata"].get("source", "").lower()
+            keyword_hits[i, j, :len(keywords)] = [kw in text for kw in keywords]
+
+    deduplicated = first_per_page(rows, max_k)
+
+    grid = []
+    for k in sorted(set(k_values)):
+        in_top_k = np.zeros(max_k, dtype=bool)
+        in_top_k[:k] = True
+
+        for threshold in sorted(set(thresholds)):
+            kept = deduplicated & in_top_k & (scores >= threshold)
+            num_kept = kept.sum(axis=1)
+
+            # Rank of each hit among the kept hits of its row
+            kept_rank = np.cumsum(kept, axis=1)
+            hit = kept & relevant
+            first = np.where(hit.any(axis=1), np.argmax(hit, axis=1), -1)
+            reciprocal = np.where(first >= 0, 1.0 / np.maximum(kept_rank[np.arange(n), np.maximum(first, 0)], 1), 0.0)
+
+            keyword_score = (keyword_hits & kept[:, :, None]).any(axis=1).sum(axis=1) / keyword_counts
+            source_match = hit.any(axis=1)
+            passed = (keyword_score >= 0.5) & source_match & (num_kept > 0)
+
+            grid.append({
+                "k": k,
+                "threshold": threshold,
+                "recall": round(float(source_match.mean()), 4),
+                "mrr": round(float(reciprocal.mean()), 4),
+                "keyword_score": round(float(keyword_score.mean()), 4),
+                "pass_rate": round(float(passed.mean()), 4),
+                "avg_chunks": round(float(num_kept.mean()), 2),
+                "empty_rate": round(float((num_kept == 0).mean()), 4),
+            })
+
+    best = max(grid, key=lambda g: (g["pass_rate"], g["mrr"], -g["k"]))
+    return {
+        "questions": n,
+        "skipped": skipped,
+        "timings_ms": {
+            "embed": round(embed_ms, 2),
+            "search": round(search_ms, 2),
+            "total": round((time.perf_counter() - started) * 1000, 2),
+        },
+        "grid": grid,
+        "best": best,
+    }
@@ -0,0 +1,221 @@
+import math
+import os
+import sqlite3
+import time
+from threading import Lock
+from typing import Dict, Optional, Protocol, Tuple
+
+
+# =========================
+# Sliding-window counter
+# =========================
+#
+# Each key keeps two counters: the current fixed window and the previous
+# one. The rate over the last `window` seconds is estimated as
+#
+#     previous * (1 - elapsed / window) + current
+#
+# which needs O(1) state and O(1) work per check, whatever the limit.
+
+def _estimate(previous: float, current: float, elapsed: float, window: float) -> float:
+    return previous * (1 - elapsed / window) + current
+
+
+def _retry_after(previous: float, current: float, elapsed: float, window: float, limit: float, cost: float) -> float:
+    """
+    Seconds until `cost` more would fit, assuming no further traffic;
+    infinite when `cost` alone exceeds `limit` and can never fit.
+    """
+    if cost > limit:
+        return math.inf
+    if current + cost > limit:
+        # After the roll-over `current` becomes the previous window and
+        # decays: current * (1 - t / window) + cost <= limit
+        t = window * (1 - (limit - cost) / current)
+        return window - elapsed + t
+    # previous * (1 - t / window) + current + cost <= limit
+    t = window * (1 - (limit - current - cost) / previous) if previous else elapsed
+    return max(t - elapsed, 0.0)
+
+
+class RateLimitBackend(Protocol):
+    def hit(self, key: str, limit: float, window: float, cost: float = 1) -> Tuple[bool, float]:
+        """Records `cost` if it fits; returns (allowed, retry_after seconds)."""
+
+
+class InMemoryBackend:
+    """Per-process counters. Each uvicorn worker enforces its own limits."""
+
+    def __init__(self):
+        # key -> [window index, previous count, current count]
+        self.counters: Dict[str, list] = {}
+        self.lock = Lock()
+
+    def hit(self, key: str, limit: float, window: float, cost: float = 1) -> Tuple[bool, float]:
+        now = time.time()
+        index = int(now // window)
+        elapsed = now - index * window
+
+        with self.lock:
+            state = self.counters.get(key)
+            if state is None or state[0] < index - 1:
+                previous, current = 0.0, 0.0
+            elif state[0] == index - 1:
+                previous, current = state[2], 0.0
+            else:
+                previous, current = state[1], state[2]
+
+            if _estimate(previous, current, elapsed, window) + cost > limit:
+                self.counters[key] = [index, previous, current]
+                return False, _retry_after(previous, current, elapsed, window, limit, cost)
+
+            self.counters[key] = [index, previous, current + cost]
+            return True, 0.0
+
+
+class SQLiteBackend:
+    """
+    Counters in a SQLite file, shared by every worker process on the host.
+    Each check is one short IMMEDIATE transaction on a single row; waiting
+    for the write lock gives up after `timeout` seconds with
+    sqlite3.OperationalError.
+    """
+
+    def __init__(self, path: str, timeout: float = 5.0):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self.path = path
+        self.lock = Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=timeout)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS rate_limits (
+                key TEXT PRIMARY KEY,
+                window_index INTEGER NOT NULL,
+                previous REAL NOT NULL,
+                current REAL NOT NULL
+            )
+            """
+        )
+
+    def hit(self, key: str, limit: float, window: float, cost: float = 1) -> Tuple[bool, float]:
+        now = time.time()
+        index = int(now // window)
+        elapsed = now - index * window
+
+        with self.lock:
+            # IMMEDIATE takes the write lock up front, so read-modify-write
+            # is atomic across processes
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self.conn.execute(
+                    "SELECT window_index, previous, current FROM rate_limits WHERE key = ?",
+                    (key,),
+                ).fetchone()
+                if row is None or row[0] < index - 1:
+                    previous, current = 0.0, 0.0
+                elif row[0] == index - 1:
+                    previous, current = row[2], 0.0
+                else:
+                    previous, current = row[1], row[2]
+
+                allowed = _estimate(previous, current, elapsed, window) + cost <= limit
+                self.conn.execute(
+                    "INSERT OR REPLACE INTO rate_limits (key, window_index, previous, current) VALUES (?, ?, ?, ?)",
+                    (key, index, previous, current + cost if allowed else current),
+                )
+                self.conn.execute("COMMIT")
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+
+        if allowed:
+            return True, 0.0
+        return False, _retry_after(previous, current, elapsed, window, limit, cost)
+
+
+class CounterStore(Protocol):
+    """
+    The two operations a network key-value store (e.g. Redis INCRBYFLOAT +
+    EXPIRE, GET) needs to provide. Both must be atomic on the server.
+    """
+
+    def incr(self, key: str, amount: float, ttl_seconds: float) -> float:
+        """Adds `amount` to `key` (created at 0) and returns the new value."""
+
+    def get(self, key: str) -> float:
+        """Current value of `key`, 0 if missing or expired."""
+
+
+class LocalCounterStore:
+    """In-process stand-in for a network CounterStore, with key expiry."""
+
+    def __init__(self):
+        self.values: Dict[str, Tuple[float, float]] = {}
+        self.lock = Lock()
+
+    def incr(self, key: str, amount: float, ttl_seconds: float) -> float:
+        now = time.time()
+        with self.lock:
+            value, expires = self.values.get(key, (0.0, 0.0))
+            if expires <= now:
+                value = 0.0
+            value += amount
+            self.values[key] = (value, now + ttl_seconds)
+            return value
+
+    def get(self, key: str) -> float:
+        with self.lock:
+            value, expires = self.values.get(key, (0.0, 0.0))
+            return value if expires > time.time() else 0.0
+
+
+class NetworkBackend:
+    """
+    Sliding-window counters in a shared CounterStore, one key per fixed
+    window, so limits hold across hosts. The cost is added first and
+    given back if it does not fit: concurrent requests can never push a
+    key over its limit, only see an occasional conservative refusal.
+    """
+
+    def __init__(self, store: CounterStore, prefix: str = "rl"):
+        self.store = store
+        self.prefix = prefix
+
+    def hit(self, key: str, limit: float, window: float, cost: float = 1) -> Tuple[bool, float]:
+        now = time.time()
+        index = int(now // window)
+        elapsed = now - index * window
+
+        current_key = f"{self.prefix}:{key}:{index}"
+        previous = self.store.get(f"{self.prefix}:{key}:{index - 1}")
+        current = self.store.incr(current_key, cost, ttl_seconds=2 * window)
+
+        if _estimate(previous, current, elapsed, window) <= limit:
+            return True, 0.0
+
+        self.store.incr(current_key, -cost, ttl_seconds=2 * window)
+        return False, _retry_after(previous, current - cost, elapsed, window, limit, cost)
+
+
+def create_backend(
+    name: str,
+    sqlite_path: str,
+    store: Optional[CounterStore] = None,
+    sqlite_timeout: float = 5.0,
+) -> RateLimitBackend:
+    if name == "memory":
+        return InMemoryBackend()
+    if name == "sqlite":
+        return SQLiteBackend(sqlite_path, timeout=sqlite_timeout)
+    if name == "network":
+        return NetworkBackend(store or LocalCounterStore())
+    raise ValueError(f"Unknown rate limit backend: {name}")
+
+
+def retry_after_header(seconds: float) -> Dict[str, str]:
+    return {"Retry-After": str(max(math.ceil(seconds), 1))}
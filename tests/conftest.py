@@ -0,0 +1,41 @@
+import importlib
+
+import numpy as np
+import pytest
+
+
+DIM = 8
+
+
+def make_doc(doc_id: str, n: int, seed: int, dim: int = DIM):
+    """`n` unit vectors and chunks for `doc_id`, one chunk per page."""
+    rng = np.random.default_rng(seed)
+    vectors = rng.standard_normal((n, dim)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    chunks = [
+        {"text": f"{doc_id} text {i}", "metadata": {"doc_id": doc_id, "source": doc_id, "page": i + 1}}
+        for i in range(n)
+    ]
+    return vectors, chunks
+
+
+_routes_error = None
+
+
+def import_app_module(name: str):
+    """
+    Imports a module that needs the API routes. Importing them loads the
+    embedding model, so tests are skipped where it cannot be loaded
+    (offline, with no cached copy). The failure is remembered, so the
+    download is attempted once per session.
+    """
+    global _routes_error
+    if _routes_error is None:
+        try:
+            # The routes package imports the eval runner; load it first
+            importlib.import_module("app.api.v1.routes")
+        except OSError as exc:
+            _routes_error = str(exc) or exc.__class__.__name__
+    if _routes_error:
+        pytest.skip(f"embedding model unavailable: {_routes_error}")
+    return importlib.import_module(name)
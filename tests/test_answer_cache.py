@@ -0,0 +1,79 @@
+import numpy as np
+
+from app.rag_basics import answer_cache as answer_cache_module
+from app.rag_basics.answer_cache import AnswerCache
+
+
+def unit(*values):
+    vector = np.asarray(values, dtype=np.float32)
+    return vector / np.linalg.norm(vector)
+
+
+RESPONSE = {"question": "q", "answer": "a", "sources": []}
+
+
+def test_exact_hit_is_scoped_by_version_doc_and_mode():
+    cache = AnswerCache()
+    cache.put("u1", 1, "what is rag", None, None, RESPONSE)
+
+    assert cache.get_exact("u1", 1, "what is rag", None) is RESPONSE
+    assert cache.get_exact("u1", 2, "what is rag", None) is None
+    assert cache.get_exact("u1", 1, "what is rag", "doc") is None
+    assert cache.get_exact("u1", 1, "what is rag", None, mode="hybrid") is None
+    assert cache.get_exact("u2", 1, "what is rag", None) is None
+
+
+def test_semantic_hit_needs_similarity_threshold():
+    cache = AnswerCache(similarity_threshold=0.95)
+    cache.put("u1", 1, "what is rag", None, unit(1, 0, 0), RESPONSE)
+
+    assert cache.get_semantic("u1", 1, None, unit(1, 0.1, 0)) is RESPONSE
+    assert cache.get_semantic("u1", 1, None, unit(1, 1, 0)) is None
+    assert cache.get_semantic("u1", 2, None, unit(1, 0, 0)) is None
+    assert cache.stats()["semantic_hits"] == 1
+    assert cache.stats()["misses"] == 2
+
+
+def test_entries_without_embedding_are_exact_only():
+    cache = AnswerCache()
+    cache.put("u1", 1, "fastapi", None, None, RESPONSE, mode="lexical")
+    assert cache.get_semantic("u1", 1, None, unit(1, 0, 0), mode="lexical") is None
+
+
+def test_invalidate_user_drops_only_their_entries():
+    cache = AnswerCache()
+    cache.put("u1", 1, "a", None, unit(1, 0), RESPONSE)
+    cache.put("u1", 1, "b", "doc", None, RESPONSE)
+    cache.put("u2", 1, "a", None, unit(1, 0), RESPONSE)
+
+    cache.invalidate_user("u1")
+
+    assert cache.get_exact("u1", 1, "a", None) is None
+    assert cache.get_exact("u1", 1, "b", "doc") is None
+    assert cache.get_semantic("u1", 1, None, unit(1, 0)) is None
+    assert cache.get_exact("u2", 1, "a", None) is RESPONSE
+    assert cache.stats()["entries"] == 1
+
+
+def test_expired_entries_are_not_served(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(answer_cache_module.time, "monotonic", lambda: now[0])
+
+    cache = AnswerCache(ttl_seconds=10)
+    cache.put("u1", 1, "a", None, unit(1, 0), RESPONSE)
+    now[0] += 11
+
+    assert cache.get_exact("u1", 1, "a", None) is None
+    assert cache.get_semantic("u1", 1, None, unit(1, 0)) is None
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = AnswerCache(max_entries=2)
+    cache.put("u1", 1, "a", None, None, RESPONSE)
+    cache.put("u1", 1, "b", None, None, RESPONSE)
+    cache.get_exact("u1", 1, "a", None)
+    cache.put("u1", 1, "c", None, None, RESPONSE)
+
+    assert cache.get_exact("u1", 1, "b", None) is None
+    assert cache.get_exact("u1", 1, "a", None) is RESPONSE
+    assert cache.stats()["evictions"] == 1
@@ -0,0 +1,100 @@
+import asyncio
+
+import numpy as np
+import pytest
+from fastapi import HTTPException
+
+from app import policy, rate_limit
+from app.models.schemas import AskBatchRequest
+from app.rate_limit import InMemoryBackend
+
+from conftest import import_app_module
+
+
+USER = {"username": "user1"}
+
+
+class RecordingLimiter(InMemoryBackend):
+    def __init__(self):
+        super().__init__()
+        self.hits = []
+
+    def hit(self, key, limit, window, cost=1):
+        allowed, retry_after = super().hit(key, limit, window, cost)
+        self.hits.append((key, cost, allowed))
+        return allowed, retry_after
+
+
+class Store:
+    def search_batch(self, embeddings, top_k, doc_id):
+        return [[] for _ in embeddings]
+
+
+@pytest.fixture
+def limiter(monkeypatch):
+    # Frozen just after a window boundary, so earlier hits count in full
+    monkeypatch.setattr(rate_limit.time, "time", lambda: 60_000.0 + 1)
+    limiter = RecordingLimiter()
+    monkeypatch.setattr(policy, "limiter", limiter)
+    return limiter
+
+
+@pytest.fixture
+def embedded():
+    return []
+
+
+@pytest.fixture
+def rag(monkeypatch, embedded):
+    module = import_app_module("app.api.v1.routes.rag")
+
+    def embed_queries(texts):
+        embedded.append(list(texts))
+        return np.ones((len(texts), 4), dtype=np.float32)
+
+    async def answer_from_chunks(user_id, question, final_chunks, vector_store):
+        return {"question": question, "answer": "ok", "sources": []}
+
+    monkeypatch.setattr(module, "answer_cache", None)
+    monkeypatch.setattr(module, "get_user_vector_store", lambda user_id: Store())
+    monkeypatch.setattr(module.embedding_service, "embed_queries", embed_queries)
+    monkeypatch.setattr(module, "gate_retrieved", lambda user_id, question, retrieved: retrieved)
+    monkeypatch.setattr(module, "answer_from_chunks", answer_from_chunks)
+    return module
+
+
+def ask_batch(rag, n):
+    request = AskBatchRequest(questions=[f"question {i}" for i in range(n)])
+    return asyncio.run(rag.ask_batch(request, current_user=USER))
+
+
+def test_batch_is_charged_one_hit_per_question(rag, limiter):
+    response = ask_batch(rag, 4)
+
+    assert len(response["results"]) == 4
+    assert limiter.hits == [("queries_per_minute:user1", 4, True)]
+
+
+def test_over_limit_batch_is_rejected_whole(rag, limiter, embedded):
+    limit = policy.TIER_LIMITS["free"]["queries_per_minute"]
+    ask_batch(rag, limit - 2)
+
+    with pytest.raises(HTTPException) as exc:
+        ask_batch(rag, 3)
+
+    assert exc.value.status_code == 429
+    # Nothing was answered, and the rejected batch was not partly charged
+    assert len(embedded) == 1
+    ask_batch(rag, 2)
+    assert limiter.hits[-1] == ("queries_per_minute:user1", 2, True)
+
+
+def test_batch_above_the_tier_limit_can_never_fit(rag, limiter, embedded):
+    limit = policy.TIER_LIMITS["free"]["queries_per_minute"]
+
+    with pytest.raises(HTTPException) as exc:
+        ask_batch(rag, int(limit) + 1)
+
+    assert exc.value.status_code == 400
+    assert limiter.hits == []
+    assert embedded == []
@@ -0,0 +1,106 @@
+import asyncio
+import json
+
+import numpy as np
+import pytest
+
+from conftest import import_app_module
+
+
+CHUNKS = [{
+    "text": "FastAPI builds python APIs",
+    "position": 0,
+    "metadata": {"doc_id": "fastapi", "source": "fastapi", "page": 1},
+}]
+
+
+@pytest.fixture
+def rag(monkeypatch):
+    module = import_app_module("app.api.v1.routes.rag")
+
+    async def embed(question):
+        return np.ones(4, dtype=np.float32)
+
+    monkeypatch.setattr(module, "answer_cache", None)
+    monkeypatch.setattr(module.query_batcher, "embed", embed)
+    monkeypatch.setattr(module, "retrieve_final_chunks", lambda *args: CHUNKS)
+    monkeypatch.setattr(module, "log_answer_outcome", lambda *args: None)
+    monkeypatch.setattr(module.faithfulness_sampler, "offer", lambda *args: None)
+    return module
+
+
+def stub_llm(monkeypatch, rag, tokens):
+    async def astream_answer(question, context_chunks):
+        for token in tokens:
+            yield token
+
+    monkeypatch.setattr(rag.llm_service, "astream_answer", astream_answer)
+
+
+def stream(rag, question="What is FastAPI?"):
+    async def collect():
+        events = rag.stream_answer_events("user1", question, question.lower(), None, None, 0)
+        return [event async for event in events]
+
+    parsed = []
+    for raw in asyncio.run(collect()):
+        name, data = raw.strip().split("\n")
+        parsed.append((name.removeprefix("event: "), json.loads(data.removeprefix("data: "))))
+    return parsed
+
+
+def streamed_text(events):
+    return "".join(data["text"] for name, data in events if name == "token")
+
+
+def test_may_become_refusal_holds_prefixes_of_the_phrase(rag):
+    assert rag.may_become_refusal("")
+    assert rag.may_become_refusal("I")
+    assert rag.may_become_refusal(" \"I don't kn")
+    assert rag.may_become_refusal("I DON'T KNOW based")
+
+
+def test_may_become_refusal_releases_other_answers(rag):
+    assert not rag.may_become_refusal("It")
+    assert not rag.may_become_refusal("I think")
+    assert not rag.may_become_refusal("FastAPI is")
+
+
+def test_may_become_refusal_stays_true_past_the_full_phrase(rag):
+    # Once the phrase is complete, is_refusal takes over
+    assert rag.may_become_refusal("I don't know based on the provided context.")
+
+
+def test_streamed_refusal_leaks_no_tokens(rag, monkeypatch):
+    stub_llm(monkeypatch, rag, ["I", " don't", " know", " based", " on", " the", " provided", " context", "."])
+
+    events = stream(rag)
+
+    assert [name for name, _ in events] == ["sources", "done"]
+    done = events[-1][1]
+    assert done["refused"] is True
+    assert done["answer"] == rag.REFUSAL_ANSWER
+    assert done["sources"] == []
+
+
+def test_normal_answer_flushes_every_token(rag, monkeypatch):
+    # "I" is held back until " build" rules out the refusal
+    tokens = ["I", " build", " APIs", " with", " FastAPI", "."]
+    stub_llm(monkeypatch, rag, tokens)
+
+    events = stream(rag)
+
+    assert events[0][0] == "sources"
+    assert streamed_text(events) == "".join(tokens)
+    done = events[-1][1]
+    assert done["refused"] is False
+    assert done["answer"] == "I build APIs with FastAPI."
+
+
+def test_held_back_prefix_is_flushed_when_the_stream_ends(rag, monkeypatch):
+    stub_llm(monkeypatch, rag, ["I", " don't"])
+
+    events = stream(rag)
+
+    assert streamed_text(events) == "I don't"
+    assert events[-1][1]["refused"] is False
@@ -0,0 +1,108 @@
+import asyncio
+
+import pytest
+from jose import jwt
+
+from app import auth
+from app import metrics
+from app.auth import PasswordVerifier, TokenCache
+
+
+class Clock:
+    def __init__(self, now: float):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock(1000.0)
+    monkeypatch.setattr(auth.time, "time", clock)
+    return clock
+
+
+def test_token_cache_serves_until_exp(clock):
+    cache = TokenCache(max_entries=4)
+    cache.put("tok", "user1", exp=1010.0)
+
+    assert cache.get("tok") == "user1"
+    clock.now = 1009.9
+    assert cache.get("tok") == "user1"
+
+    clock.now = 1010.0
+    assert cache.get("tok") is None
+    # Expired entries are dropped on lookup
+    assert cache.stats() == {"entries": 0, "hits": 2, "misses": 1}
+
+
+def test_token_cache_evicts_least_recently_used(clock):
+    cache = TokenCache(max_entries=2)
+    cache.put("a", "user1", exp=2000.0)
+    cache.put("b", "user2", exp=2000.0)
+    assert cache.get("a") == "user1"
+
+    cache.put("c", "user3", exp=2000.0)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == "user1"
+    assert cache.get("c") == "user3"
+
+
+def test_token_cache_disabled():
+    cache = TokenCache(max_entries=0)
+    cache.put("tok", "user1", exp=float("inf"))
+    assert cache.get("tok") is None
+    assert cache.stats()["entries"] == 0
+
+
+def test_get_current_user_does_not_serve_expired_tokens(clock, monkeypatch):
+    monkeypatch.setattr(auth, "token_cache", TokenCache(max_entries=4))
+    token = jwt.encode({"sub": "user1", "exp": 1010}, auth.SECRET_KEY, algorithm=auth.ALGORITHM)
+    # jose checks exp against the real clock, so only the cached path is
+    # exercised here: seed it as a prior validation would have
+    auth.token_cache.put(token, "user1", 1010.0)
+
+    assert auth.get_current_user(token)["username"] == "user1"
+
+    clock.now = 1011.0
+    with pytest.raises(auth.HTTPException) as exc:
+        auth.get_current_user(token)
+    assert exc.value.status_code == 401
+
+
+def observed(histogram) -> int:
+    return sum(histogram.counts().values())
+
+
+def test_password_verifier_uses_spawned_workers():
+    verifier = PasswordVerifier(workers=1, max_pending=2)
+    hashed = auth.fake_users_db["user1"]["hashed_password"]
+    queued, verified = observed(metrics.PASSWORD_QUEUE_SECONDS), observed(metrics.PASSWORD_VERIFY_SECONDS)
+    try:
+        assert asyncio.run(verifier.verify("test123", hashed)) is True
+        assert asyncio.run(verifier.verify("wrong", hashed)) is False
+        assert verifier.executor._mp_context.get_start_method() == "spawn"
+    finally:
+        verifier.executor.shutdown()
+    assert verifier.stats()["completed"] == 2
+
+    # The same waits are exported through the metrics registry
+    assert observed(metrics.PASSWORD_QUEUE_SECONDS) == queued + 2
+    assert observed(metrics.PASSWORD_VERIFY_SECONDS) == verified + 2
+    assert metrics.PASSWORD_PENDING.values.get((), 0.0) == 0.0
+    assert "auth_password_queue_seconds_count" in metrics.registry.render()
+
+
+def test_password_verifier_rejects_when_full():
+    verifier = PasswordVerifier(workers=1, max_pending=0)
+    rejected = metrics.PASSWORD_REJECTIONS.values.get((), 0.0)
+
+    with pytest.raises(auth.HTTPException) as exc:
+        asyncio.run(verifier.verify("test123", "unused"))
+
+    assert exc.value.status_code == 503
+    assert verifier.executor is None
+    assert verifier.stats()["rejected"] == 1
+    assert metrics.PASSWORD_REJECTIONS.values.get((), 0.0) == rejected + 1
@@ -0,0 +1,82 @@
+import numpy as np
+import pytest
+
+from app.rag_basics.chunk_store import ChunkFile, ChunkStore, write_chunk_file
+
+
+def make_chunks():
+    return [
+        {"text": "plain ascii", "metadata": {"doc_id": "a", "source": "a", "page": 1}},
+        {"text": "ünïcödé — ✓", "metadata": {"doc_id": "a", "source": "a", "page": 2}},
+        {"text": "", "metadata": {"doc_id": "b", "source": "b.pdf", "page": 1}},
+        {"text": "last", "metadata": {"doc_id": "a", "source": "a", "page": 7}},
+    ]
+
+
+def write(tmp_path, chunks, name="chunks.bin") -> ChunkFile:
+    path = tmp_path / name
+    with open(path, "wb") as f:
+        write_chunk_file(f, chunks)
+    return ChunkFile(str(path))
+
+
+def test_chunk_file_round_trip(tmp_path):
+    chunks = make_chunks()
+    chunk_file = write(tmp_path, chunks)
+
+    assert len(chunk_file) == len(chunks)
+    assert [chunk_file[i] for i in range(len(chunk_file))] == chunks
+    # doc_id and source strings are interned
+    assert chunk_file.docs == ["a", "b"]
+    assert chunk_file.sources == ["a", "b.pdf"]
+
+
+def test_chunk_file_arrays_are_aligned(tmp_path):
+    chunk_file = write(tmp_path, make_chunks())
+    for array in (chunk_file.offsets, chunk_file.doc_idx, chunk_file.source_idx, chunk_file.pages):
+        assert array.ctypes.data % 8 == 0
+
+
+def test_empty_chunk_file(tmp_path):
+    chunk_file = write(tmp_path, [])
+    assert len(chunk_file) == 0
+    assert list(chunk_file.doc_runs()) == []
+
+
+def test_doc_runs_groups_consecutive_chunks(tmp_path):
+    chunk_file = write(tmp_path, make_chunks())
+    assert list(chunk_file.doc_runs()) == [("a", 0, 2), ("b", 2, 3), ("a", 3, 4)]
+
+
+def test_rejects_foreign_file(tmp_path):
+    path = tmp_path / "not_chunks.bin"
+    path.write_bytes(b"definitely not a chunk file")
+    with pytest.raises(ValueError):
+        ChunkFile(str(path))
+
+
+def test_chunk_store_spans_files_and_pending(tmp_path):
+    chunks = make_chunks()
+    store = ChunkStore()
+    store.add_file(write(tmp_path, chunks[:2], "one.bin"))
+    store.add_file(write(tmp_path, chunks[2:3], "two.bin"))
+    store.extend(chunks[3:])
+
+    assert len(store) == 4
+    assert list(store) == chunks
+    assert [store[i] for i in range(4)] == chunks
+    assert store[-1] == chunks[-1]
+    assert store[1:3] == chunks[1:3]
+    assert list(store.doc_runs()) == [("a", 0, 2), ("b", 2, 3), ("a", 3, 4)]
+    with pytest.raises(IndexError):
+        store[4]
+
+
+def test_chunk_store_seal_replaces_pending(tmp_path):
+    chunks = make_chunks()
+    store = ChunkStore(chunks)
+    store.seal(3, write(tmp_path, chunks[:3]))
+
+    assert store.pending == chunks[3:]
+    assert list(store) == chunks
+    assert np.asarray(store.files[0].pages).tolist() == [1, 2, 1]
@@ -0,0 +1,97 @@
+import re
+
+from app.rag_basics.chunking_service import ChunkingService
+
+
+class WordTokenizer:
+    """One token per whitespace-separated word, with character offsets."""
+
+    def num_special_tokens_to_add(self, pair=False):
+        return 2
+
+    def __call__(self, texts, add_special_tokens=False, return_offsets_mapping=False):
+        return {
+            "offset_mapping": [
+                [(m.start(), m.end()) for m in re.finditer(r"\S+", text)]
+                for text in texts
+            ]
+        }
+
+
+def sentence(n_words: int, tag: str) -> str:
+    return " ".join(f"{tag}{i}" for i in range(n_words)) + "."
+
+
+def chunker(max_tokens: int, token_overlap: int = 0) -> ChunkingService:
+    return ChunkingService(tokenizer=WordTokenizer(), max_tokens=max_tokens, token_overlap=token_overlap)
+
+
+def tokens(chunk: str) -> int:
+    return len(chunk.split())
+
+
+def test_budget_leaves_room_for_special_tokens():
+    assert chunker(12).token_budget == 10
+
+
+def test_sentences_are_packed_up_to_the_window():
+    text = " ".join([sentence(4, "a"), sentence(4, "b"), sentence(4, "c")])
+
+    windows = chunker(12)._token_windows(text)
+
+    # a + b fill 8 of 10 tokens; c would overflow, so it starts the next chunk
+    assert windows == [f"{sentence(4, 'a')} {sentence(4, 'b')}", sentence(4, "c")]
+    assert all(tokens(w) <= 10 for w in windows)
+
+
+def test_sentence_boundaries_are_never_split_when_they_fit():
+    sentences = [sentence(n, tag) for n, tag in ((3, "a"), (6, "b"), (2, "c"), (5, "d"))]
+
+    windows = chunker(12)._token_windows(" ".join(sentences))
+
+    rejoined = [s for w in windows for s in re.split(r"(?<=\.) ", w)]
+    assert rejoined == sentences
+
+
+def test_overlap_repeats_trailing_sentences():
+    text = " ".join([sentence(3, "a"), sentence(3, "b"), sentence(3, "c"), sentence(3, "d")])
+
+    windows = chunker(12, token_overlap=3)._token_windows(text)
+
+    assert windows == [
+        " ".join([sentence(3, "a"), sentence(3, "b"), sentence(3, "c")]),
+        " ".join([sentence(3, "c"), sentence(3, "d")]),
+    ]
+
+
+def test_overlap_is_dropped_when_it_would_overflow_the_window():
+    text = " ".join([sentence(4, "a"), sentence(9, "b")])
+
+    windows = chunker(12, token_overlap=4)._token_windows(text)
+
+    assert windows == [sentence(4, "a"), sentence(9, "b")]
+
+
+def test_sentence_longer_than_the_window_is_cut_on_token_boundaries():
+    long = sentence(25, "w")
+
+    windows = chunker(12)._token_windows(f"{long} {sentence(2, 'z')}")
+
+    assert [tokens(w) for w in windows] == [10, 10, 7]
+    assert windows[0] == " ".join(f"w{i}" for i in range(10))
+    assert windows[2] == "w20 w21 w22 w23 w24. z0 z1."
+
+
+def test_blank_text_yields_no_windows():
+    assert chunker(12)._token_windows(" \n\n ") == []
+
+
+def test_chunk_documents_keeps_page_metadata():
+    documents = [{"text": sentence(3, "a"), "metadata": {"source": "notes", "page": 2}}]
+
+    chunks = chunker(12).chunk_documents(documents)
+
+    assert chunks == [{
+        "text": sentence(3, "a"),
+        "metadata": {"doc_id": "notes", "source": "notes", "page": 2},
+    }]
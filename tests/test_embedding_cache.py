@@ -0,0 +1,93 @@
+import numpy as np
+import pytest
+
+from app.rag_basics.embedding_cache import EmbeddingCache
+from app.rag_basics.embeddings import EmbeddingService
+
+
+def vector(value: float) -> np.ndarray:
+    return np.full(4, value, dtype=np.float32)
+
+
+class CountingModel:
+    """Encodes each text to its length and records what reached the model."""
+
+    def __init__(self):
+        self.calls = []
+
+    def encode(self, texts, convert_to_numpy=True, normalize_embeddings=True):
+        self.calls.append(list(texts))
+        return np.stack([vector(len(t)) for t in texts])
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return EmbeddingCache(str(tmp_path / "cache" / "embeddings.sqlite"), max_entries=3)
+
+
+@pytest.fixture
+def service(cache):
+    # Skips __init__, which would load the real model
+    service = EmbeddingService.__new__(EmbeddingService)
+    service.model = CountingModel()
+    service.cache = cache
+    service.cache_namespace = "mini"
+    return service
+
+
+def test_keys_are_content_addressed_per_model():
+    key = EmbeddingCache.make_key("mini", "some text")
+    assert key == EmbeddingCache.make_key("mini", "some text")
+    assert key.startswith("mini:")
+    assert key != EmbeddingCache.make_key("mini@onnx-int8", "some text")
+    assert key != EmbeddingCache.make_key("mini", "some text ")
+
+
+def test_get_many_counts_hits_and_misses(cache):
+    cache.put_many({"a": vector(1), "b": vector(2)})
+
+    found = cache.get_many(["a", "x", "a"])
+
+    assert list(found) == ["a"]
+    np.testing.assert_array_equal(found["a"], vector(1))
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["entries"]) == (2, 1, 2)
+
+
+def test_evicts_least_recently_used_past_the_cap(cache):
+    cache.put_many({"a": vector(1)})
+    cache.put_many({"b": vector(2)})
+    cache.put_many({"c": vector(3)})
+    cache.get_many(["a"])
+
+    cache.put_many({"d": vector(4)})
+
+    assert set(cache.get_many(["a", "b", "c", "d"])) == {"a", "c", "d"}
+    assert cache.stats()["entries"] == 3
+    assert cache.stats()["evictions"] == 1
+
+
+def test_entries_survive_reopening(cache):
+    cache.put_many({"a": vector(1)})
+    reopened = EmbeddingCache(cache.path, max_entries=3)
+
+    assert reopened.stats()["entries"] == 1
+    np.testing.assert_array_equal(reopened.get_many(["a"])["a"], vector(1))
+
+
+def test_embed_texts_encodes_each_missing_text_once(service):
+    first = service.embed_texts(["ab", "abc", "ab"])
+    second = service.embed_texts(["abc", "abcd"])
+
+    assert service.model.calls == [["ab", "abc"], ["abcd"]]
+    assert first[:, 0].tolist() == [2, 3, 2]
+    assert second[:, 0].tolist() == [3, 4]
+    assert first.dtype == np.float32
+
+
+def test_embed_queries_bypass_the_cache(service, cache):
+    service.embed_queries(["what is ab?"])
+
+    assert service.model.calls == [["what is ab?"]]
+    assert cache.stats()["entries"] == 0
+    assert cache.stats()["hits"] + cache.stats()["misses"] == 0
@@ -0,0 +1,115 @@
+import json
+
+import numpy as np
+import pytest
+
+from conftest import import_app_module
+
+
+ITEM = {
+    "id": "q1",
+    "question": "What is FastAPI used for?",
+    "expected_keywords": ["fastapi"],
+    "expected_source": "fastapi",
+}
+
+
+@pytest.fixture
+def runner(tmp_path, monkeypatch):
+    module = import_app_module("app.rag_eval.eval_runner")
+    monkeypatch.setattr(module, "EVAL_RUNS_ROOT", str(tmp_path / "runs"))
+    return module
+
+
+def unit(*values):
+    vector = np.zeros(4, dtype=np.float32)
+    vector[:len(values)] = values
+    return vector / np.linalg.norm(vector)
+
+
+def retrieved(vector):
+    return [{"content": "FastAPI builds python APIs", "source": "fastapi", "position": 0, "vector": vector}]
+
+
+def test_item_is_scored_against_vectors_it_was_answered_from(runner, monkeypatch):
+    monkeypatch.setattr(runner, "retrieve_chunks_adapter", lambda question, user_id, with_vectors: retrieved(unit(1)))
+    monkeypatch.setattr(runner, "generate_answer_adapter", lambda question, chunks: "FastAPI builds python APIs quickly.")
+    monkeypatch.setattr(runner.embedding_service, "embed_queries", lambda texts: np.stack([unit(1)] * len(texts)))
+
+    result = runner.evaluate_item(ITEM, "user1", faithfulness_threshold=0.5)
+
+    assert result["semantic_faithfulness"]["faithful"] is True
+    assert result["semantic_faithfulness"]["support_score"] == 1.0
+    # No positions are kept for a later pass to resolve against a changed store
+    assert "context_positions" not in result
+    json.dumps(result)
+
+
+def test_scoring_error_keeps_the_answer(runner, monkeypatch):
+    def fail(texts):
+        raise RuntimeError("encoder crashed")
+
+    monkeypatch.setattr(runner, "retrieve_chunks_adapter", lambda question, user_id, with_vectors: retrieved(unit(1)))
+    monkeypatch.setattr(runner, "generate_answer_adapter", lambda question, chunks: "FastAPI builds python APIs quickly.")
+    monkeypatch.setattr(runner.embedding_service, "embed_queries", fail)
+
+    result = runner.evaluate_item(ITEM, "user1")
+
+    assert result["answer"] == "FastAPI builds python APIs quickly."
+    assert result["semantic_faithfulness"] == {
+        "faithful": False,
+        "reason": "scoring_failed",
+        "error": "encoder crashed",
+    }
+
+
+def test_failed_run_is_marked_in_meta(runner, tmp_path):
+    with pytest.raises(FileNotFoundError):
+        runner.run_eval("job", "user1", "run1", str(tmp_path / "missing.json"), concurrency=1)
+
+    meta = runner.read_run_meta("user1", "run1")
+    assert meta["status"] == "failed"
+    assert "missing.json" in meta["error"]
+
+
+def passed(question_id):
+    return {
+        "question_id": question_id,
+        "question": question_id,
+        "answer": "ok",
+        "retrieval": {"passed": True},
+        "faithfulness": {"faithful": True},
+    }
+
+
+def test_resumed_run_skips_items_already_written(runner, monkeypatch, tmp_path):
+    dataset = tmp_path / "dataset.json"
+    dataset.write_text(json.dumps([{**ITEM, "id": f"q{i}"} for i in range(1, 5)]))
+
+    run_dir = tmp_path / "runs" / "user1" / "run1"
+    run_dir.mkdir(parents=True)
+    (run_dir / runner.RESULTS_FILE).write_text(
+        json.dumps(passed("q1")) + "\n"
+        + json.dumps({"question_id": "q2", "question": "q2", "error": "timeout"}) + "\n"
+        # Torn by a crash mid-write: q3 never finished
+        + '{"question_id": "q3", "answ'
+    )
+
+    evaluated = []
+
+    def evaluate_item(item, user_id, faithfulness_threshold):
+        evaluated.append(item["id"])
+        return passed(item["id"])
+
+    monkeypatch.setattr(runner, "evaluate_item", evaluate_item)
+
+    result = runner.run_eval("job", "user1", "run1", str(dataset), concurrency=2)
+
+    # The finished item is not re-run; the failed and torn ones are
+    assert sorted(evaluated) == ["q2", "q3", "q4"]
+    ids = [r["question_id"] for r in runner.read_results("user1", "run1")]
+    assert sorted(ids) == ["q1", "q2", "q3", "q4"]
+    assert result["summary"]["total"] == 4
+    assert result["summary"]["passed"] == 4
+    assert result["summary"]["errors"] == 0
+    assert runner.read_run_meta("user1", "run1")["status"] == "completed"
@@ -0,0 +1,58 @@
+import json
+import os
+import time
+
+from app import evaluation, metrics
+from app.evaluation import JsonlWriter
+
+
+def wait_for(condition, timeout: float = 5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+def read_lines(path):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f]
+
+
+def test_close_flushes_queued_records(tmp_path):
+    path = tmp_path / "logs" / "requests.jsonl"
+    # Far longer than the test: only close() can write these out
+    writer = JsonlWriter(str(path), flush_seconds=60.0)
+    writer.write({"event": "a"})
+    writer.write({"event": "b"})
+
+    writer.close()
+
+    assert not writer.worker.is_alive()
+    assert read_lines(path) == [{"event": "a"}, {"event": "b"}]
+    assert writer.stats()["written"] == 2
+    writer.close()
+
+
+def test_write_error_is_counted_and_the_writer_keeps_running(tmp_path, monkeypatch):
+    path = tmp_path / "requests.jsonl"
+    writer = JsonlWriter(str(path), flush_seconds=0.01)
+    errors = metrics.REQUEST_LOG_WRITE_ERRORS.values.get((), 0.0)
+
+    real_write = os.write
+    failures = [OSError(28, "No space left on device")]
+
+    def write(fd, data):
+        if failures:
+            raise failures.pop()
+        return real_write(fd, data)
+
+    monkeypatch.setattr(evaluation.os, "write", write)
+
+    writer.write({"event": "lost"})
+    wait_for(lambda: writer.stats()["failed"] == 1)
+    writer.write({"event": "kept"})
+    writer.close()
+
+    assert read_lines(path) == [{"event": "kept"}]
+    assert writer.stats()["written"] == 1
+    assert metrics.REQUEST_LOG_WRITE_ERRORS.values.get((), 0.0) == errors + 1
@@ -0,0 +1,134 @@
+import faiss
+import numpy as np
+import pytest
+
+from app.rag_basics.index_backends import (
+    IndexConfig,
+    SegmentedFlatIndex,
+    build_index,
+    index_nbytes,
+    new_flat_index,
+    recall_latency_report,
+    storage_of,
+)
+
+
+def normalized(rng, n, dim=64, shift=0.0):
+    vectors = rng.standard_normal((n, dim)) + shift
+    return (vectors / np.linalg.norm(vectors, axis=1, keepdims=True)).astype(np.float32)
+
+
+@pytest.mark.parametrize("storage", ["float16", "int8"])
+def test_flat_storage_codes(storage):
+    index = new_flat_index(64, IndexConfig(storage=storage))
+    assert storage_of(index) == storage
+
+
+def test_int8_ranges_do_not_depend_on_first_batch():
+    rng = np.random.default_rng(0)
+    index = new_flat_index(64, IndexConfig(storage="int8"))
+    assert index.is_trained
+
+    # A tiny first upload, then data from a different part of the sphere
+    index.add(normalized(rng, 3))
+    later = normalized(rng, 500, shift=rng.standard_normal(64) * 3)
+    index.add(later)
+
+    error = np.abs(index.reconstruct_n(3, 500) - later).max()
+    assert error <= 1 / 255 + 1e-6
+
+
+def test_int8_search_matches_exact_ranking():
+    rng = np.random.default_rng(1)
+    vectors = normalized(rng, 300)
+    index = new_flat_index(64, IndexConfig(storage="int8"))
+    index.add(vectors)
+
+    queries = vectors[:20]
+    _, top = index.search(queries, 1)
+    assert (top[:, 0] == np.arange(20)).mean() >= 0.95
+
+
+def test_hnsw_int8_uses_fixed_ranges():
+    rng = np.random.default_rng(2)
+    vectors = normalized(rng, 200, shift=2.0)
+    index = build_index("hnsw", vectors, IndexConfig(backend="hnsw", storage="int8"))
+
+    assert storage_of(index) == "int8"
+    assert np.abs(index.reconstruct_n(0, 200) - vectors).max() <= 1 / 255 + 1e-6
+
+
+def flat_of(vectors):
+    index = faiss.IndexFlatIP(vectors.shape[1])
+    index.add(vectors)
+    return index
+
+
+def test_segmented_flat_index_matches_one_flat_index():
+    rng = np.random.default_rng(3)
+    vectors = normalized(rng, 90)
+    segmented = SegmentedFlatIndex(64, [flat_of(vectors[:40]), flat_of(vectors[40:70])])
+    segmented.add(vectors[70:])
+    whole = flat_of(vectors)
+
+    queries = normalized(rng, 5)
+    for k in (1, 10, 120):
+        scores, ids = segmented.search(queries, k)
+        expected_scores, expected_ids = whole.search(queries, k)
+        np.testing.assert_array_equal(ids, expected_ids)
+        np.testing.assert_allclose(scores[ids >= 0], expected_scores[expected_ids >= 0], rtol=1e-5)
+
+    np.testing.assert_array_equal(segmented.reconstruct_n(35, 40), vectors[35:75])
+    np.testing.assert_array_equal(segmented.reconstruct(75), vectors[75])
+
+
+def test_segmented_flat_index_translates_selectors():
+    rng = np.random.default_rng(4)
+    vectors = normalized(rng, 60)
+    segmented = SegmentedFlatIndex(64, [flat_of(vectors[:30])])
+    segmented.add(vectors[30:])
+
+    dead = faiss.IDSelectorBatch(np.arange(20, 45, dtype=np.int64))
+    params = faiss.SearchParameters()
+    params.sel = faiss.IDSelectorNot(dead)
+    _, ids = segmented.search(vectors, 60, params=params)
+
+    assert not np.isin(ids, np.arange(20, 45)).any()
+    assert (ids >= 0).sum(axis=1).tolist() == [35] * 60
+
+
+def test_segmented_flat_index_seal_moves_tail_to_segment():
+    rng = np.random.default_rng(5)
+    vectors = normalized(rng, 20)
+    segmented = SegmentedFlatIndex(64, [flat_of(vectors[:10])])
+    segmented.add(vectors[10:])
+    assert index_nbytes(segmented) == 10 * 64 * 4
+
+    segmented.seal(flat_of(vectors[10:]))
+
+    assert segmented.ntotal == 20 and segmented.tail.ntotal == 0
+    assert index_nbytes(segmented) == 0
+    _, ids = segmented.search(vectors[15:16], 1)
+    assert ids[0, 0] == 15
+    with pytest.raises(ValueError):
+        segmented.seal(flat_of(vectors[:3]))
+
+
+def test_recall_report_truth_is_exact_under_int8():
+    rng = np.random.default_rng(6)
+    vectors = normalized(rng, 400)
+    config = IndexConfig(storage="int8")
+
+    report = recall_latency_report(vectors, config, k=10, num_queries=50, backends=["flat"])
+
+    # Same query sample as the report; truth from exact float32 scores
+    queries = vectors[np.random.default_rng(0).choice(400, size=50, replace=False)]
+    truth = np.argsort(-(queries @ vectors.T), axis=1)[:, :10]
+    index = new_flat_index(64, config)
+    index.add(vectors)
+    _, found = index.search(queries, 10)
+    hits = sum(len(set(f) & set(t)) for f, t in zip(found.tolist(), truth.tolist()))
+
+    assert report[0]["recall@10"] == round(hits / 500, 4)
+    # Quantized flat search is no longer scored against itself
+    assert report[0]["recall@10"] < 1.0
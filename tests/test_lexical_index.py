@@ -0,0 +1,182 @@
+import numpy as np
+import pytest
+
+from app.rag_basics.lexical_index import BM25Index, MemoryPostings, PostingsFile, analyze, write_postings_file
+from app.rag_basics.segment_storage import SegmentStorage
+from app.rag_basics.vector_store import FAISSVectorStore
+
+
+TEXTS = [
+    "FastAPI is a modern Python web framework",
+    "Django is a high-level Python web framework",
+    "Bluetooth connects devices over short range radio",
+    "FastAPI supports async programming and is fast fast fast",
+    "Retrieval augmented generation reduces hallucination",
+]
+
+
+def write_postings(tmp_path, texts, name="block.postings") -> PostingsFile:
+    path = tmp_path / name
+    with open(path, "wb") as f:
+        write_postings_file(f, texts)
+    return PostingsFile(str(path))
+
+
+def test_analyze_drops_stopwords_and_case():
+    assert analyze("What is the FastAPI framework?") == ["fastapi", "framework"]
+
+
+def test_search_ranks_by_bm25_and_reports_coverage():
+    index = BM25Index()
+    index.add(0, TEXTS)
+
+    hits = index.search("fastapi async", top_k=3)
+    positions = [p for _, p, _ in hits]
+    assert positions[0] == 3
+    assert set(positions) == {0, 3}
+    assert hits[0][2] == 1.0
+    assert dict((p, c) for _, p, c in hits)[0] == 0.5
+
+
+def test_search_without_matches_or_terms():
+    index = BM25Index()
+    index.add(0, TEXTS)
+    assert index.search("kubernetes", top_k=3) == []
+    assert index.search("the of and", top_k=3) == []
+    assert BM25Index().search("fastapi", top_k=3) == []
+
+
+def test_positions_must_be_appended_in_order():
+    index = BM25Index()
+    index.add(0, TEXTS[:2])
+    with pytest.raises(ValueError):
+        index.add(5, TEXTS[2:])
+
+
+def test_delete_masks_positions_and_updates_stats():
+    index = BM25Index()
+    index.add(0, TEXTS)
+    index.delete([(3, 4)])
+
+    assert [p for _, p, _ in index.search("fastapi", top_k=5)] == [0]
+    assert index.live_docs == 4
+    assert index.total_length == sum(len(analyze(t)) for i, t in enumerate(TEXTS) if i != 3)
+
+    # Deleting twice is a no-op
+    index.delete([(3, 4)])
+    assert index.live_docs == 4
+
+
+def test_ranges_restrict_results():
+    index = BM25Index()
+    index.add(0, TEXTS)
+    assert [p for _, p, _ in index.search("python framework", top_k=5, ranges=[(1, 3)])] == [1]
+    assert index.search("python", top_k=5, ranges=[]) == []
+
+
+def test_postings_file_matches_memory_postings(tmp_path):
+    memory = MemoryPostings()
+    for text in TEXTS:
+        memory.add(text)
+    persisted = write_postings(tmp_path, TEXTS)
+
+    assert len(persisted) == len(memory)
+    np.testing.assert_array_equal(persisted.lengths(), memory.lengths())
+    for term in memory.vocabulary:
+        for got, expected in zip(persisted.postings(term), memory.postings(term)):
+            np.testing.assert_array_equal(got, expected)
+    assert persisted.postings("kubernetes") is None
+
+
+def test_empty_postings_file(tmp_path):
+    persisted = write_postings(tmp_path, [])
+    index = BM25Index()
+    index.add_file(0, persisted)
+    assert len(index) == 0
+    assert index.search("fastapi", top_k=3) == []
+
+
+def test_file_blocks_score_like_one_memory_block(tmp_path):
+    whole = BM25Index()
+    whole.add(0, TEXTS)
+
+    blocks = BM25Index()
+    blocks.add_file(0, write_postings(tmp_path, TEXTS[:2], "a.postings"))
+    blocks.add_file(2, write_postings(tmp_path, TEXTS[2:4], "b.postings"))
+    blocks.add(4, TEXTS[4:])
+
+    for query in ("fastapi", "python web framework", "fast radio hallucination"):
+        expected = whole.search(query, top_k=5)
+        got = blocks.search(query, top_k=5)
+        assert [p for _, p, _ in got] == [p for _, p, _ in expected]
+        np.testing.assert_allclose([s for s, _, _ in got], [s for s, _, _ in expected], rtol=1e-6)
+
+
+def test_seal_swaps_matching_memory_block(tmp_path):
+    index = BM25Index()
+    index.add(0, TEXTS)
+    assert not index.seal(0, write_postings(tmp_path, TEXTS[:2], "short.postings"))
+    assert index.seal(0, write_postings(tmp_path, TEXTS))
+    assert isinstance(index.blocks[-1][1], PostingsFile)
+
+    # New chunks start a fresh in-memory block after the file
+    index.add(len(TEXTS), ["fastapi again"])
+    assert [p for _, p, _ in index.search("again", top_k=3)] == [len(TEXTS)]
+
+
+def make_chunks(texts, doc_id):
+    return [{"text": t, "metadata": {"doc_id": doc_id, "source": doc_id, "page": i + 1}} for i, t in enumerate(texts)]
+
+
+def test_reopened_store_maps_postings_instead_of_tokenizing(tmp_path):
+    rng = np.random.default_rng(0)
+    vectors = rng.standard_normal((len(TEXTS), 8)).astype(np.float32)
+
+    storage = SegmentStorage(str(tmp_path))
+    store = FAISSVectorStore(embedding_dim=8)
+    store.add_embeddings(vectors[:3], make_chunks(TEXTS[:3], "a"))
+    store.persist(storage)
+    store.add_embeddings(vectors[3:], make_chunks(TEXTS[3:], "b"))
+    store.persist(storage)
+    store.delete_document("a")
+    store.persist(storage)
+
+    # Persisting swapped the in-memory postings for the segment files
+    assert all(isinstance(block, PostingsFile) for _, block in store.lexical_index.blocks)
+
+    reopened = FAISSVectorStore.open(SegmentStorage(str(tmp_path)))
+    assert all(isinstance(block, PostingsFile) for _, block in reopened.lexical_index.blocks)
+    for query in ("fastapi", "python framework", "bluetooth"):
+        assert reopened.lexical_search(query, top_k=5) == store.lexical_search(query, top_k=5)
+    assert [h["position"] for h in reopened.lexical_search("fastapi", top_k=5)] == [3]
+
+
+def test_purged_storage_rewrites_postings(tmp_path):
+    rng = np.random.default_rng(1)
+    storage = SegmentStorage(str(tmp_path))
+    storage.append(rng.standard_normal((3, 8)).astype(np.float32), make_chunks(TEXTS[:3], "a"))
+    storage.append(rng.standard_normal((2, 8)).astype(np.float32), make_chunks(TEXTS[3:], "b"))
+    storage.add_tombstones([(0, 3)])
+    assert storage.purge()
+
+    store = FAISSVectorStore.open(storage)
+    assert [h["position"] for h in store.lexical_search("fastapi", top_k=5)] == [0]
+    assert store.lexical_search("python", top_k=5) == []
+
+
+def test_segments_without_postings_are_tokenized_on_open(tmp_path):
+    rng = np.random.default_rng(2)
+    storage = SegmentStorage(str(tmp_path))
+    storage.append(rng.standard_normal((3, 8)).astype(np.float32), make_chunks(TEXTS[:3], "a"))
+    storage.append(rng.standard_normal((2, 8)).astype(np.float32), make_chunks(TEXTS[3:], "b"))
+
+    # As written before postings were persisted
+    manifest = storage.read_manifest()
+    del manifest["segments"][0]["postings"]
+    storage._write_manifest(manifest)
+
+    store = FAISSVectorStore.open(storage)
+    assert [type(block) for _, block in store.lexical_index.blocks] == [MemoryPostings, PostingsFile]
+    whole = BM25Index()
+    whole.add(0, TEXTS)
+    assert [h["position"] for h in store.lexical_search("fastapi", top_k=5)] == [p for _, p, _ in whole.search("fastapi", 5)]
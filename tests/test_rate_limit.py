@@ -0,0 +1,178 @@
+import math
+import sqlite3
+import time
+
+import pytest
+from fastapi import HTTPException
+
+from app import policy
+from app import rate_limit
+from app.rate_limit import (
+    InMemoryBackend,
+    LocalCounterStore,
+    NetworkBackend,
+    SQLiteBackend,
+    _estimate,
+    _retry_after,
+    retry_after_header,
+)
+
+
+WINDOW = 60.0
+
+
+class Clock:
+    def __init__(self, now: float):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    # Start just after a window boundary
+    clock = Clock(1_000 * WINDOW + 1)
+    monkeypatch.setattr(rate_limit.time, "time", clock)
+    return clock
+
+
+@pytest.fixture(params=["memory", "sqlite", "network"])
+def backend(request, tmp_path):
+    if request.param == "memory":
+        return InMemoryBackend()
+    if request.param == "sqlite":
+        return SQLiteBackend(str(tmp_path / "rl.sqlite3"))
+    return NetworkBackend(LocalCounterStore())
+
+
+def test_allows_up_to_limit_then_refuses(backend, clock):
+    for _ in range(10):
+        assert backend.hit("k", 10, WINDOW) == (True, 0.0)
+    allowed, retry_after = backend.hit("k", 10, WINDOW)
+    assert not allowed
+    assert retry_after > 0
+
+
+def test_keys_are_independent(backend, clock):
+    for _ in range(3):
+        backend.hit("a", 3, WINDOW)
+    assert not backend.hit("a", 3, WINDOW)[0]
+    assert backend.hit("b", 3, WINDOW)[0]
+
+
+def test_cost_is_charged_in_full(backend, clock):
+    assert backend.hit("k", 10, WINDOW, cost=7)[0]
+    assert not backend.hit("k", 10, WINDOW, cost=4)[0]
+    # A refused hit charges nothing
+    assert backend.hit("k", 10, WINDOW, cost=3)[0]
+
+
+def test_retry_after_is_honoured(backend, clock):
+    for _ in range(10):
+        backend.hit("k", 10, WINDOW)
+    allowed, retry_after = backend.hit("k", 10, WINDOW, cost=4)
+    assert not allowed
+
+    clock.now += retry_after - 0.5
+    assert not backend.hit("k", 10, WINDOW, cost=4)[0]
+    clock.now += 0.5 + 1e-6
+    assert backend.hit("k", 10, WINDOW, cost=4)[0]
+
+
+def test_previous_window_decays(backend, clock):
+    for _ in range(10):
+        backend.hit("k", 10, WINDOW)
+
+    # Half-way through the next window half of the previous count remains
+    clock.now += WINDOW - 1 + WINDOW / 2
+    for _ in range(5):
+        assert backend.hit("k", 10, WINDOW)[0]
+    assert not backend.hit("k", 10, WINDOW)[0]
+
+
+def test_cost_above_limit_never_fits(backend, clock):
+    allowed, retry_after = backend.hit("k", 10, WINDOW, cost=11)
+    assert not allowed
+    assert retry_after == math.inf
+
+
+def test_stale_counters_reset(backend, clock):
+    for _ in range(10):
+        backend.hit("k", 10, WINDOW)
+    clock.now += 3 * WINDOW
+    assert backend.hit("k", 10, WINDOW, cost=10)[0]
+
+
+def test_estimate_and_retry_after_agree():
+    # Denied in the current window: the wait covers the roll-over and decay
+    wait = _retry_after(previous=0, current=10, elapsed=20, window=WINDOW, limit=10, cost=4)
+    assert _estimate(10, 0, wait - (WINDOW - 20), WINDOW) + 4 == pytest.approx(10)
+
+    # Denied by the previous window's weight only
+    wait = _retry_after(previous=10, current=2, elapsed=6, window=WINDOW, limit=10, cost=1)
+    assert _estimate(10, 2, 6 + wait, WINDOW) + 1 == pytest.approx(10)
+
+
+def test_retry_after_header_rounds_up():
+    assert retry_after_header(0.2) == {"Retry-After": "1"}
+    assert retry_after_header(12.1) == {"Retry-After": "13"}
+
+
+def test_policy_rejects_costs_above_tier_limit(monkeypatch):
+    monkeypatch.setattr(policy, "limiter", InMemoryBackend())
+    limit = policy.TIER_LIMITS["free"]["queries_per_minute"]
+
+    with pytest.raises(HTTPException) as error:
+        policy.check_query_rate("someone", cost=limit + 1, tier="free")
+    assert error.value.status_code == 400
+    assert not error.value.headers
+
+
+def test_policy_returns_429_with_reachable_retry_after(monkeypatch):
+    monkeypatch.setattr(policy, "limiter", InMemoryBackend())
+    limit = policy.TIER_LIMITS["free"]["queries_per_minute"]
+
+    policy.check_query_rate("someone", cost=limit, tier="free")
+    with pytest.raises(HTTPException) as error:
+        policy.check_query_rate("someone", tier="free")
+    assert error.value.status_code == 429
+    assert 1 <= int(error.value.headers["Retry-After"]) <= 2 * 60
+
+
+def test_sqlite_lock_wait_is_bounded(tmp_path):
+    path = str(tmp_path / "rl.sqlite3")
+    backend = SQLiteBackend(path, timeout=0.05)
+    holder = sqlite3.connect(path, isolation_level=None)
+    holder.execute("BEGIN IMMEDIATE")
+    try:
+        started = time.monotonic()
+        with pytest.raises(sqlite3.OperationalError):
+            backend.hit("k", 10, WINDOW)
+        assert time.monotonic() - started < 1.0
+    finally:
+        holder.execute("ROLLBACK")
+    # The connection is usable again once the lock is released
+    assert backend.hit("k", 10, WINDOW)[0]
+
+
+class BrokenBackend:
+    def hit(self, key, limit, window, cost=1):
+        raise sqlite3.OperationalError("database is locked")
+
+
+def test_policy_fails_open_when_the_backend_errors(monkeypatch):
+    monkeypatch.setattr(policy, "limiter", BrokenBackend())
+    monkeypatch.setattr(policy, "RATE_LIMIT_FAIL_MODE", "open")
+
+    policy.check_query_rate("someone", tier="free")
+
+
+def test_policy_fails_closed_when_configured(monkeypatch):
+    monkeypatch.setattr(policy, "limiter", BrokenBackend())
+    monkeypatch.setattr(policy, "RATE_LIMIT_FAIL_MODE", "closed")
+
+    with pytest.raises(HTTPException) as exc:
+        policy.check_query_rate("someone", tier="free")
+    assert exc.value.status_code == 503
+    assert exc.value.headers["Retry-After"] == "1"
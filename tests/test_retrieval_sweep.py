@@ -0,0 +1,113 @@
+import numpy as np
+import pytest
+
+from app.rag_basics.index_backends import IndexConfig
+from app.rag_basics.vector_store import FAISSVectorStore
+from app.rag_eval.retrieval_sweep import first_per_page, sweep_retrieval
+
+
+DIM = 4
+
+
+def unit(*components: float) -> np.ndarray:
+    vector = np.zeros(DIM, dtype=np.float32)
+    vector[:len(components)] = components
+    return vector / np.linalg.norm(vector)
+
+
+class QuestionEmbeddings:
+    """Fixed question vectors, so the sweep is checked against known scores."""
+
+    def __init__(self, vectors):
+        self.vectors = vectors
+
+    def embed_queries(self, queries):
+        return np.stack([self.vectors[q] for q in queries])
+
+
+def chunk(text: str, doc_id: str, page: int) -> dict:
+    return {"text": text, "metadata": {"doc_id": doc_id, "source": doc_id, "page": page}}
+
+
+@pytest.fixture
+def store():
+    store = FAISSVectorStore(embedding_dim=DIM, index_config=IndexConfig())
+    store.add_embeddings(
+        np.stack([unit(1), unit(0.9, 0.436), unit(0, 1), unit(0, 0, 1)]),
+        [
+            chunk("alpha", "a.pdf", 1),
+            chunk("alpha beta", "a.pdf", 1),
+            chunk("beta", "b.pdf", 1),
+            chunk("gamma", "c.pdf", 2),
+        ],
+    )
+    return store
+
+
+DATASET = [
+    # Best hit is relevant
+    {"id": "q1", "question": "q1", "expected_source": "a.pdf", "expected_keywords": ["alpha"]},
+    # Ranked a.pdf p1 (0.98), a.pdf p1 again (0.8, deduplicated), b.pdf (0.6):
+    # the relevant hit is the second kept one
+    {"id": "q2", "question": "q2", "expected_source": "b.pdf", "expected_keywords": ["beta"]},
+    {"id": "q3", "question": "q3", "expected_source": "x.pdf", "expected_keywords": [],
+     "required_sources": ["missing.pdf"]},
+]
+
+EMBEDDINGS = QuestionEmbeddings({"q1": unit(1), "q2": unit(0.8, 0.6)})
+
+
+def cell(result: dict, k: int, threshold: float) -> dict:
+    return next(g for g in result["grid"] if g["k"] == k and g["threshold"] == threshold)
+
+
+def test_grid_masks_by_k_and_threshold(store):
+    result = sweep_retrieval(DATASET, store, EMBEDDINGS, k_values=(1, 3), thresholds=(0.0, 0.7))
+
+    assert result["questions"] == 2
+    assert result["skipped"] == ["q3"]
+    assert len(result["grid"]) == 4
+
+    wide = cell(result, 3, 0.0)
+    assert wide["recall"] == 1.0
+    assert wide["mrr"] == 0.75
+    assert wide["pass_rate"] == 1.0
+
+    # q2's relevant hit is past k=1 and below 0.7
+    for k, threshold in ((1, 0.0), (3, 0.7)):
+        narrow = cell(result, k, threshold)
+        assert narrow["recall"] == 0.5
+        assert narrow["mrr"] == 0.5
+
+    strict = cell(result, 3, 0.7)
+    assert strict["avg_chunks"] == 1.0
+    assert strict["empty_rate"] == 0.0
+
+    assert result["best"] == wide
+
+
+def test_threshold_above_every_score_keeps_nothing(store):
+    result = sweep_retrieval(DATASET[:2], store, EMBEDDINGS, k_values=(3,), thresholds=(1.5,))
+    only = result["grid"][0]
+    assert only["recall"] == 0.0
+    assert only["mrr"] == 0.0
+    assert only["avg_chunks"] == 0.0
+    assert only["empty_rate"] == 1.0
+
+
+def test_all_items_skipped(store):
+    result = sweep_retrieval(DATASET[2:], store, EMBEDDINGS)
+    assert result == {"questions": 0, "skipped": ["q3"], "grid": [], "best": None}
+
+
+def test_first_per_page_keeps_first_hit_of_each_page():
+    rows = [
+        [
+            {"chunk": chunk("x", "a.pdf", 1)},
+            {"chunk": chunk("y", "a.pdf", 1)},
+            {"chunk": chunk("z", "a.pdf", 2)},
+        ],
+        [{"chunk": chunk("w", "b.pdf", 1)}],
+    ]
+    mask = first_per_page(rows, width=3)
+    assert mask.tolist() == [[True, False, True], [True, False, False]]
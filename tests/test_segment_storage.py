@@ -0,0 +1,171 @@
+import json
+import os
+
+import numpy as np
+
+from app.rag_basics.chunk_store import ChunkFile
+from app.rag_basics.index_backends import SegmentedFlatIndex
+from app.rag_basics.segment_storage import SegmentStorage
+from app.rag_basics.vector_store import FAISSVectorStore
+
+from conftest import DIM, make_doc
+
+
+def test_append_and_reopen_round_trip(tmp_path):
+    storage = SegmentStorage(str(tmp_path))
+    v1, c1 = make_doc("a", 3, seed=1)
+    v2, c2 = make_doc("b", 4, seed=2)
+    storage.append(v1, c1)
+    storage.append(v2, c2)
+
+    reopened = SegmentStorage(str(tmp_path))
+    vectors, chunks = reopened.load()
+
+    assert reopened.segment_count() == 2
+    np.testing.assert_allclose(vectors, np.vstack([v1, v2]))
+    assert list(chunks) == c1 + c2
+    assert all(isinstance(f, ChunkFile) for f in chunks.files)
+
+
+def test_append_empty_batch_writes_nothing(tmp_path):
+    storage = SegmentStorage(str(tmp_path))
+    assert storage.append(np.zeros((0, DIM), dtype=np.float32), []) is None
+    assert not storage.exists()
+
+    vectors, chunks = storage.load()
+    assert vectors.shape == (0, 0)
+    assert len(chunks) == 0
+
+
+def test_compact_merges_segments_and_removes_old_files(tmp_path):
+    storage = SegmentStorage(str(tmp_path))
+    batches = [make_doc(f"doc{i}", 2, seed=i) for i in range(3)]
+    for vectors, chunks in batches:
+        storage.append(vectors, chunks)
+    before = storage.read_manifest()["segments"]
+
+    storage.compact()
+
+    manifest = storage.read_manifest()
+    assert len(manifest["segments"]) == 1
+    assert manifest["segments"][0]["count"] == 6
+    for segment in before:
+        assert not os.path.exists(os.path.join(str(tmp_path), segment["vectors"]))
+        assert not os.path.exists(os.path.join(str(tmp_path), segment["metadata"]))
+
+    vectors, chunks = SegmentStorage(str(tmp_path)).load()
+    np.testing.assert_allclose(vectors, np.vstack([v for v, _ in batches]))
+    assert list(chunks) == [c for _, batch in batches for c in batch]
+
+
+def test_compact_keeps_segments_appended_after_snapshot(tmp_path):
+    storage = SegmentStorage(str(tmp_path))
+    for i in range(2):
+        storage.append(*make_doc(f"doc{i}", 2, seed=i))
+
+    # Simulate an append landing between the snapshot and the swap
+    real_write = storage._write_segment
+    late = make_doc("late", 1, seed=9)
+
+    def write_then_append(*args, **kwargs):
+        segment = real_write(*args, **kwargs)
+        storage._write_segment = real_write
+        storage.append(*late)
+        return segment
+
+    storage._write_segment = write_then_append
+    storage.compact()
+
+    segments = storage.read_manifest()["segments"]
+    assert [s["count"] for s in segments] == [4, 1]
+    _, chunks = storage.load()
+    assert chunks[len(chunks) - 1]["metadata"]["doc_id"] == "late"
+
+
+def test_purge_drops_tombstoned_rows(tmp_path):
+    storage = SegmentStorage(str(tmp_path))
+    v1, c1 = make_doc("a", 3, seed=1)
+    v2, c2 = make_doc("b", 2, seed=2)
+    storage.append(v1, c1)
+    storage.append(v2, c2)
+
+    storage.add_tombstones([(0, 3)])
+    assert storage.tombstones() == [(0, 3)]
+    assert storage.purge()
+
+    manifest = storage.read_manifest()
+    assert manifest["tombstones"] == []
+    assert len(manifest["segments"]) == 1
+
+    vectors, chunks = SegmentStorage(str(tmp_path)).load()
+    np.testing.assert_allclose(vectors, v2)
+    assert list(chunks) == c2
+
+    # Nothing left to purge
+    assert not storage.purge()
+
+
+def test_purge_of_every_row_leaves_empty_store(tmp_path):
+    storage = SegmentStorage(str(tmp_path))
+    storage.append(*make_doc("a", 2, seed=1))
+    storage.add_tombstones([(0, 2)])
+
+    assert storage.purge()
+    vectors, chunks = storage.load()
+    assert vectors.shape == (0, DIM)
+    assert len(chunks) == 0
+
+
+def test_orphaned_segment_is_invisible(tmp_path):
+    storage = SegmentStorage(str(tmp_path))
+    storage.append(*make_doc("a", 2, seed=1))
+
+    # A crash after the segment files are written but before the manifest
+    # swap leaves files that no manifest lists
+    storage._write_segment(storage._reserve_segment_id(), *make_doc("orphan", 2, seed=2))
+
+    _, chunks = SegmentStorage(str(tmp_path)).load()
+    assert [c["metadata"]["doc_id"] for c in chunks] == ["a", "a"]
+
+
+def test_legacy_json_segment_is_readable(tmp_path):
+    storage = SegmentStorage(str(tmp_path))
+    vectors, chunks = make_doc("a", 2, seed=1)
+    storage.append(vectors, chunks)
+
+    # Rewrite the segment's metadata in the pre-binary JSON format
+    manifest = storage.read_manifest()
+    segment = manifest["segments"][0]
+    legacy = segment["metadata"].replace(".chunks", ".json")
+    with open(os.path.join(str(tmp_path), legacy), "w", encoding="utf-8") as f:
+        json.dump(chunks, f)
+    segment["metadata"] = legacy
+    storage._write_manifest(manifest)
+
+    _, loaded = SegmentStorage(str(tmp_path)).load()
+    assert list(loaded) == chunks
+
+
+def test_reopened_float32_store_searches_mapped_segments(tmp_path):
+    storage = SegmentStorage(str(tmp_path))
+    store = FAISSVectorStore(embedding_dim=DIM)
+    for seed, doc_id in enumerate(("a", "b")):
+        store.add_embeddings(*make_doc(doc_id, 5, seed))
+        store.persist(storage)
+    store.delete_document("a")
+    store.persist(storage)
+
+    reopened = FAISSVectorStore.open(SegmentStorage(str(tmp_path)))
+    assert isinstance(reopened.index, SegmentedFlatIndex)
+    assert len(reopened.index.segments) == 2 and reopened.index.tail.ntotal == 0
+
+    queries = np.vstack([make_doc("q", 4, seed=9)[0], storage.load()[0][:2]])
+    assert reopened.search_batch(queries, top_k=10) == store.search_batch(queries, top_k=10)
+
+    # New rows are searched from memory until persisted, then from their segment
+    vectors, chunks = make_doc("c", 3, seed=5)
+    reopened.add_embeddings(vectors, chunks)
+    assert reopened.index.tail.ntotal == 3
+    reopened.persist(storage)
+    assert reopened.index.tail.ntotal == 0 and len(reopened.index.segments) == 3
+    assert reopened.search(vectors[1], top_k=1)[0]["position"] == 11
@@ -0,0 +1,70 @@
+import numpy as np
+
+from app.rag_basics.index_backends import IndexConfig
+from app.rag_basics.store_cache import VectorStoreCache
+from app.rag_basics.vector_store import FAISSVectorStore
+
+
+class SizedStore:
+    def __init__(self, size: int):
+        self.size = size
+        self.on_grow = None
+
+    def memory_bytes(self) -> int:
+        return self.size
+
+
+def test_evicts_least_recently_used_over_budget():
+    cache = VectorStoreCache(max_bytes=100)
+    cache.put("a", SizedStore(40))
+    cache.put("b", SizedStore(40))
+    cache.get("a")
+    cache.put("c", SizedStore(40))
+
+    assert "a" in cache and "c" in cache
+    assert "b" not in cache
+    assert cache.stats()["bytes"] == 80
+    assert cache.stats()["evictions"] == 1
+
+
+def test_store_over_budget_alone_is_kept():
+    cache = VectorStoreCache(max_bytes=10)
+    cache.put("big", SizedStore(50))
+    assert "big" in cache
+    assert cache.stats()["bytes"] == 50
+
+
+def test_growth_reported_through_on_grow_is_charged():
+    cache = VectorStoreCache(max_bytes=100)
+    small = SizedStore(30)
+    cache.put("a", SizedStore(30))
+    cache.put("b", small)
+
+    small.size = 80
+    small.on_grow()
+
+    assert cache.stats()["bytes"] == 80
+    assert "a" not in cache and "b" in cache
+
+
+def test_ann_upgrade_charges_the_cache():
+    rng = np.random.default_rng(0)
+    vectors = rng.standard_normal((64, 16)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+
+    store = FAISSVectorStore(embedding_dim=16, index_config=IndexConfig(backend="hnsw", upgrade_threshold=32))
+    store.add_embeddings(
+        vectors,
+        [{"text": f"chunk {i}", "metadata": {"doc_id": "d", "source": "d", "page": 1}} for i in range(64)],
+    )
+
+    cache = VectorStoreCache(max_bytes=1 << 30)
+    cache.put("user", store)
+    before = cache.stats()["bytes"]
+
+    # Run the background upgrade inline
+    store.upgrading = True
+    store._upgrade(None)
+
+    assert store.backend == "hnsw"
+    assert cache.stats()["bytes"] == store.memory_bytes() > before
@@ -0,0 +1,89 @@
+import json
+import os
+
+import faiss
+import numpy as np
+
+from app.rag_basics.migrate_to_shards import migrate
+from app.rag_basics.segment_storage import SegmentStorage
+from app.rag_basics.tenant_shards import TenantView, shard_name, tenants_of
+from app.rag_basics.vector_store import FAISSVectorStore
+
+from conftest import DIM, make_doc
+
+
+def doc_ids(hits):
+    return {h["chunk"]["metadata"]["doc_id"] for h in hits}
+
+
+def shared_store():
+    store = FAISSVectorStore(embedding_dim=DIM)
+    # "user1" is a prefix of "user10"
+    for seed, tenant in enumerate(("user1", "user10")):
+        TenantView(store, tenant).add_embeddings(*make_doc("report", 4, seed))
+    return store
+
+
+def test_tenants_with_prefix_names_are_isolated():
+    store = shared_store()
+    user1, user10 = TenantView(store, "user1"), TenantView(store, "user10")
+
+    assert tenants_of(store) == ["user1", "user10"]
+    assert user1.doc_ranges == {"report": [(0, 4)]}
+    assert user10.doc_ranges == {"report": [(4, 8)]}
+
+    # user10's own vectors never surface in user1's results
+    queries = store._vectors_range(4, 8)
+    for row in user1.search_batch(queries, top_k=8):
+        assert {h["position"] for h in row} <= set(range(4))
+        assert doc_ids(row) == {"report"}
+    assert {h["position"] for h in user10.lexical_search("report", top_k=8)} == set(range(4, 8))
+
+
+def test_delete_in_one_tenant_leaves_the_other():
+    store = shared_store()
+    user1, user10 = TenantView(store, "user1"), TenantView(store, "user10")
+
+    assert user1.delete_document("report") == [(0, 4)]
+
+    assert not user1.has_documents() and user1.live_count() == 0
+    assert user1.search(store._vectors_range(4, 5)[0], top_k=3) == []
+    assert user10.live_count() == 4
+    assert len(user10.search(store._vectors_range(4, 5)[0], top_k=8)) == 4
+
+
+def write_legacy_store(user_dir, doc_id, seed):
+    os.makedirs(user_dir)
+    vectors, chunks = make_doc(doc_id, 3, seed)
+    index = faiss.IndexFlatIP(DIM)
+    index.add(vectors)
+    faiss.write_index(index, os.path.join(user_dir, "faiss.index"))
+    with open(os.path.join(user_dir, "chunks.json"), "w", encoding="utf-8") as f:
+        json.dump(chunks, f)
+
+
+def open_shard(shard_root, user_id):
+    return FAISSVectorStore.open(SegmentStorage(os.path.join(shard_root, shard_name(user_id, 2))))
+
+
+def test_migration_namespaces_documents_and_picks_up_new_ones(tmp_path):
+    users_dir, shard_root = str(tmp_path / "users"), str(tmp_path / "shards")
+    write_legacy_store(os.path.join(users_dir, "alice"), "Notes.pdf", seed=1)
+    bob = SegmentStorage(os.path.join(users_dir, "bob"))
+    os.makedirs(bob.directory)
+    bob.append(*make_doc("deleted", 2, seed=2))
+    bob.append(*make_doc("kept", 2, seed=3), tombstones=[(0, 2)])
+
+    summary = migrate(users_dir, shard_root, num_shards=2)
+    assert summary == {"users": 2, "documents": 2, "skipped": 0, "chunks": 5}
+    assert TenantView(open_shard(shard_root, "alice"), "alice").doc_ranges.keys() == {"notes"}
+    assert TenantView(open_shard(shard_root, "bob"), "bob").doc_ranges.keys() == {"kept"}
+
+    # A later per-user upload is migrated on the next run; the rest is skipped
+    bob.append(*make_doc("later", 2, seed=4))
+    summary = migrate(users_dir, shard_root, num_shards=2)
+    assert summary == {"users": 1, "documents": 1, "skipped": 2, "chunks": 2}
+
+    view = TenantView(open_shard(shard_root, "bob"), "bob")
+    assert view.doc_ranges.keys() == {"kept", "later"}
+    assert view.live_count() == 4
@@ -0,0 +1,166 @@
+import json
+
+import faiss
+import numpy as np
+
+from app.rag_basics.index_backends import IndexConfig
+from app.rag_basics.segment_storage import SegmentStorage
+from app.rag_basics.vector_store import FAISSVectorStore, _subtract_ranges
+
+from conftest import DIM, make_doc
+
+
+def build_store(segments=None, **config):
+    store = FAISSVectorStore(embedding_dim=DIM, index_config=IndexConfig(**config) if config else None)
+    docs = {}
+    for seed, doc_id in enumerate(("a", "b", "c")):
+        vectors, chunks = make_doc(doc_id, 4, seed)
+        store.add_embeddings(vectors, chunks)
+        docs[doc_id] = vectors
+        if segments is not None:
+            store.persist(segments)
+    return store, docs
+
+
+def result_docs(hits):
+    return {h["chunk"]["metadata"]["doc_id"] for h in hits}
+
+
+def test_subtract_ranges():
+    assert _subtract_ranges([(0, 10)], [(2, 4), (6, 7)]) == [(0, 2), (4, 6), (7, 10)]
+    assert _subtract_ranges([(0, 4), (8, 12)], [(0, 12)]) == []
+    assert _subtract_ranges([(0, 4)], [(4, 8)]) == [(0, 4)]
+
+
+def test_deleted_document_never_returned():
+    store, docs = build_store()
+    assert store.delete_document("b") == [(4, 8)]
+
+    # Querying with b's own vectors still only finds a and c
+    hits = store.search_batch(docs["b"], top_k=12)
+    assert all(result_docs(row) <= {"a", "c"} for row in hits)
+    assert all(len(row) == 8 for row in hits)
+
+    assert store.search(docs["b"][0], top_k=3, doc_id="b") == []
+    assert "b" not in store.doc_ranges
+    assert store.live_count() == 8
+    assert store.dead_ratio() == 4 / 12
+
+
+def test_deleted_document_filtered_with_lossy_codes():
+    store, docs = build_store(storage="int8")
+    store.delete_document("a")
+    hits = store.search_batch(docs["a"], top_k=12)
+    assert all(result_docs(row) <= {"b", "c"} for row in hits)
+
+
+def test_deleted_document_filtered_from_lexical_search():
+    store, _ = build_store()
+    store.delete_document("a")
+    assert result_docs(store.lexical_search("text", top_k=12)) == {"b", "c"}
+
+
+def test_deleting_unknown_document_is_a_no_op():
+    store, _ = build_store()
+    assert store.delete_document("missing") == []
+    assert store.dead_count == 0
+
+
+def test_tombstones_survive_reopen_until_purged(tmp_path):
+    storage = SegmentStorage(str(tmp_path))
+    store, docs = build_store(storage)
+    store.delete_document("b")
+    store.persist(storage)
+
+    reopened = FAISSVectorStore.open(SegmentStorage(str(tmp_path)))
+    assert reopened.dead_count == 4
+    assert all(result_docs(row) <= {"a", "c"} for row in reopened.search_batch(docs["b"], top_k=12))
+
+    assert storage.purge()
+    purged = FAISSVectorStore.open(SegmentStorage(str(tmp_path)))
+    assert purged.dead_count == 0
+    assert purged.index.ntotal == 8
+    assert purged.doc_ranges == {"a": [(0, 4)], "c": [(4, 8)]}
+    top = purged.search(docs["c"][0], top_k=1)[0]
+    assert top["chunk"]["metadata"]["doc_id"] == "c" and top["position"] == 4
+
+
+def test_readded_document_is_searchable_after_delete():
+    store, docs = build_store()
+    store.delete_document("a")
+    vectors, chunks = make_doc("a", 2, seed=7)
+    store.add_embeddings(vectors, chunks)
+
+    assert store.doc_ranges["a"] == [(12, 14)]
+    hit = store.search(vectors[0], top_k=1, doc_id="a")[0]
+    assert hit["position"] == 12
+
+
+def test_replacement_commits_tombstones_with_new_segment(tmp_path):
+    storage = SegmentStorage(str(tmp_path))
+    store, _ = build_store(storage)
+    writes = []
+    real_write = storage._write_manifest
+    storage._write_manifest = lambda manifest: writes.append(manifest) or real_write(manifest)
+
+    store.delete_document("b")
+    store.add_embeddings(*make_doc("b", 2, seed=7))
+    store.persist(storage)
+
+    assert len(writes) == 2  # segment id reservation, then the commit
+    assert writes[-1]["tombstones"] == [[4, 8]]
+    reopened = FAISSVectorStore.open(SegmentStorage(str(tmp_path)))
+    assert reopened.doc_ranges["b"] == [(12, 14)]
+
+
+def test_failed_replacement_keeps_old_copy(tmp_path):
+    storage = SegmentStorage(str(tmp_path))
+    store, _ = build_store(storage)
+
+    def fail(*args, **kwargs):
+        raise OSError("disk full")
+
+    storage._write_segment = fail
+    store.delete_document("b")
+    store.add_embeddings(*make_doc("b", 2, seed=7))
+    try:
+        store.persist(storage)
+    except OSError:
+        pass
+
+    reopened = FAISSVectorStore.open(SegmentStorage(str(tmp_path)))
+    assert reopened.dead_count == 0
+    assert reopened.doc_ranges["b"] == [(4, 8)]
+
+
+def test_legacy_store_doc_ids_are_normalized(tmp_path):
+    vectors, chunks = make_doc("sample.pdf", 3, seed=1)
+    more_vectors, more_chunks = make_doc("ACN-ASSIGNMENT2.pdf", 2, seed=2)
+    index = faiss.IndexFlatIP(DIM)
+    index.add(np.vstack([vectors, more_vectors]))
+    faiss.write_index(index, str(tmp_path / "faiss.index"))
+    with open(tmp_path / "chunks.json", "w", encoding="utf-8") as f:
+        json.dump(chunks + more_chunks, f)
+
+    store = FAISSVectorStore.load(str(tmp_path / "faiss.index"), str(tmp_path / "chunks.json"))
+    assert store.doc_ranges == {"sample": [(0, 3)], "acn-assignment2": [(3, 5)]}
+
+    # Migrated in place, next to the legacy files, as load_store does
+    storage = SegmentStorage(str(tmp_path))
+    store.persist(storage)
+    reopened = FAISSVectorStore.open(storage)
+    assert {c["metadata"]["doc_id"] for c in reopened.text_chunks} == {"sample", "acn-assignment2"}
+
+    # Either form of the name finds the document
+    assert reopened.delete_document("ACN-ASSIGNMENT2.pdf") == [(3, 5)]
+    assert reopened.delete_document("sample") == [(0, 3)]
+
+
+def test_segments_with_legacy_doc_ids_match_both_forms(tmp_path):
+    storage = SegmentStorage(str(tmp_path))
+    storage.append(*make_doc("Sample.pdf", 3, seed=1))
+
+    store = FAISSVectorStore.open(storage)
+    assert list(store.doc_ranges) == ["sample"]
+    assert len(store.search(make_doc("x", 1, seed=3)[0][0], top_k=5, doc_id="Sample.pdf")) == 3
+    assert store.delete_document("sample.pdf") == [(0, 3)]